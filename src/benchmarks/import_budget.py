@@ -0,0 +1,113 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Checks that importing the integration stays within the time budget and doesn't load deferred modules.
+
+Usage: python -m benchmarks.import_budget [budget_ms]
+The same check runs as a part of the unit tests (tests/test_import_budget.py) if home assistant is installed.
+
+Import is measured in a fresh interpreter after preloading modules Home Assistant imports by itself before any
+integration, so the figure is what the integration adds to the boot time. Exits with non-zero code on failure.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+# Modules loaded by home assistant when it discovers the integration and its config flow
+MODULES = ("hikvision_isapi", "hikvision_isapi.config_flow")
+PRELOADED = (
+    "aiohttp",
+    "voluptuous",
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.dispatcher",
+    "homeassistant.helpers.storage",
+)
+# Must be imported only once the platform or the feature which needs them is set up
+DEFERRED = (
+    "xmltodict",
+    "hikvision_isapi.binary_sensor",
+    "hikvision_isapi.sensor",
+    "hikvision_isapi.stream_supervisor",
+    "hikvision_isapi.push_listener",
+    "hikvision_isapi.camera",
+    "hikvision_isapi.platform_helpers",
+    "hikvision_isapi.snapshot_cache",
+    "hikvision_isapi.channel_status",
+    "hikvision_isapi.journal",
+    "hikvision_isapi.journal_view",
+    "hikvision_isapi.expiry_scheduler",
+    "hikvision_isapi.isapi.alert_queue",
+)
+DEFAULT_BUDGET_MS = 20
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 7
+
+MEASURE_SCRIPT = """
+import importlib, json, sys, time
+for name in {preloaded!r}:
+    importlib.import_module(name)
+started_at = time.perf_counter()
+for name in {modules!r}:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - started_at
+print(json.dumps({{"elapsed": elapsed, "deferred_loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def measure_once() -> dict:
+    script = MEASURE_SCRIPT.format(preloaded=PRELOADED, modules=MODULES, deferred=DEFERRED)
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, stdout=subprocess.PIPE, universal_newlines=True, cwd=SRC_DIR
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check_budget(budget_ms: float) -> Tuple[float, List[str]]:
+    """Returns median import time in ms and the list of failures"""
+    results = [measure_once() for _ in range(RUNS)]
+    elapsed_ms = statistics.median(r["elapsed"] for r in results) * 1000
+    deferred_loaded = sorted(set(m for r in results for m in r["deferred_loaded"]))
+    failures = []
+    if elapsed_ms > budget_ms:
+        failures.append("import time budget of {:.1f} ms exceeded".format(budget_ms))
+    if deferred_loaded:
+        failures.append("deferred modules loaded on import: {}".format(", ".join(deferred_loaded)))
+    return elapsed_ms, failures
+
+
+def main(budget_ms: float) -> int:
+    elapsed_ms, failures = check_budget(budget_ms)
+    print("Import time: {:.1f} ms (budget {:.1f} ms, median of {} runs)".format(elapsed_ms, budget_ms, RUNS))
+    for failure in failures:
+        print("FAILED: " + failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS))
@@ -0,0 +1,61 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Compares EventNotificationAlert parser backends. Usage: python -m benchmarks.parser_backends [iterations]"""
+
+import sys
+import timeit
+
+from hikvision_isapi.isapi.model import EventNotificationAlert
+from hikvision_isapi.isapi.parsers import XmlToDictParser
+
+from .payloads import ALL_ALERTS
+
+
+class XmlToDictEventNotificationAlert(EventNotificationAlert):
+    XML_PARSER = XmlToDictParser()
+
+
+def main(iterations: int):
+    print("{:<22}{:>16}{:>16}{:>10}".format("payload", "xmltodict, us", "fast path, us", "speedup"))
+    for name, payload in ALL_ALERTS.items():
+        # Both backends must produce the same model
+        reference = XmlToDictEventNotificationAlert.from_xml_str(payload)
+        fast = EventNotificationAlert.from_xml_str(payload)
+        assert (reference.type, reference.state, reference.channel_id, reference.timestamp) == (
+            fast.type,
+            fast.state,
+            fast.channel_id,
+            fast.timestamp,
+        )
+        baseline = timeit.timeit(lambda: XmlToDictEventNotificationAlert.from_xml_str(payload), number=iterations)
+        optimized = timeit.timeit(lambda: EventNotificationAlert.from_xml_str(payload), number=iterations)
+        print(
+            "{:<22}{:>16.2f}{:>16.2f}{:>9.1f}x".format(
+                name, baseline / iterations * 1e6, optimized / iterations * 1e6, baseline / optimized
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
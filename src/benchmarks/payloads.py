@@ -0,0 +1,126 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import re
+from typing import Optional
+
+# Alert stream parts as captured from DS-7616NI NVR and DS-2CD2043G0 camera
+
+VIDEOLOSS_HEARTBEAT = b"""<EventNotificationAlert version="1.0" xmlns="http://www.hikvision.com/ver20/XMLSchema">
+<ipAddress>192.168.1.64</ipAddress>
+<portNo>80</portNo>
+<protocol>HTTP</protocol>
+<macAddress>44:19:b6:00:00:00</macAddress>
+<channelID>1</channelID>
+<dateTime>2021-03-14T12:22:06+02:00</dateTime>
+<activePostCount>0</activePostCount>
+<eventType>videoloss</eventType>
+<eventState>inactive</eventState>
+<eventDescription>videoloss alarm</eventDescription>
+</EventNotificationAlert>
+"""
+
+MOTION_ALERT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<EventNotificationAlert version="2.0" xmlns="http://www.hikvision.com/ver20/XMLSchema">
+<ipAddress>192.168.1.10</ipAddress>
+<portNo>80</portNo>
+<protocol>HTTP</protocol>
+<macAddress>c0:56:e3:00:00:00</macAddress>
+<channelID>5</channelID>
+<dateTime>2021-03-14T12:22:07+02:00</dateTime>
+<activePostCount>1</activePostCount>
+<eventType>VMD</eventType>
+<eventState>active</eventState>
+<eventDescription>Motion alarm</eventDescription>
+<channelName>Backyard</channelName>
+<DetectionRegionList>
+<DetectionRegionEntry>
+<regionID>1</regionID>
+<sensitivityLevel>60</sensitivityLevel>
+<RegionCoordinatesList>
+<RegionCoordinates><positionX>0</positionX><positionY>0</positionY></RegionCoordinates>
+<RegionCoordinates><positionX>1000</positionX><positionY>0</positionY></RegionCoordinates>
+<RegionCoordinates><positionX>1000</positionX><positionY>1000</positionY></RegionCoordinates>
+<RegionCoordinates><positionX>0</positionX><positionY>1000</positionY></RegionCoordinates>
+</RegionCoordinatesList>
+</DetectionRegionEntry>
+</DetectionRegionList>
+</EventNotificationAlert>
+"""
+
+LINE_CROSSING_ALERT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<EventNotificationAlert version="2.0" xmlns="http://www.hikvision.com/ver20/XMLSchema">
+<ipAddress>192.168.1.10</ipAddress>
+<ipv6Address>::ffff:192.168.1.10</ipv6Address>
+<portNo>80</portNo>
+<protocol>HTTP</protocol>
+<macAddress>c0:56:e3:00:00:00</macAddress>
+<channelID>12</channelID>
+<dateTime>2021-03-14T12:24:51+02:00</dateTime>
+<activePostCount>1</activePostCount>
+<eventType>linedetection</eventType>
+<eventState>active</eventState>
+<eventDescription>linedetection alarm</eventDescription>
+<channelName>Gate</channelName>
+<DetectionRegionList>
+<DetectionRegionEntry>
+<regionID>1</regionID>
+<sensitivityLevel>50</sensitivityLevel>
+<RegionCoordinatesList>
+<RegionCoordinates><positionX>310</positionX><positionY>120</positionY></RegionCoordinates>
+<RegionCoordinates><positionX>690</positionX><positionY>860</positionY></RegionCoordinates>
+</RegionCoordinatesList>
+<detectionTarget>human</detectionTarget>
+</DetectionRegionEntry>
+</DetectionRegionList>
+</EventNotificationAlert>
+"""
+
+ALL_ALERTS = {
+    "videoloss_heartbeat": VIDEOLOSS_HEARTBEAT,
+    "motion": MOTION_ALERT,
+    "line_crossing": LINE_CROSSING_ALERT,
+}
+
+_CHANNEL_ID_RE = re.compile(rb"<channelID>[^<]*</channelID>")
+_EVENT_TYPE_RE = re.compile(rb"<eventType>[^<]*</eventType>")
+
+
+def render_alert(template: bytes, channel_id: int, event_type: Optional[str] = None) -> bytes:
+    """Makes a copy of the recorded alert as if it was received from the given channel"""
+    result = _CHANNEL_ID_RE.sub("<channelID>{}</channelID>".format(channel_id).encode(), template, count=1)
+    if event_type is not None:
+        result = _EVENT_TYPE_RE.sub("<eventType>{}</eventType>".format(event_type).encode(), result, count=1)
+    return result
+
+
+def synthetic_alert(channel_id: int, event_type: str, state: str = "active") -> bytes:
+    """Minimal alert carrying only the fields the integration reads"""
+    return (
+        '<EventNotificationAlert version="2.0" xmlns="http://www.hikvision.com/ver20/XMLSchema">'
+        "<channelID>{}</channelID><dateTime>2021-03-14T12:22:07+02:00</dateTime>"
+        "<eventType>{}</eventType><eventState>{}</eventState>"
+        "<eventDescription>{} alarm</eventDescription></EventNotificationAlert>".format(
+            channel_id, event_type, state, event_type
+        )
+    ).encode()
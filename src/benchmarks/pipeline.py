@@ -0,0 +1,215 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Measures the alert pipeline end to end: alertStream socket -> multipart -> parser -> supervisor -> sensor signal.
+
+Usage: python -m benchmarks.pipeline [--events N] [--channels 1,16,64] [--payload recorded|synthetic] [--rate N]
+
+Latency of the alert is the time between writing it into the stream by the stand-in device and receiving the
+signal by the sensor. Without --rate the device writes as fast as the client reads, so the latency is dominated
+by the queueing and the throughput is the max the pipeline can sustain. Peak memory is measured in the separate
+run with tracemalloc enabled and includes allocations of the stand-in device which lives in the same process.
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import functools
+import time
+import tracemalloc
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from aiohttp import web
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from hikvision_isapi import const
+from hikvision_isapi.binary_sensor import AlertDef, alert_signal_name, build_alerts_index, process_hikvision_alert
+from hikvision_isapi.isapi.alert_queue import BoundedAlertQueue, OverflowPolicy
+from hikvision_isapi.isapi.client import ENDPOINT_EVENT_ALERTS_STREAM, ISAPIClient
+from hikvision_isapi.stream_supervisor import AlertStreamSupervisor
+from isapi_simulator.payloads import MULTIPART_BOUNDARY, multipart_part
+
+from .payloads import LINE_CROSSING_ALERT, MOTION_ALERT, VIDEOLOSS_HEARTBEAT, render_alert, synthetic_alert
+
+DEVICE_ID = "benchmark"
+ALERT_TYPES = (const.AlertType.Motion, const.AlertType.LineCrossing)
+RECORDED_TEMPLATES = {const.AlertType.Motion: MOTION_ALERT, const.AlertType.LineCrossing: LINE_CROSSING_ALERT}
+# Devices send videoloss heartbeat every few seconds, they must be parsed but never reach sensors
+HEARTBEAT_EVERY = 10
+SCENARIO_TIMEOUT = 120
+
+# Channel the alert belongs to (None for heartbeats) and the multipart part as it goes over the wire
+Workload = List[Tuple[Optional[str], bytes]]
+
+
+class ScenarioResult(NamedTuple):
+    alerts: int
+    elapsed: float
+    latencies: List[float]
+
+
+def build_workload(events: int, channels: int, payload: str) -> Workload:
+    workload = []
+    for i in range(events):
+        if i % HEARTBEAT_EVERY == HEARTBEAT_EVERY - 1:
+            workload.append((None, multipart_part(VIDEOLOSS_HEARTBEAT)))
+            continue
+        channel = i % channels + 1
+        alert_type = ALERT_TYPES[(i // channels) % len(ALERT_TYPES)]
+        if payload == "recorded":
+            body = render_alert(RECORDED_TEMPLATES[alert_type], channel, alert_type.value)
+        else:
+            body = synthetic_alert(channel, alert_type.value)
+        workload.append((str(channel), multipart_part(body)))
+    return workload
+
+
+class StandInDevice(object):
+    """Serves the workload as the alert stream and remembers when each alert was written"""
+
+    def __init__(self, workload: Workload, rate: int) -> None:
+        self.workload = workload
+        self.rate = rate
+        self.sent_at: Dict[str, Deque[float]] = collections.defaultdict(collections.deque)
+        self.started_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    async def handle_alert_stream(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(
+            headers={"Content-Type": "multipart/mixed; boundary={}".format(MULTIPART_BOUNDARY)}
+        )
+        await response.prepare(request)
+        self.started_at = time.perf_counter()
+        for i, (channel, part) in enumerate(self.workload):
+            if self.rate > 0:
+                delay = self.started_at + i / self.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if channel is not None:
+                self.sent_at[channel].append(time.perf_counter())
+            await response.write(part)
+        # Stream stays open, otherwise the client would reconnect
+        await self.done.wait()
+        return response
+
+
+async def run_scenario(workload: Workload, channels: int, rate: int) -> ScenarioResult:
+    loop = asyncio.get_event_loop()
+    device = StandInDevice(workload, rate)
+    app = web.Application()
+    app.router.add_get(ENDPOINT_EVENT_ALERTS_STREAM, device.handle_alert_stream)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+
+    hass = HomeAssistant()
+    alerts_cfg = [
+        AlertDef(DEVICE_ID, alert_type, str(channel), datetime.timedelta(minutes=1))
+        for channel in range(1, channels + 1)
+        for alert_type in ALERT_TYPES
+    ]
+    expected = sum(1 for channel, _ in workload if channel is not None)
+    latencies: List[float] = []
+    finished = asyncio.Event()
+
+    @callback
+    def on_alert(data: Dict):
+        received_at = time.perf_counter()
+        latencies.append(received_at - device.sent_at[data[const.EVENT_ALERT_DATA_CHANNEL]].popleft())
+        if len(latencies) == expected:
+            finished.set()
+
+    for alert_def in alerts_cfg:
+        async_dispatcher_connect(hass, alert_signal_name(alert_def), on_alert)
+
+    supervisor = AlertStreamSupervisor(loop)
+    api_client = ISAPIClient("http://{}:{}".format(host, port), "admin", "benchmark")
+    supervisor.attach(
+        DEVICE_ID,
+        api_client,
+        functools.partial(
+            process_hikvision_alert, hass, config_entry_id=DEVICE_ID, alerts_index=build_alerts_index(alerts_cfg)
+        ),
+        # Nothing should be lost, otherwise latencies can't be matched with the sent alerts
+        BoundedAlertQueue(AlertStreamSupervisor.DEFAULT_QUEUE_SIZE, OverflowPolicy.Block),
+    )
+    try:
+        await asyncio.wait_for(finished.wait(), SCENARIO_TIMEOUT)
+        elapsed = time.perf_counter() - device.started_at
+    finally:
+        device.done.set()
+        await supervisor.async_stop()
+        await api_client.close()
+        await runner.cleanup()
+    return ScenarioResult(expected, elapsed, latencies)
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))]
+
+
+def main(args: argparse.Namespace):
+    loop = asyncio.get_event_loop()
+    print(
+        "{:>9}{:>9}{:>12}{:>10}{:>10}{:>11}".format("channels", "alerts", "alerts/s", "p50, ms", "p99, ms", "peak, MiB")
+    )
+    for channels in args.channels:
+        workload = build_workload(args.events, channels, args.payload)
+        result = loop.run_until_complete(run_scenario(workload, channels, args.rate))
+        tracemalloc.start()
+        loop.run_until_complete(run_scenario(workload, channels, args.rate))
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        latencies = sorted(result.latencies)
+        print(
+            "{:>9}{:>9}{:>12.0f}{:>10.2f}{:>10.2f}{:>11.2f}".format(
+                channels,
+                result.alerts,
+                result.alerts / result.elapsed,
+                percentile(latencies, 50) * 1000,
+                percentile(latencies, 99) * 1000,
+                peak_memory / 2**20,
+            )
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pipeline", description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000, help="Number of stream parts including heartbeats")
+    parser.add_argument(
+        "--channels",
+        type=lambda x: [int(c) for c in x.split(",")],
+        default=[1, 16, 64],
+        help="Comma separated list of channel counts to run the benchmark for",
+    )
+    parser.add_argument("--payload", choices=("recorded", "synthetic"), default="recorded")
+    parser.add_argument("--rate", type=int, default=0, help="Parts per second written by device, 0 for unlimited")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,120 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Soak test: keeps alert streams of many simulated devices open and reports the pipeline health periodically.
+
+Usage: python -m benchmarks.soak [--devices 100] [--duration 600] [simulator options, see --help]
+
+All the clients share the connection pool and the stream supervisor as they do in Home Assistant. Stats include
+the total alerts rate, reconnects, the deepest queue, dropped alerts and the max RSS of the process.
+"""
+
+import argparse
+import asyncio
+import logging
+import resource
+import time
+
+from hikvision_isapi.isapi.client import ISAPIClient
+from hikvision_isapi.isapi.pool import ISAPIConnectionPool
+from hikvision_isapi.stream_supervisor import AlertStreamSupervisor
+from isapi_simulator import DeviceFleet, DeviceProfile
+
+
+class AlertCounter(object):
+    def __init__(self) -> None:
+        self.received = 0
+
+    def __call__(self, event):
+        self.received += 1
+
+
+def report(supervisor: AlertStreamSupervisor, fleet: DeviceFleet, counter: AlertCounter, elapsed: float):
+    snapshots = supervisor.metrics_snapshot().values()
+    print(
+        "{:>7.0f}s connected: {}/{}, alerts: {} ({:.0f}/s), reconnects: {}, max queue: {}, dropped: {}, "
+        "max RSS: {:.1f} MiB".format(
+            elapsed,
+            sum(1 for s in snapshots if s["connected"]),
+            len(fleet.devices),
+            counter.received,
+            counter.received / elapsed if elapsed > 0 else 0,
+            sum(s["reconnects"] for s in snapshots),
+            max((s["queue_depth"] for s in snapshots), default=0),
+            sum(s["dropped_events"] for s in snapshots),
+            # ru_maxrss is in KiB on Linux
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        )
+    )
+
+
+async def run(args: argparse.Namespace):
+    profile = DeviceProfile(
+        channels=args.channels,
+        rate=args.rate,
+        burst_size=args.burst_size,
+        burst_interval=args.burst_interval,
+        heartbeat_interval=args.heartbeat_interval,
+        disconnect_after=args.disconnect_after,
+        stall_after=args.stall_after,
+    )
+    pool = ISAPIConnectionPool()
+    supervisor = AlertStreamSupervisor(asyncio.get_event_loop())
+    counter = AlertCounter()
+    async with DeviceFleet(args.devices, profile, seed=args.seed) as fleet:
+        for device, base_url in zip(fleet.devices, fleet.base_urls):
+            supervisor.attach(
+                device.serial_number, ISAPIClient(base_url, "admin", "soak", connection_pool=pool), counter
+            )
+        started_at = time.monotonic()
+        try:
+            while time.monotonic() - started_at < args.duration:
+                await asyncio.sleep(min(args.report_interval, args.duration))
+                report(supervisor, fleet, counter, time.monotonic() - started_at)
+        finally:
+            await supervisor.async_stop()
+            await pool.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.soak", description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=600, help="Seconds")
+    parser.add_argument("--report-interval", type=float, default=10, help="Seconds")
+    parser.add_argument("--channels", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=2.0, help="Average alerts per second per device")
+    parser.add_argument("--burst-size", type=int, default=0)
+    parser.add_argument("--burst-interval", type=float, default=0)
+    parser.add_argument("--heartbeat-interval", type=float, default=10)
+    parser.add_argument("--disconnect-after", type=float, default=0)
+    parser.add_argument("--stall-after", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        asyncio.get_event_loop().run_until_complete(run(parse_args()))
+    except KeyboardInterrupt:
+        pass
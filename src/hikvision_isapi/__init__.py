@@ -23,14 +23,17 @@
 
 """HomeAssistant-Hikvision Connector based on the native ISAPI client implementation"""
 import asyncio
+import functools
 import logging
+import shutil
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, Config
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import HomeAssistant, Config, Event
 
-from . import const
-from .isapi.client import ISAPIClient
-from .isapi.model import EventNotificationAlert
+from . import const, utils
+from .device_cache import DeviceCache
+from .isapi.pool import ISAPIConnectionPool
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -39,6 +42,19 @@ async def async_setup(hass: HomeAssistant, config: Config) -> bool:
     """Set up configured Hikvision integration."""
     # TODO: Handle yaml here
     hass.data.setdefault(const.DOMAIN, {})
+    # Alert stream supervisor and expiry scheduler are created by binary_sensor platform once needed
+    # Loaded on first use, so startup is not delayed if there are no entries
+    hass.data[const.DOMAIN][const.DATA_DEVICE_CACHE] = DeviceCache(hass, const.STORAGE_KEY_DEVICE_CACHE)
+
+    async def shutdown(event: Event):
+        domain_data = hass.data[const.DOMAIN]
+        if const.DATA_STREAM_SUPERVISOR in domain_data:
+            await domain_data[const.DATA_STREAM_SUPERVISOR].async_stop()
+        if const.DATA_EXPIRY_SCHEDULER in domain_data:
+            domain_data[const.DATA_EXPIRY_SCHEDULER].stop()
+        await ISAPIConnectionPool.shared().close()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, shutdown)
     return True
 
 
@@ -49,29 +65,28 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry):
     # Subscribe for changes to config entry
     undo_config_update_listener = config_entry.add_update_listener(update_config_listener)
 
-    cfg = config_entry.data
-    api_client = ISAPIClient(
-        cfg.get(const.CONF_BASE_URL),
-        cfg.get(const.CONF_USER),
-        cfg.get(const.CONF_PASSWORD),
-        ignore_ssl_errors=cfg.get(const.CONF_IGNORE_SSL_ERRORS),
-    )
+    api_client = utils.api_client_from_config(config_entry.data)
 
     # Bootstrap data structure for config entry
     hass.data[const.DOMAIN][config_entry.entry_id] = {
         const.DATA_API_CLIENT: api_client,
         const.UNDO_UPDATE_CONF_UPDATE_LISTENER: undo_config_update_listener,
-        const.DATA_ALERTS_BG_TASKS: [],
-        const.DATA_ALERTS_QUEUE: None,
         const.DATA_ENTITIES: [],
+        const.DATA_BG_TASKS: [],
     }
 
-    for component in const.PLATFORMS:
-        hass.async_create_task(hass.config_entries.async_forward_entry_setup(config_entry, component))
+    # Platforms are set up concurrently and don't wait for the devices
+    hass.async_create_task(async_setup_platforms(hass, config_entry))
 
     return True
 
 
+async def async_setup_platforms(hass: HomeAssistant, config_entry: ConfigEntry):
+    await asyncio.gather(
+        *[hass.config_entries.async_forward_entry_setup(config_entry, component) for component in const.PLATFORMS]
+    )
+
+
 async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry):
     """Destroy resources related to config entry"""
     _LOGGER.debug("Unloading config entry {} (id: {})".format(config_entry.title, config_entry.entry_id))
@@ -81,10 +96,15 @@ async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry):
         )
     )
 
-    # Shutting down background workers
+    # Platforms are loaded by now, the module is not imported on startup
+    from .platform_helpers import async_stop_entry_services
+
     entry_data = hass.data[const.DOMAIN][config_entry.entry_id]
-    for task in entry_data[const.DATA_ALERTS_BG_TASKS]:
-        task.cancel()
+    await async_stop_entry_services(hass, config_entry)
+    if const.DATA_SNAPSHOT_CACHE in hass.data[const.DOMAIN]:
+        snapshot_cache = hass.data[const.DOMAIN][const.DATA_SNAPSHOT_CACHE]
+        snapshot_cache.release(config_entry.entry_id)
+        snapshot_cache.invalidate(lambda key: key[0] == config_entry.entry_id)
     # Disposing client
     try:
         await entry_data[const.DATA_API_CLIENT].close()
@@ -105,6 +125,15 @@ async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry):
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, config_entry: ConfigEntry):
+    """Drop cached data, journal and saved pictures of removed entry"""
+    await hass.data[const.DOMAIN][const.DATA_DEVICE_CACHE].async_remove(config_entry.entry_id)
+    for directory in (const.JOURNAL_DIRECTORY, const.ATTACHMENTS_DIRECTORY):
+        await hass.async_add_executor_job(
+            functools.partial(shutil.rmtree, hass.config.path(directory, config_entry.entry_id), ignore_errors=True)
+        )
+
+
 async def update_config_listener(hass: HomeAssistant, config_entry: ConfigEntry):
     """Will be invoked after once entry updated."""
     _LOGGER.debug(
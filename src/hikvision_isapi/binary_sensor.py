@@ -23,19 +23,39 @@
 
 import asyncio
 import datetime
+import functools
 import logging
-from asyncio import Queue
-from typing import Dict, List, NamedTuple, Optional, Callable
+from typing import Dict, List, NamedTuple, Optional, Callable, Set, Tuple
 
-from homeassistant.components.binary_sensor import BinarySensorEntity, DEVICE_CLASS_MOTION
+from homeassistant.components.binary_sensor import BinarySensorEntity, DEVICE_CLASS_CONNECTIVITY, DEVICE_CLASS_MOTION
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, Event
+from homeassistant.core import HomeAssistant, Event, callback
+from homeassistant.exceptions import PlatformNotReady
 from homeassistant.helpers.dispatcher import async_dispatcher_send, async_dispatcher_connect
-from homeassistant.helpers.event import async_track_time_interval
 
 from . import const, utils
+from .channel_status import ChannelStatusPoller
+from .coalescer import AlertCoalescer
+from .expiry_scheduler import ExpiryScheduler
+from .isapi.alert_queue import BoundedAlertQueue, OverflowPolicy
+from .isapi.attachments import DiskAttachmentStore
 from .isapi.client import ISAPIClient
 from .isapi.model import EventNotificationAlert
+from .isapi.subscription import EventFilter
+from .journal import EventJournal
+from .journal_view import async_open_journal
+from .platform_helpers import (
+    async_stop_entry_services,
+    cameras_enabled,
+    get_inputs_cached,
+    get_snapshot_cache,
+    get_stream_supervisor,
+    name_to_id,
+    snapshot_cache_key,
+)
+from .push_listener import async_register_push_target, unregister_push_target
+from .snapshot_cache import SnapshotCache
+from .state_writer import StateWriteBatcher
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -47,8 +67,65 @@ class AlertDef(NamedTuple):
     recovery_period: datetime.timedelta
 
 
-def name_to_id(name: str) -> str:
-    return name.strip().replace(" ", "_").replace("-", "_").lower()
+AlertsIndex = Dict[Tuple[str, Optional[str]], str]
+
+
+def alert_index_key(alert_type: str, channel: Optional[str]) -> Tuple[str, Optional[str]]:
+    return alert_type, str(channel) if channel is not None else None
+
+
+def alert_signal_name(alert_def: AlertDef) -> str:
+    """Each sensor listens its own signal so the alert wakes up only the matching sensor"""
+    return "{}_{}_{}_{}".format(
+        const.SIGNAL_ALERT_NAME, alert_def.related_device_id, alert_def.type.value, alert_def.channel
+    )
+
+
+def build_alerts_index(alerts_cfg: List[AlertDef]) -> AlertsIndex:
+    return {alert_index_key(alert.type.value, alert.channel): alert_signal_name(alert) for alert in alerts_cfg}
+
+
+class PendingAlerts(object):
+    """Holds alerts received before the matching sensor is added to hass.
+
+    Only the latest alert of each sensor is kept as it is enough to restore the sensor state.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._ready: Set[str] = set()
+        self._held: Dict[str, Tuple[Dict, float]] = {}
+
+    def is_ready(self, signal_name: str) -> bool:
+        return signal_name in self._ready
+
+    def hold(self, signal_name: str, data: Dict):
+        self._held[signal_name] = (data, self._loop.time())
+
+    def mark_ready(self, signal_name: str) -> Optional[Tuple[Dict, float]]:
+        """Returns the held alert and how long ago it was received if any"""
+        self._ready.add(signal_name)
+        held = self._held.pop(signal_name, None)
+        if held is None:
+            return None
+        return held[0], self._loop.time() - held[1]
+
+    def mark_removed(self, signal_name: str):
+        self._ready.discard(signal_name)
+
+
+def get_expiry_scheduler(hass: HomeAssistant) -> ExpiryScheduler:
+    domain_data = hass.data[const.DOMAIN]
+    if const.DATA_EXPIRY_SCHEDULER not in domain_data:
+        domain_data[const.DATA_EXPIRY_SCHEDULER] = ExpiryScheduler(hass.loop)
+    return domain_data[const.DATA_EXPIRY_SCHEDULER]
+
+
+def channel_status_enabled(config_entry: ConfigEntry) -> bool:
+    common_options = config_entry.options.get(const.OPT_ROOT_COMMON) or {}
+    return config_entry.data.get(const.CONF_DEVICE_TYPE) == const.DEVICE_TYPE_NVR and common_options.get(
+        const.OPT_COMMON_ENABLE_CHANNEL_STATUS, const.DEFAULTS_COMMON_ENABLE_CHANNEL_STATUS
+    )
 
 
 def should_listen_for_alerts(options: Dict) -> bool:
@@ -61,16 +138,24 @@ def should_listen_for_alerts(options: Dict) -> bool:
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities):
     """Set up the platform from config_entry."""
     # We should scan options for alert configs and then if at least 1 listener is enabled subscribe for the stream
-    hik_client = hass.data[const.DOMAIN][config_entry.entry_id][const.DATA_API_CLIENT]
     entities = []
     if should_listen_for_alerts(config_entry.options):
-        alerts_cfg = await start_isapi_alert_listeners(
-            hass, hass.data[const.DOMAIN][config_entry.entry_id], config_entry
-        )
+        entry_data = hass.data[const.DOMAIN][config_entry.entry_id]
+        state_writer = state_writer_from_options(hass, config_entry.options.get(const.OPT_ROOT_COMMON) or {})
+        entry_data[const.DATA_STATE_WRITER] = state_writer
+        # Stream is connecting while inputs are enumerated, alerts received before the sensors are added
+        # are held and replayed by the sensors
+        pending_alerts = PendingAlerts(hass.loop)
+        alerts_cfg = await start_isapi_alert_listeners(hass, entry_data, config_entry, pending_alerts)
 
         inputs_map = {}
         if config_entry.data.get(const.CONF_DEVICE_TYPE) == const.DEVICE_TYPE_NVR:
-            inputs = await hik_client.get_available_inputs()
+            try:
+                inputs = await get_inputs_cached(hass, config_entry)
+            except PlatformNotReady:
+                # Setup will be retried so listener, push configuration and storages must be stopped
+                await async_stop_entry_services(hass, config_entry)
+                raise
             for input in inputs:
                 inputs_map[input.input_id] = (
                     name_to_id(const.SENSOR_ID_PREFIX + str(input.input_id).rjust(2, "0")),
@@ -94,16 +179,61 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
                     ),
                 )
             )
-            entities.append(HikvisionAlertBinarySensor(hass, sensor_id, sensor_name, alert))
+            entities.append(
+                HikvisionAlertBinarySensor(hass, sensor_id, sensor_name, alert, state_writer, pending_alerts)
+            )
+    if channel_status_enabled(config_entry):
+        entities += await setup_channel_status_sensors(hass, config_entry)
     if len(entities) > 0:
         async_add_entities(entities)
     return True
 
 
-async def start_isapi_alert_listeners(hass, data: Dict, config_entry: ConfigEntry) -> List[AlertDef]:
+async def setup_channel_status_sensors(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> List["HikvisionChannelConnectivitySensor"]:
+    """Creates connectivity sensor for each NVR input, all of them are fed by a single status poller"""
+    entry_data = hass.data[const.DOMAIN][config_entry.entry_id]
+    common_options = config_entry.options.get(const.OPT_ROOT_COMMON) or {}
+    # Inputs are already cached if alert sensors are set up
+    inputs = await get_inputs_cached(hass, config_entry)
+    if const.DATA_STATE_WRITER not in entry_data:
+        entry_data[const.DATA_STATE_WRITER] = state_writer_from_options(hass, common_options)
+    poller = ChannelStatusPoller(
+        hass.loop,
+        entry_data[const.DATA_API_CLIENT],
+        const.CHANNEL_STATUS_MIN_INTERVAL,
+        utils.parse_timedelta_or_default(
+            common_options.get(const.OPT_COMMON_CHANNEL_STATUS_INTERVAL, const.DEFAULTS_COMMON_CHANNEL_STATUS_INTERVAL),
+            datetime.timedelta(minutes=1),
+        ),
+    )
+    entry_data[const.DATA_CHANNEL_STATUS_POLLER] = poller
+    poller.start()
+    return [
+        HikvisionChannelConnectivitySensor(
+            poller,
+            entry_data[const.DATA_STATE_WRITER],
+            "_".join(
+                (
+                    name_to_id(config_entry.title),
+                    name_to_id(const.SENSOR_ID_PREFIX + str(input.input_id).rjust(2, "0")),
+                    "connected",
+                )
+            ),
+            "{} {} Connection".format(config_entry.title, input.input_name),
+            input.input_id,
+        )
+        for input in inputs
+    ]
+
+
+async def start_isapi_alert_listeners(
+    hass, data: Dict, config_entry: ConfigEntry, pending_alerts: Optional["PendingAlerts"] = None
+) -> List[AlertDef]:
     _LOGGER.info("Initializing Hikvision ISAPI alert stream listener")
     api_client: ISAPIClient = data[const.DATA_API_CLIENT]
-    event_stream = data[const.DATA_ALERTS_QUEUE] = Queue()
+    supervisor = get_stream_supervisor(hass)
     options: Dict = config_entry.options
 
     # Build a list of AlertDefs
@@ -124,15 +254,152 @@ async def start_isapi_alert_listeners(hass, data: Dict, config_entry: ConfigEntr
                 config_entry.entry_id, options.get(const.OPT_ROOT_ALERTS), const.NON_NVR_CHANNEL_NUMBER, common_options
             )
 
-    data[const.DATA_ALERTS_BG_TASKS].append(
-        hass.loop.create_task(api_client.listen_hikvision_event_stream(event_stream))
+    coalescer = None
+    coalesce_window = utils.parse_timedelta_or_default(
+        common_options.get(const.OPT_COMMON_COALESCE_WINDOW, const.DEFAULTS_COMMON_COALESCE_WINDOW),
+        datetime.timedelta(0),
     )
-    data[const.DATA_ALERTS_BG_TASKS].append(
-        hass.loop.create_task(process_hikvision_alerts(hass, event_stream, config_entry.entry_id, alerts_cfg))
+    if coalesce_window > datetime.timedelta(0):
+        coalescer = AlertCoalescer(coalesce_window)
+    journal = await async_open_alert_storage(hass, data, config_entry, common_options)
+    snapshot_prefetch = None
+    if cameras_enabled(common_options) and common_options.get(
+        const.OPT_COMMON_SNAPSHOT_PREFETCH, const.DEFAULTS_COMMON_SNAPSHOT_PREFETCH
+    ):
+        snapshot_prefetch = functools.partial(
+            prefetch_snapshot, get_snapshot_cache(hass), config_entry.entry_id, api_client
+        )
+
+    handler = functools.partial(
+        process_hikvision_alert,
+        hass,
+        config_entry_id=config_entry.entry_id,
+        alerts_index=build_alerts_index(alerts_cfg),
+        coalescer=coalescer,
+        pending_alerts=pending_alerts,
+        snapshot_prefetch=snapshot_prefetch,
+        journal=journal,
     )
+    event_filters = (
+        event_filters_from_alerts(alerts_cfg)
+        if common_options.get(const.OPT_COMMON_EVENT_SUBSCRIPTION, const.DEFAULTS_COMMON_EVENT_SUBSCRIPTION)
+        else None
+    )
+    push = (
+        common_options.get(const.OPT_COMMON_INGESTION_MODE, const.DEFAULTS_COMMON_INGESTION_MODE)
+        == const.INGESTION_MODE_PUSH
+    )
+    supervisor.attach(
+        config_entry.entry_id, api_client, handler, alerts_queue_from_options(common_options), event_filters, push
+    )
+    if push:
+        data[const.DATA_BG_TASKS].append(
+            hass.async_create_task(configure_push_ingestion(hass, config_entry, handler, event_filters))
+        )
     return alerts_cfg
 
 
+async def configure_push_ingestion(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    handler: Callable[[EventNotificationAlert], None],
+    event_filters: Optional[List[EventFilter]],
+):
+    """Points the device to the push endpoint. If device can't be configured alert stream is used instead"""
+    common_options = config_entry.options.get(const.OPT_ROOT_COMMON) or {}
+    api_client: ISAPIClient = hass.data[const.DOMAIN][config_entry.entry_id][const.DATA_API_CLIENT]
+    try:
+        host_id = await async_register_push_target(
+            hass,
+            config_entry.entry_id,
+            api_client,
+            common_options.get(const.OPT_COMMON_PUSH_BASE_URL, const.DEFAULTS_COMMON_PUSH_BASE_URL),
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        _LOGGER.warning(
+            "Unable to configure {} to push alerts, falling back to alert stream: {}".format(config_entry.title, e)
+        )
+        unregister_push_target(hass, config_entry.entry_id)
+        supervisor = get_stream_supervisor(hass)
+        await supervisor.detach(config_entry.entry_id)
+        supervisor.attach(
+            config_entry.entry_id, api_client, handler, alerts_queue_from_options(common_options), event_filters
+        )
+        return
+    _LOGGER.info(
+        "{} is configured to push alerts to Home Assistant (notification host {})".format(config_entry.title, host_id)
+    )
+
+
+def event_filters_from_alerts(alerts_cfg: List[AlertDef]) -> List[EventFilter]:
+    """Asks the device only for the events which are tracked by sensors"""
+    channels_by_type: Dict[str, List[str]] = {}
+    for alert in alerts_cfg:
+        channels = channels_by_type.setdefault(alert.type.value, [])
+        if alert.channel is not None and alert.channel not in channels:
+            channels.append(alert.channel)
+    return [EventFilter(alert_type, channels or None) for alert_type, channels in channels_by_type.items()]
+
+
+def prefetch_snapshot(cache: SnapshotCache, config_entry_id: str, api_client: ISAPIClient, channel_id: str):
+    cache.prefetch(
+        snapshot_cache_key(config_entry_id, channel_id), functools.partial(api_client.get_snapshot, channel_id)
+    )
+
+
+async def async_open_alert_storage(
+    hass: HomeAssistant, data: Dict, config_entry: ConfigEntry, common_options: Dict
+) -> Optional[EventJournal]:
+    """Opens the journal and the store of the pictures sent along with alerts if they are enabled"""
+    journal = None
+    if common_options.get(const.OPT_COMMON_ENABLE_JOURNAL, const.DEFAULTS_COMMON_ENABLE_JOURNAL):
+        journal = await async_open_journal(hass, config_entry)
+        if journal is not None:
+            data[const.DATA_JOURNAL] = journal
+    if common_options.get(const.OPT_COMMON_SAVE_ATTACHMENTS, const.DEFAULTS_COMMON_SAVE_ATTACHMENTS):
+        attachment_store = await async_open_attachment_store(hass, config_entry, common_options)
+        if attachment_store is not None:
+            data[const.DATA_ATTACHMENT_STORE] = attachment_store
+            data[const.DATA_API_CLIENT].attachment_sink = attachment_store
+    return journal
+
+
+async def async_open_attachment_store(
+    hass: HomeAssistant, config_entry: ConfigEntry, common_options: Dict
+) -> Optional[DiskAttachmentStore]:
+    """Pictures are skipped if the store can't be opened, alerts are processed as usual"""
+    max_size = common_options.get(const.OPT_COMMON_ATTACHMENTS_MAX_SIZE, const.DEFAULTS_COMMON_ATTACHMENTS_MAX_SIZE)
+    try:
+        return await hass.async_add_executor_job(
+            DiskAttachmentStore.open,
+            hass.config.path(const.ATTACHMENTS_DIRECTORY, config_entry.entry_id),
+            max_size * 1024 * 1024,
+        )
+    except Exception:
+        _LOGGER.exception("Unable to open attachment store of {}".format(config_entry.title))
+        return None
+
+
+def alerts_queue_from_options(common_options: Dict) -> BoundedAlertQueue:
+    return BoundedAlertQueue(
+        common_options.get(const.OPT_COMMON_ALERTS_QUEUE_SIZE, const.DEFAULTS_COMMON_ALERTS_QUEUE_SIZE),
+        OverflowPolicy(
+            common_options.get(const.OPT_COMMON_ALERTS_OVERFLOW_POLICY, const.DEFAULTS_COMMON_ALERTS_OVERFLOW_POLICY)
+        ),
+        key_func=lambda event: (event.channel_id, event.type),
+    )
+
+
+def state_writer_from_options(hass: HomeAssistant, common_options: Dict) -> StateWriteBatcher:
+    interval = utils.parse_timedelta_or_default(
+        common_options.get(const.OPT_COMMON_STATE_WRITE_INTERVAL, const.DEFAULTS_COMMON_STATE_WRITE_INTERVAL),
+        datetime.timedelta(0),
+    )
+    return StateWriteBatcher(hass.loop, interval.total_seconds())
+
+
 def alertdef_from_channel_options(
     deivce_id: str, config: Dict, channel_num: Optional[str], common_options: Dict
 ) -> List[AlertDef]:
@@ -152,55 +419,78 @@ def alertdef_from_channel_options(
     return res
 
 
-async def process_hikvision_alerts(
-    hass: HomeAssistant, event_stream: Queue, config_entry_id: str, alerts_cfg: List[AlertDef]
+def process_hikvision_alert(
+    hass: HomeAssistant,
+    event: EventNotificationAlert,
+    config_entry_id: str,
+    alerts_index: AlertsIndex,
+    coalescer: Optional[AlertCoalescer] = None,
+    pending_alerts: Optional["PendingAlerts"] = None,
+    snapshot_prefetch: Optional[Callable[[str], None]] = None,
+    journal: Optional[EventJournal] = None,
 ):
-    try:
-        while True:
-            event: EventNotificationAlert = await event_stream.get()
-
-            if event.type == const.AlertType.VideoLoss.value and event.state == const.ALERT_STATE_INACTIVE:
-                continue
-
-            # Finding suitable alert
-            for alert in alerts_cfg:
-                alert_channel = alert.channel
-                if alert_channel is not None:
-                    alert_channel = str(alert_channel)
-                if alert.type.value == event.type and alert_channel == event.channel_id:
-                    _LOGGER.debug(
-                        "CLASSIFIED ALERT: {} \tState: {}, \tChannel: {}/{}, \t Time: {}".format(
-                            event.type, event.state, event.channel_id, event.channel_name, str(event.timestamp)
-                        )
-                    )
-                    async_dispatcher_send(
-                        hass,
-                        const.SIGNAL_ALERT_NAME,
-                        {
-                            const.EVENT_ALERT_DATA_CHANNEL: event.channel_id,
-                            const.EVENT_ALERT_DATA_TYPE: event.type,
-                            const.EVENT_ALERT_DATA_DEVICE: config_entry_id,
-                            const.EVENT_ALERT_DATA_TIMESTAMP: event.timestamp.isoformat(),
-                        },
-                    )
-                    # hass.bus.async_fire(const.EVENT_ALERT_NAME, {
-                    #     const.EVENT_ALERT_DATA_CHANNEL: event.channel_id,
-                    #     const.EVENT_ALERT_DATA_TYPE: event.type,
-                    #     const.EVENT_ALERT_DATA_DEVICE: config_entry_id,
-                    #     const.EVENT_ALERT_DATA_TIMESTAMP: event.timestamp.isoformat(),
-                    # })
-
-            _LOGGER.debug(
-                "ALERT: {} \tState: {}, \tChannel: {}/{}, \t Time: {}".format(
-                    event.type, event.state, event.channel_id, event.channel_name, str(event.timestamp)
-                )
+    if event.type == const.AlertType.VideoLoss.value and event.state == const.ALERT_STATE_INACTIVE:
+        return
+    if coalescer is None or coalescer.should_forward(event):
+        dispatch_hikvision_alert(hass, event, config_entry_id, alerts_index, pending_alerts, snapshot_prefetch)
+    # Journal keeps all the alerts including the ones which are not tracked or coalesced. It is written after
+    # the dispatch by the writer thread, so neither its latency nor its errors affect the sensors
+    if journal is not None:
+        journal.append(event)
+
+
+def dispatch_hikvision_alert(
+    hass: HomeAssistant,
+    event: EventNotificationAlert,
+    config_entry_id: str,
+    alerts_index: AlertsIndex,
+    pending_alerts: Optional["PendingAlerts"] = None,
+    snapshot_prefetch: Optional[Callable[[str], None]] = None,
+):
+    # Finding suitable alert
+    signal_name = alerts_index.get(alert_index_key(event.type, event.channel_id))
+    if signal_name is not None:
+        _LOGGER.debug(
+            "CLASSIFIED ALERT: {} \tState: {}, \tChannel: {}/{}, \t Time: {}".format(
+                event.type, event.state, event.channel_id, event.channel_name, str(event.timestamp)
             )
-    except asyncio.CancelledError:
-        _LOGGER.info("Shutting down hikvision alerts processing for config {}".format(config_entry_id))
+        )
+        data = {
+            const.EVENT_ALERT_DATA_CHANNEL: event.channel_id,
+            const.EVENT_ALERT_DATA_TYPE: event.type,
+            const.EVENT_ALERT_DATA_DEVICE: config_entry_id,
+            const.EVENT_ALERT_DATA_TIMESTAMP: event.timestamp.isoformat(),
+        }
+        if pending_alerts is not None and not pending_alerts.is_ready(signal_name):
+            pending_alerts.hold(signal_name, data)
+        else:
+            async_dispatcher_send(hass, signal_name, data)
+        if snapshot_prefetch is not None and event.state == const.ALERT_STATE_ACTIVE:
+            snapshot_prefetch(event.channel_id)
+        # hass.bus.async_fire(const.EVENT_ALERT_NAME, {
+        #     const.EVENT_ALERT_DATA_CHANNEL: event.channel_id,
+        #     const.EVENT_ALERT_DATA_TYPE: event.type,
+        #     const.EVENT_ALERT_DATA_DEVICE: config_entry_id,
+        #     const.EVENT_ALERT_DATA_TIMESTAMP: event.timestamp.isoformat(),
+        # })
+
+    _LOGGER.debug(
+        "ALERT: {} \tState: {}, \tChannel: {}/{}, \t Time: {}".format(
+            event.type, event.state, event.channel_id, event.channel_name, str(event.timestamp)
+        )
+    )
 
 
 class HikvisionAlertBinarySensor(BinarySensorEntity):
-    def __init__(self, hass: HomeAssistant, sensor_id, sensor_name, alert_def: AlertDef):
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        sensor_id,
+        sensor_name,
+        alert_def: AlertDef,
+        state_writer: StateWriteBatcher,
+        pending_alerts: Optional[PendingAlerts] = None,
+    ):
         self._hass = hass
         self._unique_id = sensor_id
         self._name = sensor_name
@@ -208,11 +498,11 @@ class HikvisionAlertBinarySensor(BinarySensorEntity):
         self._triggered: Optional[bool] = None
         self._last_triggered: Optional[datetime.datetime] = None
         self._recovery_period = alert_def.recovery_period
+        self._expiry_scheduler = get_expiry_scheduler(hass)
+        self._state_writer = state_writer
+        self._pending_alerts = pending_alerts
         # hass.bus.async_listen(const.EVENT_ALERT_NAME, self._on_event_received)
         self._dispose_signal_dispatchers: List[Callable] = []
-        self._dispose_signal_dispatchers.append(
-            async_track_time_interval(hass, self._check_if_state_outdated, datetime.timedelta(seconds=20))
-        )
         _LOGGER.debug("Configured Hikvision Alert sensor {}".format(self.name))
 
     @property
@@ -227,16 +517,19 @@ class HikvisionAlertBinarySensor(BinarySensorEntity):
     def device_class(self):
         return DEVICE_CLASS_MOTION
 
-    async def _handle_alert_signal(self, data: Dict):
-        if not self._match_event(data):
-            return
+    @callback
+    def _handle_alert_signal(self, data: Dict, age: float = 0):
         self._triggered = True
         self._last_triggered = datetime.datetime.fromisoformat(data.get(const.EVENT_ALERT_DATA_TIMESTAMP))
+        # Sensor recovers once there were no alerts during the recovery period
+        self._expiry_scheduler.schedule(
+            self._unique_id, self._recovery_period.total_seconds() - age, self._on_recovery_period_expired
+        )
         _LOGGER.debug("Signal received")
-        self.async_schedule_update_ha_state(True)
+        self._state_writer.mark_dirty(self._unique_id, self)
 
     async def _on_event_received(self, event: Event):
-        await self._handle_alert_signal(event.data)
+        self._handle_alert_signal(event.data)
 
     @property
     def is_on(self):
@@ -254,26 +547,21 @@ class HikvisionAlertBinarySensor(BinarySensorEntity):
         """Disable polling."""
         return False
 
-    def _match_event(self, data: Dict) -> bool:
-        return (
-            data.get(const.EVENT_ALERT_DATA_DEVICE) == self._alert_def.related_device_id
-            and data.get(const.EVENT_ALERT_DATA_TYPE) == self._alert_def.type.value
-            and data.get(const.EVENT_ALERT_DATA_CHANNEL) == str(self._alert_def.channel)
-        )
-
-    async def _check_if_state_outdated(self, arg):
-        if (
-            self._last_triggered is not None
-            and datetime.datetime.now(self._last_triggered.tzinfo) - self._last_triggered < self._recovery_period
-        ):
-            self._triggered = False
-            self.async_schedule_update_ha_state(True)
+    def _on_recovery_period_expired(self):
+        self._triggered = False
+        self._state_writer.mark_dirty(self._unique_id, self)
 
     async def async_added_to_hass(self) -> None:
         # Added to hass so need to register to dispatch signals coming from alerts queue.
+        signal_name = alert_signal_name(self._alert_def)
         self._dispose_signal_dispatchers.append(
-            async_dispatcher_connect(self.hass, const.SIGNAL_ALERT_NAME, self._handle_alert_signal)
+            async_dispatcher_connect(self.hass, signal_name, self._handle_alert_signal)
         )
+        if self._pending_alerts is not None:
+            held = self._pending_alerts.mark_ready(signal_name)
+            if held is not None and held[1] < self._recovery_period.total_seconds():
+                _LOGGER.debug("Replaying alert received before {} was added".format(self.name))
+                self._handle_alert_signal(*held)
 
     async def async_will_remove_from_hass(self):
         _LOGGER.debug("Unloading Hikvision Alert sensor {}".format(self.name))
@@ -281,3 +569,63 @@ class HikvisionAlertBinarySensor(BinarySensorEntity):
         for disposer in self._dispose_signal_dispatchers:
             disposer()
         self._dispose_signal_dispatchers = []
+        if self._pending_alerts is not None:
+            self._pending_alerts.mark_removed(alert_signal_name(self._alert_def))
+        self._expiry_scheduler.cancel(self._unique_id)
+        self._state_writer.forget(self._unique_id)
+
+
+class HikvisionChannelConnectivitySensor(BinarySensorEntity):
+    """Shows whether NVR input is connected. Sensor is unavailable while the status is unknown"""
+
+    def __init__(
+        self,
+        poller: ChannelStatusPoller,
+        state_writer: StateWriteBatcher,
+        sensor_id: str,
+        sensor_name: str,
+        channel_id: str,
+    ):
+        self._poller = poller
+        self._state_writer = state_writer
+        self._unique_id = sensor_id
+        self._name = sensor_name
+        self._channel_id = channel_id
+        self._remove_listener: Optional[Callable] = None
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def device_class(self):
+        return DEVICE_CLASS_CONNECTIVITY
+
+    @property
+    def available(self) -> bool:
+        return self._poller.available and self._poller.is_online(self._channel_id) is not None
+
+    @property
+    def is_on(self):
+        return self._poller.is_online(self._channel_id)
+
+    @property
+    def should_poll(self) -> bool:
+        return False
+
+    @callback
+    def _on_status_changed(self):
+        self._state_writer.mark_dirty(self._unique_id, self)
+
+    async def async_added_to_hass(self) -> None:
+        self._remove_listener = self._poller.add_listener(self._channel_id, self._on_status_changed)
+
+    async def async_will_remove_from_hass(self):
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+        self._state_writer.forget(self._unique_id)
@@ -0,0 +1,116 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import functools
+import logging
+from typing import Optional
+
+from homeassistant.components.camera import Camera
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from . import const, utils
+from .platform_helpers import cameras_enabled, get_inputs_cached, get_snapshot_cache, name_to_id, snapshot_cache_key
+from .snapshot_cache import SnapshotCache
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities):
+    """Set up the platform from config_entry."""
+    common_options = config_entry.options.get(const.OPT_ROOT_COMMON) or {}
+    if not cameras_enabled(common_options):
+        return True
+    max_age = utils.parse_timedelta_or_default(
+        common_options.get(const.OPT_COMMON_SNAPSHOT_MAX_AGE, const.DEFAULTS_COMMON_SNAPSHOT_MAX_AGE),
+        datetime.timedelta(0),
+    )
+    # Channel id, camera id prefix and name prefix
+    channels = [(const.NON_NVR_CHANNEL_NUMBER, None, None)]
+    if config_entry.data.get(const.CONF_DEVICE_TYPE) == const.DEVICE_TYPE_NVR:
+        channels = [
+            (x.input_id, name_to_id(const.SENSOR_ID_PREFIX + str(x.input_id).rjust(2, "0")), x.input_name)
+            for x in await get_inputs_cached(hass, config_entry)
+        ]
+    cache = get_snapshot_cache(hass)
+    cache.reserve(config_entry.entry_id, len(channels))
+    entities = []
+    for channel_id, id_prefix, name_prefix in channels:
+        camera_id = "_".join(filter(None, (name_to_id(config_entry.title), id_prefix, "snapshot")))
+        camera_name = " ".join(filter(None, (config_entry.title, name_prefix)))
+        entities.append(
+            HikvisionSnapshotCamera(hass, cache, config_entry.entry_id, channel_id, camera_id, camera_name, max_age)
+        )
+    async_add_entities(entities)
+    return True
+
+
+class HikvisionSnapshotCamera(Camera):
+    """Shows the latest snapshot of the channel.
+
+    Snapshots are served from the cache shared by all the cameras, so the device is asked for the new image at
+    most once per max age regardless of the number of open dashboards.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        cache: SnapshotCache,
+        config_entry_id: str,
+        channel_id: str,
+        camera_id: str,
+        camera_name: str,
+        max_age: datetime.timedelta,
+    ):
+        super().__init__()
+        self._hass = hass
+        self._cache = cache
+        self._config_entry_id = config_entry_id
+        self._channel_id = channel_id
+        self._unique_id = camera_id
+        self._name = camera_name
+        self._max_age = max_age.total_seconds()
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def name(self):
+        return self._name
+
+    async def async_camera_image(self, width: Optional[int] = None, height: Optional[int] = None) -> Optional[bytes]:
+        entry_data = self._hass.data[const.DOMAIN].get(self._config_entry_id)
+        api_client = entry_data.get(const.DATA_API_CLIENT) if entry_data is not None else None
+        if api_client is None:
+            return None
+        try:
+            return await self._cache.get(
+                snapshot_cache_key(self._config_entry_id, self._channel_id),
+                functools.partial(api_client.get_snapshot, self._channel_id),
+                self._max_age,
+            )
+        except Exception as e:
+            _LOGGER.warning("Unable to get snapshot from {}: {}".format(self.name, e))
+            return None
@@ -0,0 +1,146 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import datetime
+import logging
+from typing import Callable, Dict, List, Optional, Set
+
+import aiohttp
+
+from .isapi.client import ISAPIClient
+from .isapi.model import InputChannelStatus
+
+_LOGGER = logging.getLogger(__name__)
+
+# Responses of the devices which don't provide the status of the inputs
+STATUS_NOT_SUPPORTED_STATUSES = frozenset((403, 404, 405, 501))
+
+StatusListener = Callable[[], None]
+
+
+class ChannelStatusPoller(object):
+    """Tracks connection status of all the NVR inputs with a single request per poll.
+
+    Listeners are notified only about the channels whose status has changed (or about all of them once the device
+    becomes available or unavailable). Poll interval adapts: once something has changed the device is polled
+    every min_interval to catch the follow-up changes quickly, while nothing changes the interval is doubled up to
+    max_interval. Failed polls back off the same way.
+    """
+
+    BACKOFF_MULTIPLIER = 2
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        api_client: ISAPIClient,
+        min_interval: datetime.timedelta,
+        max_interval: datetime.timedelta,
+    ) -> None:
+        self.api_client = api_client
+        self.min_interval = min_interval.total_seconds()
+        self.max_interval = max(self.min_interval, max_interval.total_seconds())
+        self.interval = self.min_interval
+        self.available = False
+        self.supported = True
+        self.polls = 0
+        self.statuses: Dict[str, bool] = {}
+        self._loop = loop
+        self._listeners: Dict[str, List[StatusListener]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def is_online(self, channel_id: str) -> Optional[bool]:
+        return self.statuses.get(channel_id)
+
+    def add_listener(self, channel_id: str, listener: StatusListener) -> Callable[[], None]:
+        """Returns a function removing the listener"""
+        listeners = self._listeners.setdefault(channel_id, [])
+        listeners.append(listener)
+        return lambda: listeners.remove(listener) if listener in listeners else None
+
+    def start(self):
+        if self._task is None:
+            self._task = self._loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def async_poll(self) -> Set[str]:
+        """Fetches statuses of all the channels, returns ids of the channels which have changed"""
+        statuses: List[InputChannelStatus] = await self.api_client.get_inputs_status()
+        self.polls += 1
+        current = {x.input_id: bool(x.online) for x in statuses}
+        if not self.available:
+            changed = set(current.keys()) | set(self.statuses.keys())
+        else:
+            changed = {
+                x for x in set(current.keys()) | set(self.statuses.keys()) if current.get(x) != self.statuses.get(x)
+            }
+        self.statuses = current
+        self.available = True
+        self._notify(changed)
+        return changed
+
+    async def _run(self):
+        while True:
+            try:
+                changed = await self.async_poll()
+            except asyncio.CancelledError:
+                raise
+            except aiohttp.ClientResponseError as e:
+                if e.status in STATUS_NOT_SUPPORTED_STATUSES:
+                    _LOGGER.warning(
+                        "Device doesn't report status of inputs (HTTP {}), polling stopped".format(e.status)
+                    )
+                    self.supported = False
+                    self._set_unavailable()
+                    return
+                self._on_poll_failed(e)
+            except Exception as e:
+                self._on_poll_failed(e)
+            else:
+                self.interval = self.min_interval if changed else self._next_interval()
+            await asyncio.sleep(self.interval)
+
+    def _next_interval(self) -> float:
+        return min(self.interval * self.BACKOFF_MULTIPLIER, self.max_interval)
+
+    def _on_poll_failed(self, e: Exception):
+        if self.available:
+            _LOGGER.warning("Unable to get status of inputs: {}".format(e))
+        else:
+            _LOGGER.debug("Unable to get status of inputs: {}".format(e))
+        self.interval = self._next_interval()
+        self._set_unavailable()
+
+    def _set_unavailable(self):
+        if self.available:
+            self.available = False
+            self._notify(set(self.statuses.keys()))
+
+    def _notify(self, channel_ids: Set[str]):
+        for channel_id in channel_ids:
+            for listener in list(self._listeners.get(channel_id, ())):
+                listener()
@@ -0,0 +1,53 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import time
+from typing import Dict, Hashable, Tuple
+
+from .isapi.model import EventNotificationAlert
+
+
+class AlertCoalescer(object):
+    """Suppresses repeated alerts.
+
+    While the alert condition persists devices re-send the same alert about every second. Within the window only
+    the first alert of each (channel, type) is forwarded as well as any state transition. The first repeat
+    received after the window is over is forwarded as keep-alive, so the window must be shorter than the
+    recovery period of the sensors.
+    """
+
+    def __init__(self, window: datetime.timedelta) -> None:
+        self.window = window.total_seconds()
+        self.suppressed = 0
+        self._last_forwarded: Dict[Hashable, Tuple[str, float]] = {}
+
+    def should_forward(self, event: EventNotificationAlert) -> bool:
+        key = (event.channel_id, event.type)
+        now = time.monotonic()
+        last = self._last_forwarded.get(key)
+        if last is not None and last[0] == event.state and now - last[1] < self.window:
+            self.suppressed += 1
+            return False
+        self._last_forwarded[key] = (event.state, now)
+        return True
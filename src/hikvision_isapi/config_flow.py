@@ -22,7 +22,7 @@
 #    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import logging
-from typing import Dict
+from typing import Dict, List, Optional
 
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
@@ -31,6 +31,7 @@ from homeassistant.core import callback
 
 from . import const, utils
 from .isapi.client import ISAPIClient
+from .isapi.model import InputChannel
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -69,6 +70,9 @@ class HikvisionFlowHandler(config_entries.ConfigFlow, domain=const.DOMAIN):
                     vol.Required(const.CONF_BASE_URL, default=user_input.get(const.CONF_BASE_URL)): str,
                     vol.Optional(const.CONF_USER, default=user_input.get(const.CONF_USER)): str,
                     vol.Optional(const.CONF_PASSWORD, default=user_input.get(const.CONF_PASSWORD)): str,
+                    vol.Optional(
+                        const.CONF_AUTH_TYPE, default=user_input.get(const.CONF_AUTH_TYPE, const.AUTH_TYPE_BASIC)
+                    ): vol.In(const.AUTH_TYPES_MAP),
                     vol.Optional(
                         const.CONF_IGNORE_SSL_ERRORS, default=user_input.get(const.CONF_IGNORE_SSL_ERRORS, False)
                     ): bool,
@@ -99,6 +103,15 @@ class HikvisionOptionsFlowHandler(config_entries.OptionsFlow):
     def is_nvr(self) -> bool:
         return self.config_entry.data.get(const.CONF_DEVICE_TYPE) == const.DEVICE_TYPE_NVR
 
+    async def get_available_inputs(self) -> List[InputChannel]:
+        """Client of the loaded entry is reused, so the list is served from its cache while the menu is reopened"""
+        entry_data = self.hass.data.get(const.DOMAIN, {}).get(self.config_entry.entry_id) or {}
+        api_client: Optional[ISAPIClient] = entry_data.get(const.DATA_API_CLIENT)
+        if api_client is not None:
+            return await api_client.get_available_inputs()
+        async with utils.api_client_from_config(self.config_entry.data) as hik_client:
+            return await hik_client.get_available_inputs()
+
     async def async_step_init(self, user_input=None):
 
         errors = {}
@@ -116,11 +129,10 @@ class HikvisionOptionsFlowHandler(config_entries.OptionsFlow):
         # For NVRs we have to render a page for each channel
         if self.is_nvr():
             try:
-                async with utils.api_client_from_config(self.config_entry.data) as hik_client:
-                    inputs = await hik_client.get_available_inputs()
-                    config_pages_dict.update(
-                        {const.EDIT_INPUT_PREFIX + x.input_id: "Alerts: " + x.input_name for x in inputs}
-                    )
+                inputs = await self.get_available_inputs()
+                config_pages_dict.update(
+                    {const.EDIT_INPUT_PREFIX + x.input_id: "Alerts: " + x.input_name for x in inputs}
+                )
             except Exception as e:
                 utils.handle_hik_client_error(e, errors, _LOGGER)
         else:
@@ -139,9 +151,7 @@ class HikvisionOptionsFlowHandler(config_entries.OptionsFlow):
         errors = {}
 
         if user_input is not None:
-            # Validate input
-            if not utils.parse_timedelta_or_default(user_input.get(const.OPT_COMMON_DEFAULT_RECOVERY_PERIOD), None):
-                errors[const.OPT_COMMON_DEFAULT_RECOVERY_PERIOD] = "invalid_period"
+            errors = self.validate_common_settings(user_input)
             if len(errors.keys()) == 0:
                 return self.preserve_options_section(const.OPT_ROOT_COMMON, user_input)
 
@@ -151,6 +161,82 @@ class HikvisionOptionsFlowHandler(config_entries.OptionsFlow):
                 description={"suggested_value": current.get(const.OPT_COMMON_DEFAULT_RECOVERY_PERIOD)},
                 default=const.DEFAULTS_COMMON_DEFAULT_RECOVERY_PERIOD,
             ): str,
+            vol.Optional(
+                const.OPT_COMMON_ALERTS_QUEUE_SIZE,
+                default=current.get(const.OPT_COMMON_ALERTS_QUEUE_SIZE, const.DEFAULTS_COMMON_ALERTS_QUEUE_SIZE),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(
+                const.OPT_COMMON_ALERTS_OVERFLOW_POLICY,
+                default=current.get(
+                    const.OPT_COMMON_ALERTS_OVERFLOW_POLICY, const.DEFAULTS_COMMON_ALERTS_OVERFLOW_POLICY
+                ),
+            ): vol.In(const.ALERTS_OVERFLOW_POLICIES_MAP),
+            vol.Optional(
+                const.OPT_COMMON_COALESCE_WINDOW,
+                description={"suggested_value": current.get(const.OPT_COMMON_COALESCE_WINDOW)},
+                default=const.DEFAULTS_COMMON_COALESCE_WINDOW,
+            ): str,
+            vol.Optional(
+                const.OPT_COMMON_STATE_WRITE_INTERVAL,
+                description={"suggested_value": current.get(const.OPT_COMMON_STATE_WRITE_INTERVAL)},
+                default=const.DEFAULTS_COMMON_STATE_WRITE_INTERVAL,
+            ): str,
+            vol.Optional(
+                const.OPT_COMMON_EVENT_SUBSCRIPTION,
+                default=current.get(const.OPT_COMMON_EVENT_SUBSCRIPTION, const.DEFAULTS_COMMON_EVENT_SUBSCRIPTION),
+            ): bool,
+            vol.Optional(
+                const.OPT_COMMON_INGESTION_MODE,
+                default=current.get(const.OPT_COMMON_INGESTION_MODE, const.DEFAULTS_COMMON_INGESTION_MODE),
+            ): vol.In(const.INGESTION_MODES_MAP),
+            vol.Optional(
+                const.OPT_COMMON_PUSH_BASE_URL,
+                description={"suggested_value": current.get(const.OPT_COMMON_PUSH_BASE_URL)},
+                default=const.DEFAULTS_COMMON_PUSH_BASE_URL,
+            ): str,
+            vol.Optional(
+                const.OPT_COMMON_ENABLE_CAMERAS,
+                default=current.get(const.OPT_COMMON_ENABLE_CAMERAS, const.DEFAULTS_COMMON_ENABLE_CAMERAS),
+            ): bool,
+            vol.Optional(
+                const.OPT_COMMON_SNAPSHOT_MAX_AGE,
+                description={"suggested_value": current.get(const.OPT_COMMON_SNAPSHOT_MAX_AGE)},
+                default=const.DEFAULTS_COMMON_SNAPSHOT_MAX_AGE,
+            ): str,
+            vol.Optional(
+                const.OPT_COMMON_SNAPSHOT_PREFETCH,
+                default=current.get(const.OPT_COMMON_SNAPSHOT_PREFETCH, const.DEFAULTS_COMMON_SNAPSHOT_PREFETCH),
+            ): bool,
+            vol.Optional(
+                const.OPT_COMMON_ENABLE_CHANNEL_STATUS,
+                default=current.get(
+                    const.OPT_COMMON_ENABLE_CHANNEL_STATUS, const.DEFAULTS_COMMON_ENABLE_CHANNEL_STATUS
+                ),
+            ): bool,
+            vol.Optional(
+                const.OPT_COMMON_CHANNEL_STATUS_INTERVAL,
+                description={"suggested_value": current.get(const.OPT_COMMON_CHANNEL_STATUS_INTERVAL)},
+                default=const.DEFAULTS_COMMON_CHANNEL_STATUS_INTERVAL,
+            ): str,
+            vol.Optional(
+                const.OPT_COMMON_ENABLE_JOURNAL,
+                default=current.get(const.OPT_COMMON_ENABLE_JOURNAL, const.DEFAULTS_COMMON_ENABLE_JOURNAL),
+            ): bool,
+            vol.Optional(
+                const.OPT_COMMON_JOURNAL_MAX_SIZE,
+                default=current.get(const.OPT_COMMON_JOURNAL_MAX_SIZE, const.DEFAULTS_COMMON_JOURNAL_MAX_SIZE),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(
+                const.OPT_COMMON_SAVE_ATTACHMENTS,
+                default=current.get(const.OPT_COMMON_SAVE_ATTACHMENTS, const.DEFAULTS_COMMON_SAVE_ATTACHMENTS),
+            ): bool,
+            vol.Optional(
+                const.OPT_COMMON_ATTACHMENTS_MAX_SIZE,
+                default=current.get(const.OPT_COMMON_ATTACHMENTS_MAX_SIZE, const.DEFAULTS_COMMON_ATTACHMENTS_MAX_SIZE),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(
+                const.OPT_COMMON_ENABLE_DIAGNOSTICS, default=current.get(const.OPT_COMMON_ENABLE_DIAGNOSTICS, False)
+            ): bool,
         }
 
         # For NVRs we need channel selector
@@ -173,6 +259,29 @@ class HikvisionOptionsFlowHandler(config_entries.OptionsFlow):
             step_id="common_settings", data_schema=vol.Schema(schema_dict), description_placeholders={}, errors=errors
         )
 
+    @staticmethod
+    def validate_common_settings(user_input: Dict) -> Dict[str, str]:
+        errors = {}
+        recovery_period = utils.parse_timedelta_or_default(
+            user_input.get(const.OPT_COMMON_DEFAULT_RECOVERY_PERIOD), None
+        )
+        if not recovery_period:
+            errors[const.OPT_COMMON_DEFAULT_RECOVERY_PERIOD] = "invalid_period"
+        coalesce_window = utils.parse_timedelta_or_default(user_input.get(const.OPT_COMMON_COALESCE_WINDOW), None)
+        if coalesce_window is None:
+            errors[const.OPT_COMMON_COALESCE_WINDOW] = "invalid_period"
+        elif recovery_period and coalesce_window >= recovery_period:
+            # Repeated alerts are suppressed for the whole window, so sensor would recover while alert is still on
+            errors[const.OPT_COMMON_COALESCE_WINDOW] = "coalesce_window_too_long"
+        for period_option in (
+            const.OPT_COMMON_STATE_WRITE_INTERVAL,
+            const.OPT_COMMON_SNAPSHOT_MAX_AGE,
+            const.OPT_COMMON_CHANNEL_STATUS_INTERVAL,
+        ):
+            if utils.parse_timedelta_or_default(user_input.get(period_option), None) is None:
+                errors[period_option] = "invalid_period"
+        return errors
+
     async def async_step_alerts(self, user_input: Dict = None, channel: str = None):
         if user_input is None:
             options_key_name = const.OPT_ROOT_ALERTS + (channel or "")
@@ -21,32 +21,54 @@
 #    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 #    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+import datetime
 import enum
 
 DOMAIN = "hikvision_isapi"
-PLATFORMS = ("binary_sensor",)
+PLATFORMS = ("binary_sensor", "sensor", "camera")
 
 DATA_API_CLIENT = "api_client"
 UNDO_UPDATE_CONF_UPDATE_LISTENER = "undo_config_update_listener"
 
 #####
 DATA_EVENT_STREAM = "event_stream"
-DATA_ALERTS_BG_TASKS = "alerts_bg_tasks"
-DATA_ALERTS_QUEUE = "alerts_queue"
+DATA_STREAM_SUPERVISOR = "stream_supervisor"
+DATA_EXPIRY_SCHEDULER = "expiry_scheduler"
+DATA_STATE_WRITER = "state_writer"
+DATA_DEVICE_CACHE = "device_cache"
+DATA_DEVICE_CACHE_REFRESH = "device_cache_refresh"
+DATA_SNAPSHOT_CACHE = "snapshot_cache"
+DATA_CHANNEL_STATUS_POLLER = "channel_status_poller"
+DATA_JOURNAL = "journal"
+DATA_JOURNAL_VIEW_REGISTERED = "journal_view_registered"
+DATA_ATTACHMENT_STORE = "attachment_store"
 DATA_ENTITIES = "entities"
 #####
 DATA_HAS_SUBSCRIBERS = "has_subscribers"
 DATA_ALERT_CONFIGS = "alert_configs"
 DATA_BG_TASKS = "bg_tasks"
+DATA_PUSH_TOKENS = "push_tokens"
+DATA_PUSH_TOKEN = "push_token"
+DATA_PUSH_VIEW_REGISTERED = "push_view_registered"
+
+STORAGE_KEY_DEVICE_CACHE = DOMAIN + "_devices"
 
 CONF_BASE_URL = "base_url"
 CONF_USER = "username"
 CONF_PASSWORD = "password"
 CONF_IGNORE_SSL_ERRORS = "ignore_ssl_errors"
+CONF_AUTH_TYPE = "auth_type"
 CONF_DEVICE_TYPE = "device_type"
 
 DEVICE_TYPE_NVR = "NVR"
 
+AUTH_TYPE_BASIC = "basic"
+AUTH_TYPE_DIGEST = "digest"
+AUTH_TYPES_MAP = {
+    AUTH_TYPE_BASIC: "Basic",
+    AUTH_TYPE_DIGEST: "Digest",
+}
+
 EDIT_COMMON_SETTINGS = "common"
 EDIT_INPUT_PREFIX = "input_settings"
 
@@ -56,12 +78,73 @@ OPT_ROOT_ALERTS = "alerts"
 
 OPT_COMMON_DEFAULT_RECOVERY_PERIOD = "default_recovery_period"
 OPT_COMMON_ALERT_INPUTS = "alert_inputs"
+OPT_COMMON_ALERTS_QUEUE_SIZE = "alerts_queue_size"
+OPT_COMMON_ALERTS_OVERFLOW_POLICY = "alerts_overflow_policy"
+OPT_COMMON_COALESCE_WINDOW = "coalesce_window"
+OPT_COMMON_ENABLE_DIAGNOSTICS = "enable_diagnostics"
+OPT_COMMON_STATE_WRITE_INTERVAL = "state_write_interval"
+OPT_COMMON_EVENT_SUBSCRIPTION = "event_subscription"
+OPT_COMMON_INGESTION_MODE = "ingestion_mode"
+OPT_COMMON_PUSH_BASE_URL = "push_base_url"
+OPT_COMMON_ENABLE_CAMERAS = "enable_cameras"
+OPT_COMMON_SNAPSHOT_MAX_AGE = "snapshot_max_age"
+OPT_COMMON_SNAPSHOT_PREFETCH = "snapshot_prefetch"
+OPT_COMMON_ENABLE_CHANNEL_STATUS = "enable_channel_status"
+OPT_COMMON_CHANNEL_STATUS_INTERVAL = "channel_status_interval"
+OPT_COMMON_ENABLE_JOURNAL = "enable_journal"
+OPT_COMMON_JOURNAL_MAX_SIZE = "journal_max_size"
+OPT_COMMON_SAVE_ATTACHMENTS = "save_attachments"
+OPT_COMMON_ATTACHMENTS_MAX_SIZE = "attachments_max_size"
 
 OPT_ALERTS_ALERT_TYPES = "alert_types"
 OPT_ALERTS_ENABLE_TRACKING = "enable_tracking"
 
 
 DEFAULTS_COMMON_DEFAULT_RECOVERY_PERIOD = "00:01:00"
+DEFAULTS_COMMON_ALERTS_QUEUE_SIZE = 1000
+DEFAULTS_COMMON_ALERTS_OVERFLOW_POLICY = "drop_oldest"
+# Zero disables coalescing
+DEFAULTS_COMMON_COALESCE_WINDOW = "00:00:00"
+# Zero means that states are written once per event loop iteration
+DEFAULTS_COMMON_STATE_WRITE_INTERVAL = "00:00:00"
+DEFAULTS_COMMON_EVENT_SUBSCRIPTION = True
+DEFAULTS_COMMON_INGESTION_MODE = "stream"
+# Empty means the internal URL of Home Assistant
+DEFAULTS_COMMON_PUSH_BASE_URL = ""
+DEFAULTS_COMMON_ENABLE_CAMERAS = False
+DEFAULTS_COMMON_SNAPSHOT_MAX_AGE = "00:00:10"
+DEFAULTS_COMMON_SNAPSHOT_PREFETCH = False
+DEFAULTS_COMMON_ENABLE_CHANNEL_STATUS = False
+# Max interval, the status is polled more often for a while once any channel has changed
+DEFAULTS_COMMON_CHANNEL_STATUS_INTERVAL = "00:01:00"
+CHANNEL_STATUS_MIN_INTERVAL = datetime.timedelta(seconds=5)
+DEFAULTS_COMMON_ENABLE_JOURNAL = False
+# MiB
+DEFAULTS_COMMON_JOURNAL_MAX_SIZE = 64
+DEFAULTS_COMMON_SAVE_ATTACHMENTS = False
+# MiB
+DEFAULTS_COMMON_ATTACHMENTS_MAX_SIZE = 256
+
+ALERTS_OVERFLOW_POLICIES_MAP = {
+    "drop_oldest": "Drop oldest alerts",
+    "drop_newest": "Drop newest alerts",
+    "coalesce": "Keep the latest alert per channel and type",
+    "block": "Pause reading the stream",
+}
+
+INGESTION_MODE_STREAM = "stream"
+INGESTION_MODE_PUSH = "push"
+INGESTION_MODES_MAP = {
+    INGESTION_MODE_STREAM: "Alert stream per device",
+    INGESTION_MODE_PUSH: "Device posts alerts to Home Assistant",
+}
+
+PUSH_VIEW_URL = "/api/" + DOMAIN + "/notify/{token}"
+JOURNAL_VIEW_URL = "/api/" + DOMAIN + "/journal/{entry_id}"
+# Relative to HA config directory, each entry has its own subdirectory
+JOURNAL_DIRECTORY = DOMAIN + "_journal"
+# Pictures sent by devices along with alerts, relative to HA config directory as well
+ATTACHMENTS_DIRECTORY = DOMAIN + "_attachments"
 
 NON_NVR_CHANNEL_NUMBER = "1"
 
@@ -134,3 +217,19 @@ EVENT_ALERT_DATA_DEVICE = "device"
 EVENT_ALERT_DATA_TIMESTAMP = "timestamp"
 
 ATTR_LAST_TRIGGERED_TIME = "last_triggered"
+ATTR_STREAM_CONNECTED = "connected"
+
+ENTITY_CATEGORY_DIAGNOSTIC = "diagnostic"
+
+# Metric key: (name, unit of measurement)
+DIAGNOSTIC_METRICS = {
+    "events_per_second": ("Events Rate", "events/s"),
+    "bytes_per_second": ("Stream Bandwidth", "B/s"),
+    "parse_time_ms": ("Parse Time", "ms"),
+    "queue_depth": ("Queue Depth", "events"),
+    "reconnects": ("Reconnects", None),
+    "last_heartbeat_age": ("Last Heartbeat Age", "s"),
+    "dropped_events": ("Dropped Events", "events"),
+    "dispatch_latency_ms": ("Dispatch Latency", "ms"),
+    "handler_time_ms": ("Alert Processing Time", "ms"),
+}
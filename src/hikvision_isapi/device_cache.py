@@ -0,0 +1,101 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import datetime
+import logging
+from typing import Any, Dict, List, Optional
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .isapi.model import InputChannel
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10
+
+KEY_INPUTS = "inputs"
+KEY_PUSH_TOKEN = "push_token"
+KEY_UPDATED = "updated"
+
+
+class DeviceCache(object):
+    """Persists input channels and the push token of each config entry in HA storage.
+
+    Allows to create entities on startup without waiting for the devices, the cache is refreshed in background.
+    Push token is kept so the device configured to post alerts keeps working after restart.
+    All the entries share a single storage file which is loaded once, writes are delayed so refresh of many devices
+    ends up with a single save.
+    """
+
+    def __init__(self, hass: HomeAssistant, storage_key: str) -> None:
+        self._store = Store(hass, STORAGE_VERSION, storage_key)
+        self._data: Optional[Dict[str, Dict[str, Any]]] = None
+        self._load_lock = asyncio.Lock()
+
+    async def async_load(self):
+        async with self._load_lock:
+            if self._data is not None:
+                return
+            try:
+                self._data = await self._store.async_load() or {}
+            except Exception:
+                _LOGGER.exception("Unable to load cached hikvision devices data, cache will be rebuilt")
+                self._data = {}
+
+    def get_inputs(self, entry_id: str) -> Optional[List[InputChannel]]:
+        raw = self._entry(entry_id).get(KEY_INPUTS)
+        return [InputChannel.from_xml_dict(x) for x in raw] if raw is not None else None
+
+    def update(self, entry_id: str, inputs: List[InputChannel]):
+        entry = self._data.setdefault(entry_id, {})
+        entry[KEY_INPUTS] = [x.to_xml_dict() for x in inputs]
+        entry[KEY_UPDATED] = datetime.datetime.now().isoformat()
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    def get_push_token(self, entry_id: str) -> Optional[str]:
+        return self._entry(entry_id).get(KEY_PUSH_TOKEN)
+
+    async def async_set_push_token(self, entry_id: str, token: str):
+        """Token is saved right away as the device is configured with it"""
+        self._data.setdefault(entry_id, {})[KEY_PUSH_TOKEN] = token
+        await self._store.async_save(self._data_to_save())
+
+    async def async_remove(self, entry_id: str):
+        await self.async_load()
+        if self._data.pop(entry_id, None) is not None:
+            self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    def _entry(self, entry_id: str) -> Dict[str, Any]:
+        if self._data is None:
+            raise RuntimeError("Device cache is not loaded")
+        return self._data.get(entry_id, {})
+
+    def _data_to_save(self) -> Dict[str, Dict[str, Any]]:
+        return self._data
+
+
+def inputs_changed(cached: List[InputChannel], actual: List[InputChannel]) -> bool:
+    return [(x.input_id, x.input_name) for x in cached] != [(x.input_id, x.input_name) for x in actual]
@@ -0,0 +1,111 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Expiry(object):
+    __slots__ = ("deadline", "callback", "seq")
+
+    def __init__(self, deadline: float, callback: Callable[[], None], seq: int) -> None:
+        self.deadline = deadline
+        self.callback = callback
+        self.seq = seq
+
+
+class ExpiryScheduler(object):
+    """Fires callbacks at their deadlines using a single event loop timer.
+
+    Deadlines are kept in a heap with at most one live entry per key. Postponing the deadline (the usual case
+    when alert is re-triggered) only updates the record, the heap entry is moved when it reaches the top.
+    Idle keys cost nothing and the timer is armed only for the earliest deadline.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._expiries: Dict[Hashable, _Expiry] = {}
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_when: Optional[float] = None
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[], None]):
+        """Invokes callback in `delay` seconds unless rescheduled or cancelled before"""
+        deadline = self._loop.time() + delay
+        expiry = self._expiries.get(key)
+        if expiry is not None and deadline >= expiry.deadline:
+            expiry.deadline = deadline
+            expiry.callback = callback
+            return
+        expiry = _Expiry(deadline, callback, next(self._seq))
+        self._expiries[key] = expiry
+        heapq.heappush(self._heap, (deadline, expiry.seq, key))
+        self._arm()
+
+    def cancel(self, key: Hashable):
+        # Heap entry becomes orphan and will be discarded once popped
+        self._expiries.pop(key, None)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._heap.clear()
+        self._expiries.clear()
+
+    def _arm(self):
+        if not self._heap:
+            return
+        when = self._heap[0][0]
+        if self._timer is not None:
+            if self._timer_when <= when:
+                return
+            self._timer.cancel()
+        self._timer_when = when
+        self._timer = self._loop.call_at(when, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        now = self._loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            expiry = self._expiries.get(key)
+            if expiry is None or expiry.seq != seq:
+                continue
+            if expiry.deadline > now:
+                # Deadline was postponed after the entry had been pushed
+                expiry.seq = next(self._seq)
+                heapq.heappush(self._heap, (expiry.deadline, expiry.seq, key))
+                continue
+            del self._expiries[key]
+            try:
+                expiry.callback()
+            except Exception:
+                _LOGGER.exception("Error in expiry callback")
+        self._arm()
@@ -0,0 +1,168 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import enum
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+__all__ = ["OverflowPolicy", "BoundedAlertQueue"]
+
+LOGGER = logging.getLogger("Hikvision_ISAPIClient")
+
+
+class OverflowPolicy(enum.Enum):
+    DropOldest = "drop_oldest"
+    DropNewest = "drop_newest"
+    CoalesceByKey = "coalesce"
+    Block = "block"
+
+
+class BoundedAlertQueue(object):
+    """Bounded FIFO queue for the alerts read from the stream. Interface is compatible with asyncio.Queue.
+
+    When queue is full the behavior depends on the overflow policy:
+        * DropOldest - the oldest pending item is discarded to make room for the new one
+        * DropNewest - the new item is discarded
+        * CoalesceByKey - the new item replaces pending item with the same key (regardless of the queue size),
+            when there is no such item the oldest one is discarded
+        * Block - producer waits until there is a free slot. Stream reader stops reading the socket, so the
+            backpressure is propagated to the device via TCP flow control
+
+    Items are stamped when queued, `last_wait` is the time the last item returned by get spent in the queue.
+    Coalesced item keeps the stamp of the item it replaced.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        policy: OverflowPolicy = OverflowPolicy.DropOldest,
+        key_func: Optional[Callable[[Any], Hashable]] = None,
+    ) -> None:
+        if maxsize <= 0:
+            raise ValueError("Queue size must be positive")
+        if policy == OverflowPolicy.CoalesceByKey and key_func is None:
+            raise ValueError("Key function is required for coalescing queue")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key_func = key_func
+        self.dropped = 0
+        self.coalesced = 0
+        self.on_put: Optional[Callable[[], None]] = None
+        self.last_wait: Optional[float] = None
+        # Entries are mutable [key, item, queued_at] lists so coalesced item could be replaced in place keeping
+        # its position
+        self._entries: Deque[List] = deque()
+        self._by_key: Dict[Hashable, List] = {}
+        self._getters: Deque[asyncio.Future] = deque()
+        self._putters: Deque[asyncio.Future] = deque()
+
+    def qsize(self) -> int:
+        return len(self._entries)
+
+    def empty(self) -> bool:
+        return not self._entries
+
+    def full(self) -> bool:
+        return len(self._entries) >= self.maxsize
+
+    def put_nowait(self, item: Any):
+        """Puts the item applying the overflow policy. Raises asyncio.QueueFull for blocking queue only"""
+        key = None
+        if self.policy == OverflowPolicy.CoalesceByKey:
+            key = self.key_func(item)
+            entry = self._by_key.get(key)
+            if entry is not None:
+                entry[1] = item
+                self.coalesced += 1
+                return
+        if self.full():
+            if self.policy == OverflowPolicy.Block:
+                raise asyncio.QueueFull()
+            self.dropped += 1
+            if self.policy == OverflowPolicy.DropNewest:
+                return
+            self._pop_entry()
+        entry = [key, item, time.perf_counter()]
+        self._entries.append(entry)
+        if key is not None:
+            self._by_key[key] = entry
+        self._wakeup_next(self._getters)
+        if self.on_put is not None:
+            self.on_put()
+
+    async def put(self, item: Any):
+        while self.policy == OverflowPolicy.Block and self.full():
+            putter = asyncio.get_event_loop().create_future()
+            self._putters.append(putter)
+            try:
+                await putter
+            except asyncio.CancelledError:
+                putter.cancel()
+                if not self.full() and not putter.cancelled():
+                    self._wakeup_next(self._putters)
+                raise
+        self.put_nowait(item)
+
+    def get_nowait(self) -> Any:
+        if not self._entries:
+            raise asyncio.QueueEmpty()
+        item, queued_at = self._pop_entry()
+        self.last_wait = time.perf_counter() - queued_at
+        self._wakeup_next(self._putters)
+        return item
+
+    async def get(self) -> Any:
+        while not self._entries:
+            getter = asyncio.get_event_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except asyncio.CancelledError:
+                getter.cancel()
+                if self._entries and not getter.cancelled():
+                    self._wakeup_next(self._getters)
+                raise
+        return self.get_nowait()
+
+    def clear(self):
+        self._entries.clear()
+        self._by_key.clear()
+        while self._putters:
+            self._wakeup_next(self._putters)
+
+    def _pop_entry(self) -> Tuple[Any, float]:
+        key, item, queued_at = self._entries.popleft()
+        if key is not None:
+            self._by_key.pop(key, None)
+        return item, queued_at
+
+    @staticmethod
+    def _wakeup_next(waiters: Deque[asyncio.Future]):
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
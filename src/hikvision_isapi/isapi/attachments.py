@@ -0,0 +1,325 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import logging
+import os
+import re
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from .background_writer import BackgroundWriter
+from .model import EventNotificationAlert
+from .multipart import MultipartPartChunk
+
+__all__ = ["EventAttachment", "AttachmentWriter", "AttachmentSink", "AttachmentReceiver", "DiskAttachmentStore"]
+
+LOGGER = logging.getLogger("Hikvision_ISAPIClient")
+
+PARTIAL_SUFFIX = ".part"
+DEFAULT_EXTENSION = ".bin"
+CONTENT_TYPE_EXTENSIONS = {"image/jpeg": ".jpg", "image/jpg": ".jpg", "image/png": ".png", "image/bmp": ".bmp"}
+
+_DISPOSITION_PARAM_RE = re.compile(r'(\w+)\s*=\s*"?([^";]*)"?')
+_UNSAFE_NAME_CHARS_RE = re.compile(r"[^A-Za-z0-9_]+")
+_EXTENSION_RE = re.compile(r"\.[A-Za-z0-9]{1,5}$")
+
+
+class EventAttachment(object):
+    """Binary part of the alert stream (e.g. picture of the detected face, plate or line crossing).
+
+    Devices send pictures right after the alert they belong to, so the attachment is linked to the last alert
+    received before it. Event is None if the part is the first one in the stream.
+    """
+
+    def __init__(self, event: Optional[EventNotificationAlert], headers: Dict[str, str]) -> None:
+        self.event = event
+        self.content_type: Optional[str] = headers.get("content-type")
+        disposition = dict(_DISPOSITION_PARAM_RE.findall(headers.get("content-disposition", "")))
+        self.name: Optional[str] = disposition.get("filename") or disposition.get("name") or headers.get("content-id")
+        self.size = 0
+        # Set by the sink once the attachment is stored, might be set later than the attachment is received
+        self.location: Optional[str] = None
+
+    @property
+    def extension(self) -> str:
+        media_type = (self.content_type or "").split(";")[0].strip().lower()
+        if media_type in CONTENT_TYPE_EXTENSIONS:
+            return CONTENT_TYPE_EXTENSIONS[media_type]
+        match = _EXTENSION_RE.search(self.name or "")
+        return match.group(0).lower() if match is not None else DEFAULT_EXTENSION
+
+
+class AttachmentWriter(object):
+    """Receives payload of a single attachment chunk by chunk, chunks are only valid during the call of write"""
+
+    def write(self, data: memoryview):
+        raise NotImplementedError()
+
+    def close(self):
+        """Called once the whole payload is written"""
+        raise NotImplementedError()
+
+    def abort(self):
+        """Called if the stream is broken before the end of the payload"""
+        raise NotImplementedError()
+
+
+class AttachmentSink(object):
+    """Destination of the attachments received from the device"""
+
+    def open_attachment(self, attachment: EventAttachment) -> Optional[AttachmentWriter]:
+        """Returns the writer for the attachment payload or None if the attachment should be skipped"""
+        raise NotImplementedError()
+
+
+class AttachmentReceiver(object):
+    """Passes payload chunks of the binary parts to the sink.
+
+    Payload is never accumulated, so the memory used doesn't depend on the attachment size. Errors of the sink are
+    logged and the attachment is skipped, they never break the stream.
+    """
+
+    def __init__(self, sink: Optional[AttachmentSink]) -> None:
+        self.sink = sink
+        self._attachment: Optional[EventAttachment] = None
+        self._writer: Optional[AttachmentWriter] = None
+
+    def feed(self, chunk: MultipartPartChunk, event: Optional[EventNotificationAlert]) -> Optional[EventAttachment]:
+        """Returns the attachment once its last chunk is received"""
+        if chunk.offset == 0:
+            self.abort()
+            self._attachment = EventAttachment(event, chunk.headers)
+            self._writer = self.__call(self.sink.open_attachment, self._attachment) if self.sink is not None else None
+        attachment = self._attachment
+        if attachment is None:
+            # Can't happen unless chunks of the part are lost
+            return None
+        attachment.size += len(chunk.data)
+        if self._writer is not None and len(chunk.data) > 0:
+            self.__call(self._writer.write, chunk.data, on_error=self.abort)
+        if not chunk.last:
+            return None
+        if self._writer is not None:
+            self.__call(self._writer.close)
+        self._attachment = None
+        self._writer = None
+        return attachment
+
+    def abort(self):
+        writer, self._writer, self._attachment = self._writer, None, None
+        if writer is not None:
+            self.__call(writer.abort)
+
+    @staticmethod
+    def __call(func, *args, on_error=None):
+        try:
+            return func(*args)
+        except Exception:
+            LOGGER.exception("Unable to store alert attachment")
+            if on_error is not None:
+                on_error()
+        return None
+
+
+class _DiskAttachmentWriter(AttachmentWriter):
+    """Copies chunks to the queue of the store writer thread, the file is opened, written and moved there"""
+
+    def __init__(self, store: "DiskAttachmentStore", attachment: EventAttachment, path: str) -> None:
+        self.store = store
+        self.attachment = attachment
+        self.path = path
+        self.size = 0
+        self._writer = store._writer
+        self._active = True
+        self._file = None
+        self._submit(self._open)
+
+    def write(self, data: memoryview):
+        if not self._active:
+            return
+        self.size += len(data)
+        if self.size > self.store.max_attachment_size:
+            LOGGER.warning(
+                "Attachment {} exceeds the limit of {} bytes and is skipped".format(
+                    self.attachment.name, self.store.max_attachment_size
+                )
+            )
+            self.abort()
+            return
+        # Chunk is only valid during the call so it is copied
+        self._submit(self._write, bytes(data))
+
+    def close(self):
+        if not self._active:
+            return
+        self._active = False
+        self._writer.submit(self._finish, force=True)
+
+    def abort(self):
+        if not self._active:
+            return
+        self._active = False
+        self._writer.submit(self._discard, force=True)
+
+    def _submit(self, func, *args):
+        if not self._writer.submit(func, *args):
+            # Attachment can't be stored without the dropped chunk
+            self.abort()
+
+    def _open(self):
+        try:
+            self._file = open(self.path + PARTIAL_SUFFIX, "wb")
+        except OSError as e:
+            LOGGER.warning("Unable to store attachment {}: {}".format(self.attachment.name, e))
+
+    def _write(self, data: bytes):
+        if self._file is None:
+            return
+        try:
+            self._file.write(data)
+        except OSError as e:
+            LOGGER.warning("Unable to store attachment {}: {}".format(self.attachment.name, e))
+            self._discard()
+
+    def _finish(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.replace(self.path + PARTIAL_SUFFIX, self.path)
+        self.attachment.location = self.path
+        self.store._added(self.path, self.size)
+
+    def _discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self.path + PARTIAL_SUFFIX)
+        except OSError:
+            pass
+
+
+class DiskAttachmentStore(AttachmentSink):
+    """Stores attachments as files in the directory, removing the oldest ones once max_size is exceeded.
+
+    File name is built of the sequence number, the alert time, channel and type, so files are ordered by
+    the arrival and could be matched with the alert. Chunks are copied to the bounded queue of the writer thread
+    which writes, moves and removes the files, so the stream reader never blocks on disk I/O. If the writer can't
+    keep up with WRITE_QUEUE_SIZE chunks pending the attachment being received is skipped. Partially received
+    files have PARTIAL_SUFFIX and are removed on open. Opening the store is blocking.
+    """
+
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+    DEFAULT_MAX_ATTACHMENT_SIZE = 4 * 1024 * 1024
+    WRITE_QUEUE_SIZE = 256
+
+    def __init__(
+        self, directory: str, max_size: int = DEFAULT_MAX_SIZE, max_attachment_size: int = DEFAULT_MAX_ATTACHMENT_SIZE
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.max_attachment_size = min(max_attachment_size, max_size)
+        self.size = 0
+        self.stored = 0
+        self._files: Deque[Tuple[str, int]] = deque()
+        self._next_seq = 1
+        self._lock = threading.Lock()
+        self._writer: Optional[BackgroundWriter] = None
+
+    @classmethod
+    def open(
+        cls, directory: str, max_size: int = DEFAULT_MAX_SIZE, max_attachment_size: int = DEFAULT_MAX_ATTACHMENT_SIZE
+    ) -> "DiskAttachmentStore":
+        store = cls(directory, max_size, max_attachment_size)
+        store._load()
+        store._writer = BackgroundWriter("Attachment writer", cls.WRITE_QUEUE_SIZE)
+        return store
+
+    @property
+    def dropped(self) -> int:
+        return self._writer.dropped if self._writer is not None else 0
+
+    def close(self):
+        """Stops accepting attachments. Queued writes are completed by the writer thread, attachments still being
+        received are skipped"""
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+
+    def open_attachment(self, attachment: EventAttachment) -> Optional[AttachmentWriter]:
+        if self._writer is None:
+            return None
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        return _DiskAttachmentWriter(self, attachment, os.path.join(self.directory, self._file_name(seq, attachment)))
+
+    def _file_name(self, seq: int, attachment: EventAttachment) -> str:
+        event = attachment.event
+        if event is None:
+            return "{:08d}{}".format(seq, attachment.extension)
+        return "{:08d}_{}_{}_{}{}".format(
+            seq,
+            event.timestamp.strftime("%Y%m%dT%H%M%S") if event.timestamp is not None else "",
+            _UNSAFE_NAME_CHARS_RE.sub("", event.channel_id or ""),
+            _UNSAFE_NAME_CHARS_RE.sub("", (event.type or "").lower()),
+            attachment.extension,
+        )
+
+    def _added(self, path: str, size: int):
+        with self._lock:
+            self._files.append((path, size))
+            self.size += size
+            self.stored += 1
+            self._enforce_max_size()
+
+    def _enforce_max_size(self):
+        while self._files and self.size > self.max_size:
+            path, size = self._files.popleft()
+            self.size -= size
+            try:
+                os.remove(path)
+            except OSError as e:
+                LOGGER.warning("Unable to remove attachment {}: {}".format(path, e))
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(PARTIAL_SUFFIX):
+                os.remove(path)
+                continue
+            seq = name.split("_", 1)[0].split(".", 1)[0]
+            if seq.isdigit():
+                files.append((int(seq), path, os.path.getsize(path)))
+        files.sort()
+        for seq, path, size in files:
+            self._files.append((path, size))
+            self.size += size
+        if files:
+            self._next_seq = files[-1][0] + 1
+        with self._lock:
+            self._enforce_max_size()
@@ -0,0 +1,131 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import hashlib
+import os
+import re
+from typing import Dict, Optional
+
+__all__ = ["AUTH_TYPE_BASIC", "AUTH_TYPE_DIGEST", "DigestAuth"]
+
+AUTH_TYPE_BASIC = "basic"
+AUTH_TYPE_DIGEST = "digest"
+
+_CHALLENGE_PARAM_RE = re.compile(r'(\w+)\s*=\s*(?:"((?:[^"\\]|\\.)*)"|([^\s,]+))')
+
+_HASH_FUNCTIONS = {
+    "MD5": hashlib.md5,
+    "MD5-SESS": hashlib.md5,
+    "SHA-256": hashlib.sha256,
+    "SHA-256-SESS": hashlib.sha256,
+}
+
+
+class DigestAuth(object):
+    """HTTP Digest authentication (RFC 7616) state for a single device.
+
+    The last challenge received from the device is cached together with the nonce counter, so subsequent requests
+    are authorized upfront and do not need an extra 401 round-trip. Once the device rejects the nonce (it marks
+    challenge as stale or simply responds 401 again) the new challenge replaces the cached one.
+    """
+
+    def __init__(self, username: str, password: str) -> None:
+        self.username = username or ""
+        self.password = password or ""
+        self._challenge: Optional[Dict[str, str]] = None
+        self._nonce_count = 0
+
+    @property
+    def has_challenge(self) -> bool:
+        return self._challenge is not None
+
+    def reset(self):
+        self._challenge = None
+        self._nonce_count = 0
+
+    def update_challenge(self, www_authenticate: Optional[str]) -> bool:
+        """Caches digest challenge from the WWW-Authenticate header.
+
+        Returns False if header doesn't contain digest challenge or it is the same nonce we've already failed with,
+        meaning there is no point in retrying the request.
+        """
+        if not www_authenticate:
+            return False
+        scheme, _, params_str = www_authenticate.strip().partition(" ")
+        if scheme.lower() != "digest":
+            return False
+        challenge = {}
+        for match in _CHALLENGE_PARAM_RE.finditer(params_str):
+            value = match.group(2) if match.group(2) is not None else match.group(3)
+            challenge[match.group(1).lower()] = value.replace('\\"', '"')
+        if "nonce" not in challenge or challenge.get("algorithm", "MD5").upper() not in _HASH_FUNCTIONS:
+            return False
+        is_stale = challenge.get("stale", "").lower() == "true"
+        if not is_stale and self._challenge is not None and self._challenge.get("nonce") == challenge["nonce"]:
+            # The device rejected credentials rather than the nonce
+            return False
+        self._challenge = challenge
+        self._nonce_count = 0
+        return True
+
+    def authorization_header(self, method: str, path: str) -> Optional[str]:
+        """Builds Authorization header value for the given request or None if there is no cached challenge yet"""
+        challenge = self._challenge
+        if challenge is None:
+            return None
+        algorithm = challenge.get("algorithm", "MD5")
+        hash_fn = _HASH_FUNCTIONS[algorithm.upper()]
+
+        def h(data: str) -> str:
+            return hash_fn(data.encode("utf-8")).hexdigest()
+
+        realm = challenge.get("realm", "")
+        nonce = challenge["nonce"]
+        self._nonce_count += 1
+        nc = "{:08x}".format(self._nonce_count)
+        cnonce = os.urandom(8).hex()
+
+        ha1 = h("{}:{}:{}".format(self.username, realm, self.password))
+        if algorithm.upper().endswith("-SESS"):
+            ha1 = h("{}:{}:{}".format(ha1, nonce, cnonce))
+        ha2 = h("{}:{}".format(method.upper(), path))
+
+        qop_options = [x.strip() for x in challenge.get("qop", "").split(",")]
+        params = [
+            ("username", self.username),
+            ("realm", realm),
+            ("nonce", nonce),
+            ("uri", path),
+            ("algorithm", algorithm),
+        ]
+        if "auth" in qop_options:
+            response = h("{}:{}:{}:{}:{}:{}".format(ha1, nonce, nc, cnonce, "auth", ha2))
+            params += [("qop", "auth"), ("nc", nc), ("cnonce", cnonce)]
+        else:
+            response = h("{}:{}:{}".format(ha1, nonce, ha2))
+        params.append(("response", response))
+        if "opaque" in challenge:
+            params.append(("opaque", challenge["opaque"]))
+        return "Digest " + ", ".join(
+            '{}="{}"'.format(k, v) if k not in ("qop", "nc", "algorithm") else "{}={}".format(k, v) for k, v in params
+        )
@@ -0,0 +1,109 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Optional, Tuple
+
+__all__ = ["BackgroundWriter"]
+
+LOGGER = logging.getLogger("Hikvision_ISAPIClient")
+
+
+class BackgroundWriter(object):
+    """Runs blocking file operations in the dedicated thread in the order they are submitted.
+
+    Submitting never blocks the caller (e.g. the event loop). Once max_pending operations are waiting new ones are
+    rejected and counted as dropped, unless forced - forced operations finalize the earlier ones (close, cleanup)
+    so they are never dropped. Errors of the operations are logged and counted, they never reach the caller.
+    """
+
+    DEFAULT_MAX_PENDING = 256
+
+    def __init__(self, name: str, max_pending: int = DEFAULT_MAX_PENDING) -> None:
+        if max_pending <= 0:
+            raise ValueError("Max pending operations must be positive")
+        self.name = name
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.errors = 0
+        self._pending: Deque[Optional[Tuple[Callable, Tuple[Any, ...], bool]]] = deque()
+        self._bounded = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, func: Callable, *args, force: bool = False) -> bool:
+        """Queues the operation, returns False if it was dropped because the queue is full or writer is closed"""
+        with self._cond:
+            if self._closed:
+                return False
+            if not force and self._bounded >= self.max_pending:
+                if self.dropped == 0:
+                    LOGGER.warning("{} can't keep up, pending writes are dropped".format(self.name))
+                self.dropped += 1
+                return False
+            self._pending.append((func, args, not force))
+            if not force:
+                self._bounded += 1
+            self._cond.notify()
+        return True
+
+    def close(self, func: Optional[Callable] = None, *args):
+        """Stops accepting operations. Queued operations and then func are run, after that the thread exits"""
+        with self._cond:
+            if self._closed:
+                return
+            if func is not None:
+                self._pending.append((func, args, False))
+            self._pending.append(None)
+            self._closed = True
+            self._cond.notify()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the thread to exit after close. Blocking, returns False on timeout"""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                op = self._pending.popleft()
+                if op is None:
+                    return
+                func, args, bounded = op
+                if bounded:
+                    self._bounded -= 1
+            try:
+                func(*args)
+            except Exception:
+                self.errors += 1
+                LOGGER.exception("{} operation failed".format(self.name))
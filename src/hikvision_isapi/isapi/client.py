@@ -23,57 +23,111 @@
 
 import asyncio
 import datetime
+import functools
 import logging
+import time
 from asyncio import CancelledError
-from typing import List
+from typing import Any, Callable, Dict, List, Optional
 
 import aiohttp
+from aiohttp import hdrs
 
-from .model import EventNotificationAlert, DeviceInfo, InputChannel
+from .attachments import AttachmentReceiver, AttachmentSink
+from .auth import AUTH_TYPE_BASIC, AUTH_TYPE_DIGEST, DigestAuth
+from .metrics import StreamMetrics
+from .model import EventNotificationAlert, DeviceInfo, HttpHostNotification, InputChannel, InputChannelStatus
+from .multipart import (
+    DEFAULT_MAX_PART_SIZE,
+    MultipartPartChunk,
+    MultipartStreamParser,
+    boundary_from_content_type,
+    is_xml_content_type,
+)
+from .pool import ISAPIConnectionPool
+from .push import HttpHost, build_http_host_xml
+from .response_cache import ResponseCache
+from .reconnect import ExponentialBackoffPolicy, ReconnectPolicy, StreamStalledError, StreamWatchdog
+from .subscription import SUBSCRIPTION_NOT_SUPPORTED_STATUSES, EventFilter, build_subscribe_event_xml
 
 LOGGER = logging.getLogger("Hikvision_ISAPIClient")
 
 ENDPOINT_EVENT_ALERTS_STREAM = "/ISAPI/Event/notification/alertStream"
+ENDPOINT_EVENT_SUBSCRIBE = "/ISAPI/Event/notification/subscribeEvent"
+ENDPOINT_HTTP_HOSTS = "/ISAPI/Event/notification/httpHosts"
 # ENDPOINT_INPUTS_LIST = '/ISAPI/Streaming/channels'
 ENDPOINT_INPUTS_LIST = "/ISAPI/ContentMgmt/InputProxy/channels"
+ENDPOINT_INPUTS_STATUS = "/ISAPI/ContentMgmt/InputProxy/channels/status"
 ENDPOINT_DEVICE_INFO = "/ISAPI/System/deviceInfo"
+# Streaming channel id is the input number followed by the stream number, 01 is the main stream
+ENDPOINT_SNAPSHOT = "/ISAPI/Streaming/channels/{channel_id}01/picture"
 
-__all__ = ["ISAPIClient"]
-
-
-class HikhisionStreamPartReader(aiohttp.BodyPartReader):
-    async def read_chunk(self, size: int = aiohttp.BodyPartReader.chunk_size) -> bytes:
-        """Reads body part content chunk of the specified size.
-
-        size: chunk size
-        """
-        if self._at_eof:
-            return b""
-        if self._length:
-            chunk = await self._read_chunk_from_length(size)
-        else:
-            chunk = await self._read_chunk_from_stream(size)
+# Errors caused by the device dropping the connection, they are expected so no need to log stack trace
+BROKEN_STREAM_ERRORS = (
+    StreamStalledError,
+    ConnectionResetError,
+    aiohttp.ClientPayloadError,
+    aiohttp.ServerDisconnectedError,
+)
 
-        self._read_bytes += len(chunk)
-        if self._read_bytes == self._length:
-            self._at_eof = True
-        return chunk
+__all__ = ["ISAPIClient"]
 
 
 class ISAPIClient(object):
     MAX_RETRY_INTERVAL = datetime.timedelta(minutes=5)
     INITIAL_RETRY_INTERVAL = datetime.timedelta(seconds=3)
     RETRY_INTERVAL_MULTIPLIER = 2
+    HEARTBEAT_INTERVAL = datetime.timedelta(seconds=10)
+    MISSED_HEARTBEATS_LIMIT = 3
+    CONNECT_TIMEOUT = datetime.timedelta(seconds=30)
+    # How long to wait for the headers of the alert stream response, afterwards the stream watchdog takes over
+    RESPONSE_TIMEOUT = datetime.timedelta(seconds=30)
+    # How long responses of the endpoints are reused, endpoints not listed here are never cached
+    DEFAULT_CACHE_TTL = {
+        ENDPOINT_DEVICE_INFO: datetime.timedelta(minutes=10),
+        ENDPOINT_INPUTS_LIST: datetime.timedelta(minutes=1),
+    }
 
-    def __init__(self, base_url: str, username: str, password: str, ignore_ssl_errors=False) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        ignore_ssl_errors=False,
+        max_part_size: int = DEFAULT_MAX_PART_SIZE,
+        auth_type: str = AUTH_TYPE_BASIC,
+        connection_pool: Optional[ISAPIConnectionPool] = None,
+        reconnect_policy: Optional[ReconnectPolicy] = None,
+        heartbeat_interval: datetime.timedelta = HEARTBEAT_INTERVAL,
+        missed_heartbeats_limit: int = MISSED_HEARTBEATS_LIMIT,
+        cache_ttl: Optional[Dict[str, datetime.timedelta]] = None,
+        attachment_sink: Optional[AttachmentSink] = None,
+    ) -> None:
         self.base_url = base_url
         self.auth = None
+        self.digest_auth: DigestAuth = None
         if username is not None or password is not None:
-            self.auth = aiohttp.BasicAuth(username, password)
+            if auth_type == AUTH_TYPE_DIGEST:
+                self.digest_auth = DigestAuth(username, password)
+            elif auth_type == AUTH_TYPE_BASIC:
+                self.auth = aiohttp.BasicAuth(username, password)
+            else:
+                raise ValueError("Unsupported auth type: {}".format(auth_type))
         self.ignore_ssl_errors = ignore_ssl_errors
-        self._infinite_session: aiohttp.ClientSession = None
+        self.max_part_size = max_part_size
+        self.connection_pool = connection_pool
+        self.reconnect_policy = reconnect_policy or ExponentialBackoffPolicy(
+            self.INITIAL_RETRY_INTERVAL, self.MAX_RETRY_INTERVAL, self.RETRY_INTERVAL_MULTIPLIER
+        )
+        self.heartbeat_interval = heartbeat_interval
+        self.missed_heartbeats_limit = missed_heartbeats_limit
+        self.metrics = StreamMetrics()
+        self.cache_ttl = dict(self.DEFAULT_CACHE_TTL if cache_ttl is None else cache_ttl)
+        self.response_cache = ResponseCache()
+        # Binary parts of the alert stream (pictures) are passed here, without sink they are skipped
+        self.attachment_sink = attachment_sink
+        # None until the first subscription attempt
+        self.event_subscription_supported: Optional[bool] = None
         self._session: aiohttp.ClientSession = None
-        self._retry_interval = self.INITIAL_RETRY_INTERVAL
 
     async def __aenter__(self) -> "ISAPIClient":
         return self
@@ -81,69 +135,219 @@ class ISAPIClient(object):
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
 
-    def __get_session(self, infinite=True) -> aiohttp.ClientSession:
-        if infinite and self._infinite_session:
-            return self._infinite_session
-        elif not infinite and self._session:
-            return self._session
-        timeout = aiohttp.ClientTimeout(total=None) if infinite else None
-        connector = None
-        if self.ignore_ssl_errors:
-            connector = aiohttp.TCPConnector(verify_ssl=False)
-        new_session = aiohttp.ClientSession(auth=self.auth, timeout=timeout, connector=connector)
-        if infinite:
-            self._infinite_session = new_session
-        else:
-            self._session = new_session
-        return new_session
+    def __get_session(self) -> aiohttp.ClientSession:
+        if self.connection_pool is not None:
+            return self.connection_pool.session
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        return self._session
 
     async def close(self):
-        try:
-            if self._infinite_session is not None and not self._infinite_session.closed:
-                await self._infinite_session.close()
-        except Exception as e:
-            LOGGER.warning("Unable to close session" + str(e))
+        # Shared pool is owned by the caller, so we only close own session
         try:
             if self._session is not None and not self._session.closed:
                 await self._session.close()
         except Exception as e:
-            LOGGER.warning("Unable to regular close session" + str(e))
+            LOGGER.warning("Unable to close session" + str(e))
 
     def __build_url(self, path: str) -> str:
         return self.base_url + path
 
-    async def get_device_info(self) -> DeviceInfo:
-        async with self.__get_session().get(self.__build_url(ENDPOINT_DEVICE_INFO)) as response:
-            return DeviceInfo.from_xml_str(await response.read())
+    def __auth_headers(self, method: str, path: str) -> Optional[Dict[str, str]]:
+        if self.digest_auth is None or not self.digest_auth.has_challenge:
+            return None
+        return {hdrs.AUTHORIZATION: self.digest_auth.authorization_header(method, path)}
 
-    async def get_available_inputs(self) -> List[InputChannel]:
-        async with self.__get_session().get(self.__build_url(ENDPOINT_INPUTS_LIST)) as response:
-            return InputChannel.from_xml_str(await response.read())
+    async def __request(
+        self, method: str, path: str, infinite=False, data: Optional[bytes] = None
+    ) -> aiohttp.ClientResponse:
+        session = self.__get_session()
+        url = self.__build_url(path)
+        kwargs = {"auth": self.auth}
+        if data is not None:
+            kwargs["data"] = data
+        if self.ignore_ssl_errors:
+            kwargs["ssl"] = False
+        if infinite:
+            # Read timeouts are handled by the stream watchdog
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=None, sock_connect=self.CONNECT_TIMEOUT.total_seconds())
+        response = await self.__send(session, method, url, path, infinite, kwargs)
+        # With digest auth the first request (and the one following nonce expiration) is rejected with a challenge
+        if (
+            response.status == 401
+            and self.digest_auth is not None
+            and self.digest_auth.update_challenge(response.headers.get(hdrs.WWW_AUTHENTICATE))
+        ):
+            response.release()
+            response = await self.__send(session, method, url, path, infinite, kwargs)
+        return response
 
-    async def listen_hikvision_event_stream(self, queue: asyncio.Queue):
+    async def __send(
+        self, session: aiohttp.ClientSession, method: str, url: str, path: str, infinite: bool, kwargs: Dict[str, Any]
+    ) -> aiohttp.ClientResponse:
+        request = session.request(method, url, headers=self.__auth_headers(method, path), **kwargs)
+        if not infinite:
+            return await request
+        # Infinite response has no read timeout, so the device which accepts connection but never responds would
+        # block the listener forever
+        return await asyncio.wait_for(request, self.RESPONSE_TIMEOUT.total_seconds())
+
+    async def __get_parsed(self, path: str, parse: Callable[[bytes], Any]) -> Any:
+        async with await self.__request(hdrs.METH_GET, path) as response:
+            response.raise_for_status()
+            return parse(await response.read())
+
+    async def __get_cached(self, path: str, parse: Callable[[bytes], Any], use_cache: bool) -> Any:
+        """Concurrent requests of the same endpoint share a single device request.
+
+        Without cache the response is not reused, but the request already in progress is still joined.
+        """
+        ttl = self.cache_ttl.get(path) if use_cache else None
+        return await self.response_cache.get(
+            path,
+            functools.partial(self.__get_parsed, path, parse),
+            ttl.total_seconds() if ttl is not None else 0,
+        )
+
+    def invalidate_cache(self, path: Optional[str] = None):
+        """Drops cached response of the endpoint, or all the cached responses if path is not given"""
+        self.response_cache.invalidate(None if path is None else lambda key: key == path)
+
+    async def get_device_info(self, use_cache: bool = True) -> DeviceInfo:
+        return await self.__get_cached(ENDPOINT_DEVICE_INFO, DeviceInfo.from_xml_str, use_cache)
+
+    async def get_available_inputs(self, use_cache: bool = True) -> List[InputChannel]:
+        return await self.__get_cached(ENDPOINT_INPUTS_LIST, InputChannel.from_xml_str, use_cache)
+
+    async def get_inputs_status(self) -> List[InputChannelStatus]:
+        """Returns connection status of all the NVR inputs in a single request. Response is never cached"""
+        return await self.__get_cached(ENDPOINT_INPUTS_STATUS, InputChannelStatus.from_xml_str, use_cache=False)
+
+    async def get_snapshot(self, channel_id: str) -> bytes:
+        """Returns JPEG snapshot of the main stream of the given input channel"""
+        async with await self.__request(hdrs.METH_GET, ENDPOINT_SNAPSHOT.format(channel_id=channel_id)) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async def set_http_host(self, http_host: HttpHost):
+        """Configures the device to post alerts to the given URL instead of (or in addition to) the alert stream.
+
+        Host configured in the slot before is replaced, see find_http_host_slot to pick the slot.
+        """
+        async with await self.__request(
+            hdrs.METH_PUT, "{}/{}".format(ENDPOINT_HTTP_HOSTS, http_host.host_id), data=build_http_host_xml(http_host)
+        ) as response:
+            response.raise_for_status()
+
+    async def get_http_hosts(self) -> List[HttpHostNotification]:
+        """Returns notification hosts of the device including unused slots. Response is never cached"""
+        return await self.__get_cached(ENDPOINT_HTTP_HOSTS, HttpHostNotification.from_xml_str, use_cache=False)
+
+    async def delete_http_host(self, host_id: str):
+        """Stops posting alerts to the host and frees its slot"""
+        async with await self.__request(hdrs.METH_DELETE, "{}/{}".format(ENDPOINT_HTTP_HOSTS, host_id)) as response:
+            response.raise_for_status()
+
+    async def __open_event_stream(self, event_filters: Optional[List[EventFilter]]) -> aiohttp.ClientResponse:
+        if event_filters and self.event_subscription_supported is not False:
+            response = await self.__request(
+                hdrs.METH_POST,
+                ENDPOINT_EVENT_SUBSCRIBE,
+                infinite=True,
+                data=build_subscribe_event_xml(event_filters, self.heartbeat_interval),
+            )
+            if response.status in SUBSCRIPTION_NOT_SUPPORTED_STATUSES:
+                reason = "HTTP {}".format(response.status)
+            elif response.status == 200 and not response.content_type.startswith("multipart/"):
+                # Some firmwares accept the subscription but respond with a plain status document
+                reason = "{} response".format(response.content_type)
+            else:
+                self.event_subscription_supported = True
+                return response
+            response.release()
+            LOGGER.info("Event subscription is not supported by device ({}), using alert stream".format(reason))
+            self.event_subscription_supported = False
+        return await self.__request(hdrs.METH_GET, ENDPOINT_EVENT_ALERTS_STREAM, infinite=True)
+
+    async def listen_hikvision_event_stream(
+        self, queue: asyncio.Queue, event_filters: Optional[List[EventFilter]] = None
+    ):
+        """Reads alerts from the device into the queue until cancelled.
+
+        If event filters are given the device is asked to send only matching events, devices which don't support
+        event subscription send all the events.
+        """
         while True:
             try:
-                async with self.__get_session().get(self.__build_url(ENDPOINT_EVENT_ALERTS_STREAM)) as response:
-                    self._retry_interval = self.INITIAL_RETRY_INTERVAL
-                    reader = aiohttp.MultipartReader.from_response(response)
-                    reader.stream.part_reader_cls = HikhisionStreamPartReader
-                    while True:
-                        part = await reader.next()
-                        if part is None:
-                            break
-                        filedata = await part.read(decode=False)
-                        if filedata:
-                            event = EventNotificationAlert.from_xml_str(filedata)
-                            queue.put_nowait(event)
+                async with await self.__open_event_stream(event_filters) as response:
+                    response.raise_for_status()
+                    await self.__read_event_stream(response, queue)
             except CancelledError:
                 LOGGER.info("Gracefully terminating alert stream listener")
                 break
             except (TimeoutError, Exception) as e:
-                retry_delay = self._retry_interval
-                self._retry_interval = self._retry_interval * self.RETRY_INTERVAL_MULTIPLIER
-                retry_notice = "Reconnecting in {} seconds".format(retry_delay.total_seconds())
-                if isinstance(e, TimeoutError):
+                self.metrics.reconnects += 1
+                retry_delay = self.reconnect_policy.next_delay()
+                retry_notice = "Reconnecting in {} seconds".format(round(retry_delay.total_seconds(), 1))
+                if isinstance(e, (TimeoutError, asyncio.TimeoutError)):
                     LOGGER.warning("Timeout while reading data from hikvision alert stream. " + retry_notice)
+                elif isinstance(e, BROKEN_STREAM_ERRORS):
+                    LOGGER.warning("Alert stream is broken: {}. ".format(e) + retry_notice)
                 else:
                     LOGGER.exception("Unknown error while reading event stream. " + retry_notice)
                 await asyncio.sleep(retry_delay.total_seconds())
+
+    def __parse_alert(self, payload: memoryview) -> Optional[EventNotificationAlert]:
+        if len(payload) == 0:
+            return None
+        started_at = time.perf_counter()
+        event = EventNotificationAlert.from_xml_str(payload)
+        self.metrics.parse_time.add(time.perf_counter() - started_at)
+        # Subscription stream starts with the response document which is not an alert
+        return event if event.type is not None else None
+
+    async def __read_event_stream(self, response: aiohttp.ClientResponse, queue: asyncio.Queue):
+        parser = MultipartStreamParser(
+            boundary_from_content_type(response.headers.get(hdrs.CONTENT_TYPE)),
+            self.max_part_size,
+            stream_part=lambda headers: not is_xml_content_type(headers),
+        )
+        attachments = AttachmentReceiver(self.attachment_sink)
+        last_event: Optional[EventNotificationAlert] = None
+        watchdog = StreamWatchdog(self.heartbeat_interval, self.missed_heartbeats_limit, response.close)
+        watchdog.start()
+        metrics = self.metrics
+        metrics.connected = True
+        is_healthy = False
+        try:
+            async for chunk in response.content.iter_any():
+                metrics.bytes.add(len(chunk))
+                for part in parser.feed(chunk):
+                    # Any part including heartbeats proves the stream is alive
+                    watchdog.feed()
+                    metrics.last_part_time = time.monotonic()
+                    if not is_healthy:
+                        self.reconnect_policy.reset()
+                        is_healthy = True
+                    if isinstance(part, MultipartPartChunk):
+                        if attachments.feed(part, last_event) is not None:
+                            metrics.attachments.add()
+                        continue
+                    event = self.__parse_alert(part.payload)
+                    if event is not None:
+                        metrics.events.add()
+                        last_event = event
+                        await queue.put(event)
+                if parser.at_eof:
+                    break
+        except aiohttp.ClientError:
+            # Closing the response by watchdog might cause connection error instead of the normal stream end
+            if not watchdog.stalled:
+                raise
+        finally:
+            attachments.abort()
+            watchdog.stop()
+            metrics.connected = False
+        if watchdog.stalled:
+            raise StreamStalledError("No heartbeats received for {} seconds".format(round(watchdog.timeout, 1)))
+        raise ConnectionResetError("Alert stream closed by device")
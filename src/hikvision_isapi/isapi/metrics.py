@@ -0,0 +1,99 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import time
+from typing import Any, Dict, List, Optional
+
+__all__ = ["RateCounter", "MovingAverage", "StreamMetrics"]
+
+
+class RateCounter(object):
+    """Counts events per second over the sliding window using per-second buckets"""
+
+    __slots__ = ("window", "total", "_counts", "_seconds")
+
+    def __init__(self, window: int = 60) -> None:
+        self.window = window
+        self.total = 0
+        self._counts: List[int] = [0] * window
+        self._seconds: List[int] = [-1] * window
+
+    def add(self, value: int = 1):
+        second = int(time.monotonic())
+        idx = second % self.window
+        if self._seconds[idx] != second:
+            self._seconds[idx] = second
+            self._counts[idx] = 0
+        self._counts[idx] += value
+        self.total += value
+
+    def rate(self) -> float:
+        # The current second is incomplete, so it is not included
+        now = int(time.monotonic())
+        first = now - self.window
+        return sum(c for c, s in zip(self._counts, self._seconds) if first <= s < now) / self.window
+
+
+class MovingAverage(object):
+    """Exponentially weighted moving average"""
+
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, alpha: float = 0.1) -> None:
+        self.alpha = alpha
+        self.value: Optional[float] = None
+
+    def add(self, sample: float):
+        if self.value is None:
+            self.value = sample
+        else:
+            self.value += self.alpha * (sample - self.value)
+
+
+class StreamMetrics(object):
+    """Health and throughput counters of the alert stream maintained by ISAPIClient"""
+
+    def __init__(self) -> None:
+        self.events = RateCounter()
+        self.bytes = RateCounter()
+        self.attachments = RateCounter()
+        self.parse_time = MovingAverage()
+        self.reconnects = 0
+        self.connected = False
+        self.last_part_time: Optional[float] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        last_heartbeat_age = None
+        if self.last_part_time is not None:
+            last_heartbeat_age = round(time.monotonic() - self.last_part_time, 1)
+        return {
+            "connected": self.connected,
+            "events_total": self.events.total,
+            "events_per_second": round(self.events.rate(), 2),
+            "bytes_total": self.bytes.total,
+            "bytes_per_second": round(self.bytes.rate(), 1),
+            "attachments_total": self.attachments.total,
+            "parse_time_ms": round(self.parse_time.value * 1000, 3) if self.parse_time.value is not None else None,
+            "reconnects": self.reconnects,
+            "last_heartbeat_age": last_heartbeat_age,
+        }
@@ -22,33 +22,110 @@
 #    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from datetime import datetime
-from typing import Any, Union
+from typing import Any, Callable, Dict, Optional, Union
 
-import xmltodict
+from .parsers import FlatFieldsParser, XmlParserBackend, XmlToDictParser
 
 
-class BaseHikvisionEntity(object):
+class Field(object):
+    """Model attribute backed by the element of the xml document.
+
+    Value is decoded from the raw xml dict on first access and memoized in the instance slot.
+    """
+
+    def __init__(
+        self,
+        xml_name: str,
+        decoder: Optional[Callable[[str], Any]] = None,
+        encoder: Optional[Callable[[Any], str]] = None,
+    ) -> None:
+        self.xml_name = xml_name
+        self.decoder = decoder
+        self.encoder = encoder
+        self.name: str = None
+        self.slot: str = None
+
+    def bind(self, name: str):
+        self.name = name
+        self.slot = "_f_" + name
+
+    def decode(self, entity: "BaseHikvisionEntity") -> Any:
+        if entity._xmldict is None:
+            return None
+        raw_value = entity._xmldict.get(self.xml_name)
+        if raw_value is None or self.decoder is None:
+            return raw_value
+        return self.decoder(raw_value)
+
+    def __get__(self, entity: "BaseHikvisionEntity", owner=None) -> Any:
+        if entity is None:
+            return self
+        try:
+            return getattr(entity, self.slot)
+        except AttributeError:
+            value = self.decode(entity)
+            setattr(entity, self.slot, value)
+            return value
+
+    def __set__(self, entity: "BaseHikvisionEntity", value: Any):
+        setattr(entity, self.slot, value)
+        if entity._xmldict is not None:
+            encoded = value
+            if value is not None and self.encoder is not None:
+                encoded = self.encoder(value)
+            entity._xmldict[self.xml_name] = encoded
+
+
+class _EntityMeta(type):
+    """Allocates a slot for each declared Field so model instances do not carry __dict__"""
+
+    def __new__(mcs, name, bases, namespace):
+        own_fields = {k: v for k, v in namespace.items() if isinstance(v, Field)}
+        for attr_name, field in own_fields.items():
+            field.bind(attr_name)
+        namespace["__slots__"] = tuple(namespace.get("__slots__", ())) + tuple(f.slot for f in own_fields.values())
+        cls = super().__new__(mcs, name, bases, namespace)
+        fields: Dict[str, Field] = {}
+        for base in reversed(cls.__mro__):
+            fields.update({k: v for k, v in vars(base).items() if isinstance(v, Field)})
+        cls._FIELDS = fields
+        cls._FIELDS_BY_XML_NAME = {f.xml_name: f for f in fields.values()}
+        return cls
+
+
+class BaseHikvisionEntity(object, metaclass=_EntityMeta):
+    __slots__ = ("_xmldict",)
+
     XML_ROOT_ELEMENT: str = None
     XML_ROOT_LIST_ELEMENT: str = None
     XML_PARSE_ATTRS = False
+    XML_PARSER: XmlParserBackend = XmlToDictParser()
+    # When disabled all the fields are decoded right after parsing and raw dict is released
+    XML_KEEP_RAW = True
     TO_STRING_FIELDS = tuple()
 
+    _FIELDS: Dict[str, Field] = {}
+    _FIELDS_BY_XML_NAME: Dict[str, Field] = {}
+
     def __init__(self) -> None:
         self._xmldict = {}
 
     def _from_field(self, field: str, _default: Any = None) -> Any:
-        return self._xmldict.get(field)
+        descriptor = self._FIELDS_BY_XML_NAME.get(field)
+        if descriptor is not None:
+            return descriptor.__get__(self)
+        return self._xmldict.get(field, _default) if self._xmldict is not None else _default
 
     def _to_field(self, field: str, value: Any):
-        self._xmldict[field] = value
+        descriptor = self._FIELDS_BY_XML_NAME.get(field)
+        if descriptor is not None:
+            descriptor.__set__(self, value)
+        elif self._xmldict is not None:
+            self._xmldict[field] = value
 
     @classmethod
-    def from_xml_str(cls, xml_str: Union[str, bytes], resolve_root_array=True):
-        parsed = xmltodict.parse(xml_str, xml_attribs=cls.XML_PARSE_ATTRS)
-        if cls.XML_ROOT_LIST_ELEMENT and cls.XML_ROOT_LIST_ELEMENT in parsed:
-            parsed = parsed.get(cls.XML_ROOT_LIST_ELEMENT)
-        if cls.XML_ROOT_ELEMENT:
-            parsed = parsed.get(cls.XML_ROOT_ELEMENT)
+    def from_xml_str(cls, xml_str: Union[str, bytes, memoryview], resolve_root_array=True):
+        parsed = cls.XML_PARSER.parse(cls, xml_str)
         if isinstance(parsed, list):
             return [cls.from_xml_dict(x) for x in parsed]
         else:
@@ -57,7 +134,21 @@ class BaseHikvisionEntity(object):
     @classmethod
     def from_xml_dict(cls, xml_dict: dict):
         result = cls()
-        result._xmldict = xml_dict
+        result._xmldict = xml_dict or {}
+        if not cls.XML_KEEP_RAW:
+            for field in cls._FIELDS.values():
+                setattr(result, field.slot, field.decode(result))
+            result._xmldict = None
+        return result
+
+    def to_xml_dict(self) -> Dict[str, Any]:
+        """Returns declared fields in the form accepted by from_xml_dict, e.g. to persist the entity"""
+        result = {}
+        for field in self._FIELDS.values():
+            value = field.__get__(self)
+            if value is not None and field.encoder is not None:
+                value = field.encoder(value)
+            result[field.xml_name] = value
         return result
 
     def __repr__(self):
@@ -81,45 +172,11 @@ class DeviceInfo(BaseHikvisionEntity):
     FIELD_FIRMWARE_RELEASE_DATE = "firmwareReleaseDate"
     FIELD_DEVICE_TYPE = "deviceType"
 
-    @property
-    def device_name(self) -> str:
-        return self._from_field(self.FIELD_DEVICE_NAME)
-
-    @device_name.setter
-    def device_name(self, value: str):
-        self._to_field(self.FIELD_DEVICE_NAME, value)
-
-    @property
-    def device_id(self) -> str:
-        return self._from_field(self.FIELD_DEVICE_ID)
-
-    @device_id.setter
-    def device_id(self, value: str):
-        self._to_field(self.FIELD_DEVICE_ID, value)
-
-    @property
-    def model(self) -> str:
-        return self._from_field(self.FIELD_MODEL)
-
-    @model.setter
-    def model(self, value: str):
-        self._to_field(self.FIELD_MODEL, value)
-
-    @property
-    def serial_number(self) -> str:
-        return self._from_field(self.FIELD_SERIAL_NUMBER)
-
-    @serial_number.setter
-    def serial_number(self, value: str):
-        self._to_field(self.FIELD_SERIAL_NUMBER, value)
-
-    @property
-    def device_type(self) -> str:
-        return self._from_field(self.FIELD_DEVICE_TYPE)
-
-    @device_type.setter
-    def device_type(self, value: str):
-        self._to_field(self.FIELD_DEVICE_TYPE, value)
+    device_name: str = Field(FIELD_DEVICE_NAME)
+    device_id: str = Field(FIELD_DEVICE_ID)
+    model: str = Field(FIELD_MODEL)
+    serial_number: str = Field(FIELD_SERIAL_NUMBER)
+    device_type: str = Field(FIELD_DEVICE_TYPE)
 
     def is_nvr(self) -> bool:
         return self.device_type == self.DEVICE_TYPE_NVR
@@ -134,21 +191,28 @@ class InputChannel(BaseHikvisionEntity):
 
     TO_STRING_FIELDS = (FIELD_ID, FIELD_NAME)
 
-    @property
-    def input_id(self) -> str:
-        return self._from_field(self.FIELD_ID)
+    input_id: str = Field(FIELD_ID)
+    input_name: str = Field(FIELD_NAME)
 
-    @input_id.setter
-    def input_id(self, value: str):
-        self._to_field(self.FIELD_ID, value)
 
-    @property
-    def input_name(self) -> str:
-        return self._from_field(self.FIELD_NAME)
+def decode_bool(value: str) -> bool:
+    return value.strip().lower() == "true"
+
+
+class InputChannelStatus(BaseHikvisionEntity):
+    XML_ROOT_LIST_ELEMENT = "InputProxyChannelStatusList"
+    XML_ROOT_ELEMENT = "InputProxyChannelStatus"
+
+    FIELD_ID = "id"
+    FIELD_ONLINE = "online"
+    FIELD_DETECT_RESULT = "chanDetectResult"
+
+    TO_STRING_FIELDS = (FIELD_ID, FIELD_ONLINE)
 
-    @input_name.setter
-    def input_name(self, value: str):
-        self._to_field(self.FIELD_NAME, value)
+    input_id: str = Field(FIELD_ID)
+    online: bool = Field(FIELD_ONLINE, decoder=decode_bool, encoder=lambda x: "true" if x else "false")
+    # E.g. connect, offline, ipcStreamFail, notSupport
+    detect_result: str = Field(FIELD_DETECT_RESULT)
 
 
 class EventNotificationAlert(BaseHikvisionEntity):
@@ -161,53 +225,62 @@ class EventNotificationAlert(BaseHikvisionEntity):
     FIELD_EVENT_STATE = "eventState"
     FIELD_EVENT_TIME = "dateTime"
 
-    @property
-    def type(self) -> str:
-        return self._from_field(self.FIELD_EVENT_TYPE)
+    XML_PARSER = FlatFieldsParser(
+        (
+            FIELD_EVENT_TYPE,
+            FIELD_EVENT_DESCRIPTION,
+            FIELD_CHANNEL_NAME,
+            FIELD_CHANNEL_ID,
+            FIELD_EVENT_STATE,
+            FIELD_EVENT_TIME,
+        )
+    )
+    XML_KEEP_RAW = False
 
-    @type.setter
-    def type(self, value: str):
-        self._to_field(self.FIELD_EVENT_TYPE, value)
+    type: str = Field(FIELD_EVENT_TYPE)
+    description: str = Field(FIELD_EVENT_DESCRIPTION)
+    channel_name: str = Field(FIELD_CHANNEL_NAME)
+    channel_id: str = Field(FIELD_CHANNEL_ID)
+    state: str = Field(FIELD_EVENT_STATE)
+    timestamp: datetime = Field(FIELD_EVENT_TIME, decoder=datetime.fromisoformat, encoder=datetime.isoformat)
 
-    @property
-    def description(self) -> str:
-        return self._from_field(self.FIELD_EVENT_DESCRIPTION)
 
-    @description.setter
-    def description(self, value: str):
-        self._to_field(self.FIELD_EVENT_DESCRIPTION, value)
+class HttpHostNotification(BaseHikvisionEntity):
+    """Notification host configured on the device, unused slots have no address"""
 
-    @property
-    def channel_name(self) -> str:
-        return self._from_field(self.FIELD_CHANNEL_NAME)
+    XML_ROOT_LIST_ELEMENT = "HttpHostNotificationList"
+    XML_ROOT_ELEMENT = "HttpHostNotification"
 
-    @channel_name.setter
-    def channel_name(self, value: str):
-        self._to_field(self.FIELD_CHANNEL_NAME, value)
+    FIELD_ID = "id"
+    FIELD_URL = "url"
+    FIELD_PROTOCOL_TYPE = "protocolType"
+    FIELD_IP_ADDRESS = "ipAddress"
+    FIELD_HOST_NAME = "hostName"
+    FIELD_PORT = "portNo"
 
-    @property
-    def channel_id(self) -> str:
-        return self._from_field(self.FIELD_CHANNEL_ID)
+    UNSET_ADDRESSES = ("", "0.0.0.0", "::")
 
-    @channel_id.setter
-    def channel_id(self, value: str):
-        self._to_field(self.FIELD_CHANNEL_ID, value)
+    TO_STRING_FIELDS = (FIELD_ID, FIELD_URL)
+
+    host_id: str = Field(FIELD_ID)
+    path: str = Field(FIELD_URL)
+    protocol: str = Field(FIELD_PROTOCOL_TYPE)
+    ip_address: str = Field(FIELD_IP_ADDRESS)
+    host_name: str = Field(FIELD_HOST_NAME)
+    port: str = Field(FIELD_PORT)
 
     @property
-    def state(self) -> str:
-        return self._from_field(self.FIELD_EVENT_STATE)
+    def address(self) -> Optional[str]:
+        return self.host_name or self.ip_address
 
-    @state.setter
-    def state(self, value: str):
-        self._to_field(self.FIELD_EVENT_STATE, value)
+    def is_configured(self) -> bool:
+        return self.address is not None and self.address.strip() not in self.UNSET_ADDRESSES
 
     @property
-    def timestamp(self) -> datetime:
-        str_val = self._from_field(self.FIELD_EVENT_TIME)
-        if str_val is None:
+    def url(self) -> Optional[str]:
+        if not self.is_configured():
             return None
-        return datetime.fromisoformat(self._from_field(self.FIELD_EVENT_TIME))
-
-    @timestamp.setter
-    def timestamp(self, value: datetime):
-        self._to_field(self.FIELD_EVENT_TIME, datetime.isoformat(value))
+        scheme = "https" if (self.protocol or "").upper() == "HTTPS" else "http"
+        address = "[{}]".format(self.address) if ":" in self.address else self.address
+        port = ":{}".format(self.port) if self.port else ""
+        return "{}://{}{}{}".format(scheme, address, port, self.path or "/")
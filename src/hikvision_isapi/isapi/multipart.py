@@ -0,0 +1,269 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Union
+
+__all__ = [
+    "MultipartPart",
+    "MultipartPartChunk",
+    "MultipartStreamParser",
+    "MultipartParseError",
+    "PartTooLargeError",
+    "boundary_from_content_type",
+    "is_xml_content_type",
+]
+
+CRLF = b"\r\n"
+HEADERS_TERMINATOR = b"\r\n\r\n"
+MAX_HEADERS_SIZE = 8 * 1024
+DEFAULT_MAX_PART_SIZE = 1024 * 1024
+
+
+class MultipartParseError(Exception):
+    pass
+
+
+class PartTooLargeError(MultipartParseError):
+    pass
+
+
+class MultipartPart(NamedTuple):
+    headers: Dict[str, str]
+    payload: memoryview
+
+    @property
+    def content_type(self) -> Optional[str]:
+        return self.headers.get("content-type")
+
+
+class MultipartPartChunk(NamedTuple):
+    """Piece of the streamed part payload, offset is the position of the data within the payload"""
+
+    headers: Dict[str, str]
+    data: memoryview
+    offset: int
+    last: bool
+
+    @property
+    def content_type(self) -> Optional[str]:
+        return self.headers.get("content-type")
+
+
+def is_xml_content_type(headers: Dict[str, str]) -> bool:
+    """Parts without Content-Type are treated as xml as some firmwares do not send part headers at all"""
+    content_type = headers.get("content-type")
+    return content_type is None or "xml" in content_type.split(";")[0].lower()
+
+
+def boundary_from_content_type(content_type: str) -> str:
+    """Extracts boundary parameter from the multipart Content-Type header value"""
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.strip().lower() == "boundary":
+            return value.strip().strip('"')
+    raise MultipartParseError("Boundary is not defined in content type: {}".format(content_type))
+
+
+class MultipartStreamParser(object):
+    """Incremental parser for the endless multipart stream emitted by hikvision devices.
+
+    Incoming chunks are accumulated in a single reusable buffer and parts are returned as memoryview slices of it,
+    so payload is never copied. The flip side is that the part payload is only valid until the next call of `feed`,
+    consumer must either process it right away or make a copy.
+    Parts for which `stream_part` returns True are not accumulated, instead their payload is returned as chunks
+    of whatever has been received so far. Such parts are not limited by max_part_size.
+    Parts which declare Content-Length are read by length (some firmwares do not put CRLF before the next delimiter),
+    otherwise the payload ends on the next delimiter.
+    """
+
+    _STATE_DELIMITER = 0
+    _STATE_HEADERS = 1
+    _STATE_BODY = 2
+
+    def __init__(
+        self,
+        boundary: str,
+        max_part_size: int = DEFAULT_MAX_PART_SIZE,
+        stream_part: Optional[Callable[[Dict[str, str]], bool]] = None,
+    ) -> None:
+        self.max_part_size = max_part_size
+        self.stream_part = stream_part
+        self._delimiter = b"--" + boundary.encode("latin-1")
+        self._body_terminator = CRLF + self._delimiter
+        self._buffer = bytearray()
+        self._pos = 0
+        self._state = self._STATE_DELIMITER
+        self._part_headers: Dict[str, str] = {}
+        self._part_length: Optional[int] = None
+        self._part_streamed = False
+        self._part_offset = 0
+        # Number of body bytes already searched for the delimiter, so the search is not restarted on every chunk
+        self._body_scanned = 0
+        self._exported: List[memoryview] = []
+        self._at_eof = False
+
+    @property
+    def at_eof(self) -> bool:
+        """Indicates that the closing delimiter has been received"""
+        return self._at_eof
+
+    def feed(self, data: bytes) -> Iterator[Union[MultipartPart, MultipartPartChunk]]:
+        """Appends data chunk to the internal buffer and returns an iterator over the parts completed so far"""
+        self._compact()
+        self._buffer += data
+        return self._iter_parts()
+
+    def _compact(self):
+        # Payload views handed out during the previous round must be released before buffer could be resized
+        for view in self._exported:
+            view.release()
+        self._exported.clear()
+        if self._pos > 0:
+            del self._buffer[: self._pos]
+            self._pos = 0
+
+    def _iter_parts(self) -> Iterator[Union[MultipartPart, MultipartPartChunk]]:
+        while not self._at_eof:
+            if self._state == self._STATE_DELIMITER:
+                if not self._consume_delimiter():
+                    return
+            elif self._state == self._STATE_HEADERS:
+                if not self._consume_headers():
+                    return
+            elif self._part_streamed:
+                chunk = self._consume_body_chunk()
+                if chunk is None:
+                    return
+                yield chunk
+            else:
+                part = self._consume_body()
+                if part is None:
+                    return
+                yield part
+
+    def _consume_delimiter(self) -> bool:
+        buf = self._buffer
+        idx = buf.find(self._delimiter, self._pos)
+        if idx < 0:
+            # Whatever precedes the delimiter (preamble, trailing CRLF of the previous part) is ignored,
+            # we only need to keep the tail which might contain the beginning of the delimiter
+            self._pos = max(self._pos, len(buf) - len(self._delimiter) + 1)
+            return False
+        if buf.startswith(b"--", idx + len(self._delimiter)):
+            # Closing delimiter, devices don't always terminate it with CRLF
+            self._at_eof = True
+            self._pos = len(buf)
+            return True
+        line_end = buf.find(CRLF, idx + len(self._delimiter))
+        if line_end < 0:
+            self._pos = idx
+            if len(buf) - idx > MAX_HEADERS_SIZE:
+                raise MultipartParseError("Delimiter line is too long")
+            return False
+        self._pos = line_end + len(CRLF)
+        self._state = self._STATE_HEADERS
+        return True
+
+    def _consume_headers(self) -> bool:
+        buf = self._buffer
+        if buf.startswith(CRLF, self._pos):
+            headers_end = self._pos
+        else:
+            headers_end = buf.find(HEADERS_TERMINATOR, self._pos)
+            if headers_end < 0:
+                if len(buf) - self._pos > MAX_HEADERS_SIZE:
+                    raise MultipartParseError("Part headers exceed {} bytes".format(MAX_HEADERS_SIZE))
+                return False
+        headers = {}
+        if headers_end > self._pos:
+            for line in bytes(buf[self._pos : headers_end]).decode("latin-1").split("\r\n"):
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        self._part_headers = headers
+        self._part_length = None
+        self._part_streamed = self.stream_part is not None and self.stream_part(headers)
+        self._part_offset = 0
+        self._body_scanned = 0
+        length = headers.get("content-length")
+        if length is not None:
+            try:
+                self._part_length = int(length)
+            except ValueError:
+                raise MultipartParseError("Invalid part Content-Length: {}".format(length))
+            if self._part_length > self.max_part_size and not self._part_streamed:
+                raise PartTooLargeError(
+                    "Part of {} bytes exceeds the limit of {} bytes".format(self._part_length, self.max_part_size)
+                )
+        self._pos = headers_end + len(HEADERS_TERMINATOR) if headers_end > self._pos else headers_end + len(CRLF)
+        self._state = self._STATE_BODY
+        return True
+
+    def _consume_body(self) -> Optional[MultipartPart]:
+        buf = self._buffer
+        start = self._pos
+        if self._part_length is not None:
+            end = start + self._part_length
+            if len(buf) < end:
+                return None
+            self._pos = end
+        else:
+            # Terminator might start within the tail searched last time
+            end = buf.find(self._body_terminator, start + max(0, self._body_scanned - len(self._body_terminator) + 1))
+            if end < 0:
+                self._body_scanned = len(buf) - start
+                if self._body_scanned > self.max_part_size + len(self._body_terminator):
+                    raise PartTooLargeError("Part exceeds the limit of {} bytes".format(self.max_part_size))
+                return None
+            # CRLF preceding the delimiter belongs to the delimiter, so we skip it here
+            self._pos = end + len(CRLF)
+        view = memoryview(buf)[start:end]
+        self._exported.append(view)
+        self._state = self._STATE_DELIMITER
+        return MultipartPart(self._part_headers, view)
+
+    def _consume_body_chunk(self) -> Optional[MultipartPartChunk]:
+        buf = self._buffer
+        start = self._pos
+        if self._part_length is not None:
+            remaining = self._part_length - self._part_offset
+            end = min(len(buf), start + remaining)
+            last = end - start == remaining
+            self._pos = end
+        else:
+            end = buf.find(self._body_terminator, start)
+            last = end >= 0
+            if last:
+                self._pos = end + len(CRLF)
+            else:
+                # Tail which might be the beginning of the delimiter is kept until the next chunk
+                end = max(start, len(buf) - len(self._body_terminator) + 1)
+                self._pos = end
+        if end == start and not last:
+            return None
+        view = memoryview(buf)[start:end]
+        self._exported.append(view)
+        chunk = MultipartPartChunk(self._part_headers, view, self._part_offset, last)
+        self._part_offset += end - start
+        if last:
+            self._state = self._STATE_DELIMITER
+        return chunk
@@ -0,0 +1,130 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Union
+from xml.parsers import expat
+
+__all__ = ["XmlParserBackend", "XmlToDictParser", "FlatFieldsParser"]
+
+XmlInput = Union[str, bytes, memoryview]
+
+
+class XmlParserBackend(object):
+    """Converts XML document into the dict (or list of dicts) consumed by BaseHikvisionEntity.from_xml_dict"""
+
+    def parse(self, entity_cls, xml_input: XmlInput) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        raise NotImplementedError()
+
+
+class XmlToDictParser(XmlParserBackend):
+    """Generic parser which builds complete nested dict out of the document"""
+
+    def parse(self, entity_cls, xml_input: XmlInput) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        # Imported on first use as the alerts are handled by the fast path parser
+        import xmltodict
+
+        parsed = xmltodict.parse(xml_input, xml_attribs=entity_cls.XML_PARSE_ATTRS)
+        is_list = bool(entity_cls.XML_ROOT_LIST_ELEMENT) and entity_cls.XML_ROOT_LIST_ELEMENT in parsed
+        if is_list:
+            parsed = parsed.get(entity_cls.XML_ROOT_LIST_ELEMENT)
+            if parsed is None:
+                return []
+        if entity_cls.XML_ROOT_ELEMENT:
+            parsed = parsed.get(entity_cls.XML_ROOT_ELEMENT)
+        # List of a single element is indistinguishable from the element itself for xmltodict
+        if is_list and not isinstance(parsed, list):
+            parsed = [parsed] if parsed is not None else []
+        return parsed
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _UnexpectedShape(Exception):
+    pass
+
+
+class _FieldsCollector(object):
+    """Expat handlers collecting text of the given direct children of the root element"""
+
+    def __init__(self, root_element: str, fields: FrozenSet[str]) -> None:
+        self.root_element = root_element
+        self.fields = fields
+        self.result: Dict[str, Any] = {}
+        self._depth = 0
+        self._current_field: Optional[str] = None
+        self._text: List[str] = []
+
+    def start_element(self, name, attrs):
+        self._depth += 1
+        if self._depth == 1:
+            if name != self.root_element:
+                raise _UnexpectedShape()
+        elif self._current_field is not None:
+            raise _UnexpectedShape()
+        elif self._depth == 2 and name in self.fields:
+            self._current_field = name
+            self._text.clear()
+
+    def end_element(self, name):
+        if self._current_field is not None:
+            # Mimic xmltodict: whitespaces are stripped, empty element becomes None
+            self.result[self._current_field] = "".join(self._text).strip() or None
+            self._current_field = None
+            if len(self.result) == len(self.fields):
+                raise _StopParsing()
+        self._depth -= 1
+
+    def char_data(self, data):
+        if self._current_field is not None:
+            self._text.append(data)
+
+
+class FlatFieldsParser(XmlParserBackend):
+    """Fast parser for the flat documents where only a few fields are needed.
+
+    Streams the document through expat and collects text of the declared direct children of the root element,
+    everything else is skipped without building any objects. Parsing stops as soon as all the fields are found.
+    If the document doesn't look as expected (other root element, declared field has nested elements) it falls
+    back to the generic parser.
+    """
+
+    def __init__(self, fields: Iterable[str], fallback: Optional[XmlParserBackend] = None) -> None:
+        self.fields: FrozenSet[str] = frozenset(fields)
+        self.fallback = fallback or XmlToDictParser()
+
+    def parse(self, entity_cls, xml_input: XmlInput) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        collector = _FieldsCollector(entity_cls.XML_ROOT_ELEMENT, self.fields)
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = collector.start_element
+        parser.EndElementHandler = collector.end_element
+        parser.CharacterDataHandler = collector.char_data
+        try:
+            parser.Parse(xml_input, True)
+        except _StopParsing:
+            pass
+        except _UnexpectedShape:
+            return self.fallback.parse(entity_cls, xml_input)
+        return collector.result
@@ -0,0 +1,94 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import logging
+from typing import Optional
+
+import aiohttp
+
+__all__ = ["ISAPIConnectionPool"]
+
+LOGGER = logging.getLogger("Hikvision_ISAPIClient")
+
+
+class ISAPIConnectionPool(object):
+    """Connection pool which could be shared by any number of ISAPIClient instances.
+
+    All clients using the pool go through a single session and connector so keep-alive connections, DNS cache and
+    SSL contexts are reused across devices as well as across short-living clients (e.g. ones created by config flow).
+    Note that each alert stream occupies a connection for its whole lifetime, so the per host limit should leave
+    some room for regular requests.
+    """
+
+    DEFAULT_LIMIT_PER_HOST = 4
+    DEFAULT_KEEPALIVE_TIMEOUT = 30
+    DEFAULT_DNS_CACHE_TTL = 300
+
+    _shared: Optional["ISAPIConnectionPool"] = None
+
+    def __init__(
+        self,
+        limit_per_host: int = DEFAULT_LIMIT_PER_HOST,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = DEFAULT_DNS_CACHE_TTL,
+    ) -> None:
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def shared(cls) -> "ISAPIConnectionPool":
+        """Returns process-wide pool instance. A new one is created if the previous one was closed"""
+        if cls._shared is None or cls._shared.closed:
+            cls._shared = cls()
+        return cls._shared
+
+    @property
+    def closed(self) -> bool:
+        return self._session is not None and self._session.closed
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Session bound to the pool. Should be accessed from within the running event loop"""
+        if self.closed:
+            raise RuntimeError("Connection pool is closed")
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                # Total number of connections is not limited as each device holds one for its alert stream
+                limit=0,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is None or self._session.closed:
+            return
+        try:
+            await self._session.close()
+        except Exception as e:
+            LOGGER.warning("Unable to close connection pool: " + str(e))
@@ -0,0 +1,143 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from typing import AsyncIterable, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape
+
+from .attachments import AttachmentReceiver, AttachmentSink
+from .model import EventNotificationAlert, HttpHostNotification
+from .multipart import (
+    DEFAULT_MAX_PART_SIZE,
+    MultipartPartChunk,
+    MultipartStreamParser,
+    boundary_from_content_type,
+    is_xml_content_type,
+)
+
+__all__ = ["HttpHost", "build_http_host_xml", "find_http_host_slot", "read_pushed_alerts"]
+
+DEFAULT_HTTP_HOST_ID = "1"
+
+
+class HttpHost(NamedTuple):
+    """Notification target the device posts alerts to"""
+
+    url: str
+    host_id: str = DEFAULT_HTTP_HOST_ID
+
+
+def build_http_host_xml(http_host: HttpHost) -> bytes:
+    url = urlsplit(http_host.url)
+    is_https = url.scheme == "https"
+    is_ip = _is_ip_address(url.hostname)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<HttpHostNotification version="2.0" xmlns="http://www.isapi.org/ver20/XMLSchema">'
+        "<id>{id}</id>"
+        "<url>{path}</url>"
+        "<protocolType>{protocol}</protocolType>"
+        "<parameterFormatType>XML</parameterFormatType>"
+        "<addressingFormatType>{addressing}</addressingFormatType>"
+        "<{address_tag}>{host}</{address_tag}>"
+        "<portNo>{port}</portNo>"
+        "<httpAuthenticationMethod>none</httpAuthenticationMethod>"
+        "</HttpHostNotification>".format(
+            id=escape(http_host.host_id),
+            path=escape(_url_path(http_host.url)),
+            protocol="HTTPS" if is_https else "HTTP",
+            addressing="ipaddress" if is_ip else "hostname",
+            address_tag="ipAddress" if is_ip else "hostName",
+            host=escape(url.hostname or ""),
+            port=url.port or (443 if is_https else 80),
+        )
+    ).encode()
+
+
+def _url_path(url: str) -> str:
+    """Returns the part of the URL which is stored by the device as the host url"""
+    parts = urlsplit(url)
+    return (parts.path or "/") + ("?" + parts.query if parts.query else "")
+
+
+def find_http_host_slot(hosts: List[HttpHostNotification], url: str) -> Optional[str]:
+    """Returns id of the slot which already posts to the URL, otherwise the first unused one.
+
+    Hosts configured by others are never replaced, None is returned if all the slots are taken.
+    """
+    path = _url_path(url)
+    for host in hosts:
+        if host.is_configured() and host.path == path:
+            return host.host_id
+    for host in hosts:
+        if not host.is_configured():
+            return host.host_id
+    # Some devices list only the configured hosts
+    used_ids = set(host.host_id for host in hosts)
+    return DEFAULT_HTTP_HOST_ID if DEFAULT_HTTP_HOST_ID not in used_ids else None
+
+
+def _is_ip_address(host: Optional[str]) -> bool:
+    return host is not None and (host.replace(".", "").isdigit() or ":" in host)
+
+
+async def read_pushed_alerts(
+    content_type: Optional[str],
+    content: AsyncIterable[bytes],
+    max_part_size: int = DEFAULT_MAX_PART_SIZE,
+    attachment_sink: Optional[AttachmentSink] = None,
+) -> List[EventNotificationAlert]:
+    """Parses the body of the notification posted by the device.
+
+    Plain alerts are posted as a single XML document, alerts with pictures (e.g. ANPR, face detection) are posted
+    as multipart form where only XML parts are alerts. Pictures are streamed to the attachment sink if given.
+    """
+    alerts = []
+    if content_type is not None and content_type.lower().startswith("multipart/"):
+        parser = MultipartStreamParser(
+            boundary_from_content_type(content_type),
+            max_part_size,
+            stream_part=lambda headers: not is_xml_content_type(headers),
+        )
+        attachments = AttachmentReceiver(attachment_sink)
+        try:
+            async for chunk in content:
+                for part in parser.feed(chunk):
+                    if isinstance(part, MultipartPartChunk):
+                        attachments.feed(part, alerts[-1] if alerts else None)
+                    elif len(part.payload) > 0:
+                        alerts.append(EventNotificationAlert.from_xml_str(part.payload))
+                if parser.at_eof:
+                    break
+        finally:
+            attachments.abort()
+    else:
+        body = bytearray()
+        async for chunk in content:
+            body += chunk
+            if len(body) > max_part_size:
+                raise ValueError("Notification exceeds the limit of {} bytes".format(max_part_size))
+        if len(body) > 0:
+            alerts.append(EventNotificationAlert.from_xml_str(bytes(body)))
+    # Documents other than alerts are ignored
+    return [alert for alert in alerts if alert.type is not None]
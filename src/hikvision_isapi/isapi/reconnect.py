@@ -0,0 +1,123 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import datetime
+import random
+from typing import Callable, Optional
+
+__all__ = ["ReconnectPolicy", "ExponentialBackoffPolicy", "StreamWatchdog", "StreamStalledError"]
+
+
+class StreamStalledError(Exception):
+    pass
+
+
+class ReconnectPolicy(object):
+    """Decides how long to wait before the next attempt to reconnect the alert stream"""
+
+    def next_delay(self) -> datetime.timedelta:
+        raise NotImplementedError()
+
+    def reset(self):
+        """Invoked once connection is considered healthy again"""
+        pass
+
+
+class ExponentialBackoffPolicy(ReconnectPolicy):
+    """Exponential backoff capped at the max interval.
+
+    Each delay is randomized by +/- jitter fraction so devices which lost connection at the same moment
+    (e.g. after network outage) do not reconnect in lockstep.
+    """
+
+    def __init__(
+        self,
+        initial_interval: datetime.timedelta,
+        max_interval: datetime.timedelta,
+        multiplier: float = 2,
+        jitter: float = 0.2,
+    ) -> None:
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self._interval = initial_interval
+
+    def next_delay(self) -> datetime.timedelta:
+        interval = self._interval
+        self._interval = min(self._interval * self.multiplier, self.max_interval)
+        if self.jitter:
+            interval = interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(interval, self.max_interval)
+
+    def reset(self):
+        self._interval = self.initial_interval
+
+
+class StreamWatchdog(object):
+    """Detects stalled alert stream.
+
+    Devices emit heartbeat parts into the alert stream periodically even if nothing happens, so once there were no
+    parts for `missed_heartbeats` heartbeat intervals the connection is considered dead (e.g. half-open TCP
+    connection) and `on_stall` callback is invoked. Timer is re-armed lazily so feeding the watchdog is cheap.
+    """
+
+    def __init__(
+        self,
+        heartbeat_interval: datetime.timedelta,
+        missed_heartbeats: int,
+        on_stall: Callable[[], None],
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> None:
+        self.timeout = heartbeat_interval.total_seconds() * missed_heartbeats
+        self._on_stall = on_stall
+        self._loop = loop or asyncio.get_event_loop()
+        self._last_seen = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self.stalled = False
+
+    def start(self):
+        self.stalled = False
+        self._last_seen = self._loop.time()
+        self._schedule()
+
+    def feed(self):
+        self._last_seen = self._loop.time()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self):
+        self._handle = self._loop.call_at(self._last_seen + self.timeout, self._check)
+
+    def _check(self):
+        if self._loop.time() - self._last_seen < self.timeout:
+            # Stream was fed since the timer had been armed
+            self._schedule()
+            return
+        self._handle = None
+        self.stalled = True
+        self._on_stall()
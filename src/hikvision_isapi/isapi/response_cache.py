@@ -0,0 +1,112 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+__all__ = ["ResponseCache"]
+
+Fetcher = Callable[[], Awaitable[Any]]
+
+_MISSING = object()
+
+
+class ResponseCache(object):
+    """Caches results of the device requests and deduplicates concurrent requests of the same key.
+
+    Concurrent callers of the key which is not cached (or too old) wait for a single fetch. The fetch runs as
+    a separate task so it is not cancelled if one of the waiters is gone. If max_size is set the least recently
+    used values are evicted once the limit is exceeded. Values are shared by all callers, so they must not be
+    modified.
+    """
+
+    def __init__(self, max_size: Optional[int] = None) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.fetches = 0
+        self._values: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    def get_cached(self, key: Hashable, max_age: float, default: Any = None) -> Any:
+        cached = self._values.get(key)
+        if cached is None or time.monotonic() - cached[1] > max_age:
+            return default
+        self._values.move_to_end(key)
+        return cached[0]
+
+    async def get(self, key: Hashable, fetch: Fetcher, max_age: float) -> Any:
+        """Returns cached value if it is not older than max_age seconds, otherwise fetches the new one.
+
+        Zero max age bypasses the cache, but the caller still joins the fetch which is already in progress.
+        """
+        value = self.get_cached(key, max_age, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        return await asyncio.shield(self._fetch(key, fetch))
+
+    def is_fetching(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None):
+        """Drops the values matching the predicate (all of them if not given).
+
+        Results of the fetches which are in progress are not stored, so the next request goes to the device.
+        """
+        for key in [
+            x for x in set(self._values.keys()) | set(self._in_flight.keys()) if predicate is None or predicate(x)
+        ]:
+            self._values.pop(key, None)
+            self._in_flight.pop(key, None)
+
+    def _fetch(self, key: Hashable, fetch: Fetcher) -> asyncio.Future:
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            # Nobody might be waiting for the result by the time it is done (e.g. all the waiters are cancelled)
+            future.add_done_callback(self._retrieve_exception)
+            self._in_flight[key] = future
+        return future
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Fetcher) -> Any:
+        self.fetches += 1
+        task = asyncio.current_task()
+        try:
+            value = await fetch()
+        finally:
+            is_current = self._in_flight.get(key) is task
+            if is_current:
+                del self._in_flight[key]
+        if is_current:
+            self._values[key] = (value, time.monotonic())
+            self._values.move_to_end(key)
+            while self.max_size is not None and len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _retrieve_exception(future: asyncio.Future):
+        if not future.cancelled():
+            future.exception()
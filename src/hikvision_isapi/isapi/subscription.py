@@ -0,0 +1,55 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+from typing import Iterable, List, NamedTuple, Optional
+from xml.sax.saxutils import escape
+
+__all__ = ["EventFilter", "build_subscribe_event_xml", "SUBSCRIPTION_NOT_SUPPORTED_STATUSES"]
+
+# Responses of the devices which have no event subscription (or don't support requested filter)
+SUBSCRIPTION_NOT_SUPPORTED_STATUSES = frozenset((400, 403, 404, 405, 501))
+
+
+class EventFilter(NamedTuple):
+    """Events of the given type coming from the given channels (all channels if None)"""
+
+    event_type: str
+    channels: Optional[List[str]] = None
+
+
+def build_subscribe_event_xml(filters: Iterable[EventFilter], heartbeat_interval: datetime.timedelta) -> bytes:
+    events = []
+    for event_filter in filters:
+        channels = ""
+        if event_filter.channels:
+            channels = "<channels>{}</channels>".format(escape(",".join(event_filter.channels)))
+        events.append("<Event><type>{}</type>{}</Event>".format(escape(event_filter.event_type), channels))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<SubscribeEvent version="2.0" xmlns="http://www.isapi.org/ver20/XMLSchema">'
+        "<heartbeat>{}</heartbeat>"
+        "<eventMode>list</eventMode>"
+        "<EventList>{}</EventList>"
+        "</SubscribeEvent>".format(max(1, int(heartbeat_interval.total_seconds())), "".join(events))
+    ).encode()
@@ -0,0 +1,442 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import bisect
+import datetime
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from . import const
+from .isapi.background_writer import BackgroundWriter
+from .isapi.model import EventNotificationAlert
+
+_LOGGER = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".jrn"
+INDEX_SUFFIX = ".idx"
+
+# Length and CRC32 of the record body
+RECORD_HEADER = struct.Struct("<HI")
+# Event time (microseconds since epoch) and state, followed by type, channel id and channel name
+RECORD_FIXED = struct.Struct("<qB")
+# Min and max event time, number of records and size of the sealed segment
+INDEX_HEADER = struct.Struct("<qqII")
+# Max event time of the segment records up to and including the one at the offset
+INDEX_ENTRY = struct.Struct("<qI")
+
+STATE_INACTIVE = 0
+STATE_ACTIVE = 1
+
+MAX_STRING_LENGTH = 255
+
+
+class JournalRecord(NamedTuple):
+    timestamp: datetime.datetime
+    type: str
+    state: str
+    channel_id: Optional[str]
+    channel_name: Optional[str]
+
+    def as_dict(self) -> dict:
+        result = self._asdict()
+        result["timestamp"] = self.timestamp.isoformat()
+        return result
+
+
+def to_timestamp_us(value: datetime.datetime) -> int:
+    return int(value.timestamp() * 1000000)
+
+
+def _pack_str(value: Optional[str]) -> bytes:
+    encoded = (value or "").encode()[:MAX_STRING_LENGTH]
+    return bytes((len(encoded),)) + encoded
+
+
+def encode_record(event: EventNotificationAlert) -> Tuple[int, bytes]:
+    """Returns event time and the record to append"""
+    timestamp = to_timestamp_us(event.timestamp) if event.timestamp is not None else int(time.time() * 1000000)
+    state = STATE_ACTIVE if event.state == const.ALERT_STATE_ACTIVE else STATE_INACTIVE
+    body = (
+        RECORD_FIXED.pack(timestamp, state)
+        + _pack_str(event.type)
+        + _pack_str(event.channel_id)
+        + _pack_str(event.channel_name)
+    )
+    return timestamp, RECORD_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def _read_str(buf, pos: int) -> Tuple[Optional[str], int]:
+    length = buf[pos]
+    end = pos + 1 + length
+    return (bytes(buf[pos + 1 : end]).decode(errors="replace") if length > 0 else None), end
+
+
+def _decode_record(buf, body: int) -> JournalRecord:
+    timestamp, state = RECORD_FIXED.unpack_from(buf, body)
+    pos = body + RECORD_FIXED.size
+    alert_type, pos = _read_str(buf, pos)
+    channel_id, pos = _read_str(buf, pos)
+    channel_name, pos = _read_str(buf, pos)
+    return JournalRecord(
+        datetime.datetime.fromtimestamp(timestamp / 1000000, datetime.timezone.utc),
+        alert_type,
+        const.ALERT_STATE_ACTIVE if state == STATE_ACTIVE else const.ALERT_STATE_INACTIVE,
+        channel_id,
+        channel_name,
+    )
+
+
+def _iter_records(buf, offset: int, end: int, verify: bool = False) -> Iterator[Tuple[int, int, int]]:
+    """Yields offset of the record, offset of its body and the event time. Stops at the first incomplete record"""
+    header_size = RECORD_HEADER.size
+    min_body_size = RECORD_FIXED.size + 3
+    while offset + header_size <= end:
+        length, crc = RECORD_HEADER.unpack_from(buf, offset)
+        body = offset + header_size
+        if length < min_body_size or body + length > end:
+            return
+        if verify and zlib.crc32(buf[body : body + length]) != crc:
+            return
+        yield offset, body, RECORD_FIXED.unpack_from(buf, body)[0]
+        offset = body + length
+
+
+class _Segment(object):
+    """Segment file with the sparse index of its records kept in memory"""
+
+    __slots__ = ("path", "size", "records", "min_ts", "max_ts", "index_keys", "index_offsets")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.size = 0
+        self.records = 0
+        self.min_ts: Optional[int] = None
+        self.max_ts: Optional[int] = None
+        self.index_keys: List[int] = []
+        self.index_offsets: List[int] = []
+
+    @property
+    def index_path(self) -> str:
+        return self.path[: -len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+
+    def add(self, timestamp: int, offset: int, length: int, index_interval: int):
+        self.min_ts = timestamp if self.min_ts is None else min(self.min_ts, timestamp)
+        self.max_ts = timestamp if self.max_ts is None else max(self.max_ts, timestamp)
+        if self.records % index_interval == 0:
+            self.index_keys.append(self.max_ts)
+            self.index_offsets.append(offset)
+        self.records += 1
+        self.size = offset + length
+
+    def find_offset(self, timestamp: int) -> Tuple[int, int]:
+        """Returns the offset to start the scan from to find events not older than timestamp and max event time
+        of the records preceding it.
+
+        Index keys are non-decreasing, so none of the records before the block whose key is the last one below
+        the timestamp could match, even if events are journaled out of order.
+        """
+        idx = bisect.bisect_left(self.index_keys, timestamp) - 1
+        if idx < 0:
+            return 0, self.min_ts
+        return self.index_offsets[idx], self.index_keys[idx]
+
+    def rebuild(self, index_interval: int, recover: bool = False):
+        """Builds the index by scanning the segment. Incomplete or corrupted tail is cut off if recover is set"""
+        file_size = os.path.getsize(self.path)
+        valid_end = 0
+        if file_size > 0:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), file_size, access=mmap.ACCESS_READ) as buf:
+                for offset, body, timestamp in _iter_records(buf, 0, file_size, verify=recover):
+                    length = body - offset + RECORD_HEADER.unpack_from(buf, offset)[0]
+                    self.add(timestamp, offset, length, index_interval)
+                    valid_end = offset + length
+        if recover and valid_end < file_size:
+            _LOGGER.warning(
+                "Discarding {} bytes of the incomplete journal record in {}".format(file_size - valid_end, self.path)
+            )
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+        self.size = valid_end
+
+    def load_index(self) -> bool:
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            min_ts, max_ts, records, size = INDEX_HEADER.unpack_from(data, 0)
+            if size != os.path.getsize(self.path) or records == 0:
+                return False
+            entries = [
+                INDEX_ENTRY.unpack_from(data, pos) for pos in range(INDEX_HEADER.size, len(data), INDEX_ENTRY.size)
+            ]
+        except (OSError, struct.error):
+            return False
+        self.min_ts, self.max_ts, self.records, self.size = min_ts, max_ts, records, size
+        self.index_keys = [x[0] for x in entries]
+        self.index_offsets = [x[1] for x in entries]
+        return True
+
+    def save_index(self):
+        if self.records == 0:
+            return
+        data = bytearray(INDEX_HEADER.pack(self.min_ts, self.max_ts, self.records, self.size))
+        for key, offset in zip(self.index_keys, self.index_offsets):
+            data += INDEX_ENTRY.pack(key, offset)
+        with open(self.index_path, "wb") as f:
+            f.write(data)
+
+    def remove(self):
+        for path in (self.path, self.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                _LOGGER.warning("Unable to remove journal file {}: {}".format(path, e))
+
+
+class EventJournal(object):
+    """Append-only journal of the alerts received from a single device.
+
+    Records are appended to the segment files of about segment_size bytes in the given directory, once the journal
+    exceeds max_size the oldest segments are removed. Every INDEX_INTERVAL-th record of each segment is indexed,
+    so the range query starts reading close to the requested time and segments which don't overlap the range
+    are not read at all. Segments are scanned via mmap, records are decoded only if they match the query.
+
+    Events might be journaled out of order (device clock adjustments, replays), the scan continues until events
+    are OUT_OF_ORDER_TOLERANCE newer than the end of the range, so late events older than that are not returned.
+    Opening and querying the journal is blocking. Appending never blocks: records are written, segments rotated
+    and removed by the writer thread, once WRITE_QUEUE_SIZE records are pending new ones are dropped. Write errors
+    are logged and counted, they never reach the caller. The journal is safe to query from the executor thread.
+    """
+
+    DEFAULT_SEGMENT_SIZE = 4 * 1024 * 1024
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+    DEFAULT_QUERY_LIMIT = 1000
+    INDEX_INTERVAL = 128
+    WRITE_QUEUE_SIZE = 1024
+    OUT_OF_ORDER_TOLERANCE = datetime.timedelta(minutes=5)
+
+    def __init__(self, directory: str, segment_size: int = DEFAULT_SEGMENT_SIZE, max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_size = max(max_size, segment_size)
+        self.appended = 0
+        self.write_errors = 0
+        self._segments: List[_Segment] = []
+        self._next_seq = 1
+        self._file = None
+        self._lock = threading.Lock()
+        self._writer: Optional[BackgroundWriter] = None
+
+    @classmethod
+    def open(
+        cls, directory: str, segment_size: int = DEFAULT_SEGMENT_SIZE, max_size: int = DEFAULT_MAX_SIZE
+    ) -> "EventJournal":
+        """Loads indexes of existing segments and recovers the last one after unclean shutdown"""
+        journal = cls(directory, segment_size, max_size)
+        journal._load()
+        journal._writer = BackgroundWriter("Event journal writer", cls.WRITE_QUEUE_SIZE)
+        return journal
+
+    @property
+    def size(self) -> int:
+        return sum(x.size for x in self._segments)
+
+    @property
+    def dropped(self) -> int:
+        return self._writer.dropped if self._writer is not None else 0
+
+    def append(self, event: EventNotificationAlert):
+        """Queues the event to be written by the writer thread"""
+        if self._writer is None:
+            return
+        timestamp, record = encode_record(event)
+        self._writer.submit(self._write, timestamp, record)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the queued events are written. Blocking, returns False on timeout"""
+        if self._writer is None:
+            return True
+        written = threading.Event()
+        if not self._writer.submit(written.set, force=True):
+            return False
+        return written.wait(timeout)
+
+    def _write(self, timestamp: int, record: bytes):
+        with self._lock:
+            try:
+                segment = self._current_segment(len(record))
+            except OSError as e:
+                self._write_failed(e)
+                return
+            try:
+                self._file.write(record)
+            except OSError as e:
+                self._write_failed(e)
+                try:
+                    # Partially written record must not stay in the middle of the segment
+                    self._file.truncate(segment.size)
+                except OSError:
+                    pass
+                return
+            if self.write_errors > 0:
+                _LOGGER.info("Writing to event journal {} resumed".format(self.directory))
+                self.write_errors = 0
+            segment.add(timestamp, segment.size, len(record), self.INDEX_INTERVAL)
+            self.appended += 1
+
+    def _write_failed(self, e: OSError):
+        if self.write_errors == 0:
+            _LOGGER.warning("Unable to write to event journal {}: {}".format(self.directory, e))
+        self.write_errors += 1
+
+    def _current_segment(self, record_size: int) -> _Segment:
+        """Returns the segment to append the record to. New segment is opened if the current one is full or
+        the previous attempt to open it failed"""
+        if self._file is None:
+            segment = self._open_new_segment()
+            self._enforce_max_size()
+            return segment
+        segment = self._segments[-1]
+        if segment.size > 0 and segment.size + record_size > self.segment_size:
+            segment = self._rotate()
+        return segment
+
+    def query(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        channel_id: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        limit: int = DEFAULT_QUERY_LIMIT,
+    ) -> List[JournalRecord]:
+        """Returns events which happened within the range in the journal order, optionally of the given channel
+        and type only"""
+        start_ts, end_ts = to_timestamp_us(start), to_timestamp_us(end)
+        with self._lock:
+            # Offsets and sizes are captured so records appended during the scan are ignored
+            ranges = [
+                (x.path, x.size) + x.find_offset(start_ts)
+                for x in self._segments
+                if x.records > 0 and x.max_ts >= start_ts and x.min_ts <= end_ts
+            ]
+        result = []
+        for path, size, offset, running_max in ranges:
+            try:
+                with open(path, "rb") as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as buf:
+                    self._scan(buf, offset, size, running_max, start_ts, end_ts, channel_id, alert_type, limit, result)
+            except FileNotFoundError:
+                # Removed by the retention while scanning the previous segments
+                continue
+            if len(result) >= limit:
+                break
+        return result
+
+    def _scan(self, buf, offset, size, running_max, start_ts, end_ts, channel_id, alert_type, limit, result):
+        stop_ts = end_ts + int(self.OUT_OF_ORDER_TOLERANCE.total_seconds() * 1000000)
+        # Filters are compared with the encoded values so records are decoded only if they match
+        type_filter = _pack_str(alert_type) if alert_type is not None else None
+        channel_filter = _pack_str(channel_id) if channel_id is not None else None
+        for _, body, timestamp in _iter_records(buf, offset, size):
+            running_max = max(running_max, timestamp)
+            if running_max > stop_ts:
+                return
+            if timestamp < start_ts or timestamp > end_ts:
+                continue
+            pos = body + RECORD_FIXED.size
+            type_end = pos + 1 + buf[pos]
+            if type_filter is not None and buf[pos:type_end] != type_filter:
+                continue
+            if channel_filter is not None and buf[type_end : type_end + 1 + buf[type_end]] != channel_filter:
+                continue
+            result.append(_decode_record(buf, body))
+            if len(result) >= limit:
+                return
+
+    def close(self):
+        """Stops accepting events, the file is closed by the writer thread once the queued events are written"""
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close(self._close_file)
+        else:
+            self._close_file()
+
+    def _close_file(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        seqs = sorted(
+            int(name[: -len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX) and name[: -len(SEGMENT_SUFFIX)].isdigit()
+        )
+        for i, seq in enumerate(seqs):
+            segment = _Segment(self._segment_path(seq))
+            is_last = i == len(seqs) - 1
+            if is_last or not segment.load_index():
+                segment.rebuild(self.INDEX_INTERVAL, recover=is_last)
+                if not is_last:
+                    segment.save_index()
+            self._segments.append(segment)
+        if seqs:
+            self._next_seq = seqs[-1] + 1
+            self._file = open(self._segments[-1].path, "ab", buffering=0)
+        else:
+            self._open_new_segment()
+        self._enforce_max_size()
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, "{:08d}{}".format(seq, SEGMENT_SUFFIX))
+
+    def _open_new_segment(self) -> _Segment:
+        segment = _Segment(self._segment_path(self._next_seq))
+        self._next_seq += 1
+        self._file = open(segment.path, "ab", buffering=0)
+        self._segments.append(segment)
+        return segment
+
+    def _rotate(self) -> _Segment:
+        file, self._file = self._file, None
+        file.close()
+        try:
+            self._segments[-1].save_index()
+        except OSError as e:
+            # Index will be rebuilt on next load
+            _LOGGER.warning("Unable to save journal index: {}".format(e))
+        segment = self._open_new_segment()
+        self._enforce_max_size()
+        return segment
+
+    def _enforce_max_size(self):
+        while len(self._segments) > 1 and self.size > self.max_size:
+            self._segments.pop(0).remove()
@@ -0,0 +1,101 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import logging
+from typing import Optional
+
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from . import const
+from .journal import EventJournal
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_QUERY_PERIOD = datetime.timedelta(hours=1)
+
+
+class HikvisionJournalView(HomeAssistantView):
+    """Returns journaled alerts of the entry.
+
+    Query parameters: start and end (ISO 8601, the last hour by default), channel, type and limit (1 to
+    EventJournal.DEFAULT_QUERY_LIMIT, the maximum by default).
+    """
+
+    url = const.JOURNAL_VIEW_URL
+    name = "api:{}:journal".format(const.DOMAIN)
+
+    async def get(self, request: web.Request, entry_id: str) -> web.Response:
+        hass: HomeAssistant = request.app["hass"]
+        journal: Optional[EventJournal] = hass.data[const.DOMAIN].get(entry_id, {}).get(const.DATA_JOURNAL)
+        if journal is None:
+            return self.json_message("Journal is not enabled for {}".format(entry_id), 404)
+        query = request.query
+        try:
+            end = datetime.datetime.fromisoformat(query["end"]) if "end" in query else datetime.datetime.now()
+            start = datetime.datetime.fromisoformat(query["start"]) if "start" in query else end - DEFAULT_QUERY_PERIOD
+            limit = parse_query_limit(query.get("limit"))
+        except ValueError as e:
+            return self.json_message("Invalid query: {}".format(e), 400)
+        records = await hass.async_add_executor_job(
+            journal.query, start, end, query.get("channel"), query.get("type"), limit
+        )
+        return self.json([x.as_dict() for x in records])
+
+
+def parse_query_limit(value: Optional[str]) -> int:
+    """Returns the number of records requested, larger values are capped at EventJournal.DEFAULT_QUERY_LIMIT"""
+    if value is None:
+        return EventJournal.DEFAULT_QUERY_LIMIT
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be positive, got {}".format(limit))
+    return min(limit, EventJournal.DEFAULT_QUERY_LIMIT)
+
+
+def journal_directory(hass: HomeAssistant, entry_id: str) -> str:
+    return hass.config.path(const.JOURNAL_DIRECTORY, entry_id)
+
+
+async def async_open_journal(hass: HomeAssistant, config_entry: ConfigEntry) -> Optional[EventJournal]:
+    """Opens the journal of the entry, alerts are processed without journal if it can't be opened"""
+    common_options = config_entry.options.get(const.OPT_ROOT_COMMON) or {}
+    max_size = common_options.get(const.OPT_COMMON_JOURNAL_MAX_SIZE, const.DEFAULTS_COMMON_JOURNAL_MAX_SIZE)
+    try:
+        journal = await hass.async_add_executor_job(
+            EventJournal.open,
+            journal_directory(hass, config_entry.entry_id),
+            EventJournal.DEFAULT_SEGMENT_SIZE,
+            max_size * 1024 * 1024,
+        )
+    except Exception:
+        _LOGGER.exception("Unable to open event journal of {}".format(config_entry.title))
+        return None
+    domain_data = hass.data[const.DOMAIN]
+    if not domain_data.get(const.DATA_JOURNAL_VIEW_REGISTERED):
+        hass.http.register_view(HikvisionJournalView())
+        domain_data[const.DATA_JOURNAL_VIEW_REGISTERED] = True
+    return journal
@@ -0,0 +1,144 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import PlatformNotReady
+
+from . import const
+from .device_cache import DeviceCache, inputs_changed
+from .isapi.client import ISAPIClient
+from .isapi.model import InputChannel
+from .push_listener import async_remove_push_target
+from .snapshot_cache import SnapshotCache
+from .stream_supervisor import AlertStreamSupervisor
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def name_to_id(name: str) -> str:
+    return name.strip().replace(" ", "_").replace("-", "_").lower()
+
+
+def get_stream_supervisor(hass: HomeAssistant) -> AlertStreamSupervisor:
+    """Returns supervisor shared by all the entries, it is created on first use"""
+    domain_data = hass.data[const.DOMAIN]
+    if const.DATA_STREAM_SUPERVISOR not in domain_data:
+        domain_data[const.DATA_STREAM_SUPERVISOR] = AlertStreamSupervisor(hass.loop)
+    return domain_data[const.DATA_STREAM_SUPERVISOR]
+
+
+def get_snapshot_cache(hass: HomeAssistant) -> SnapshotCache:
+    domain_data = hass.data[const.DOMAIN]
+    if const.DATA_SNAPSHOT_CACHE not in domain_data:
+        domain_data[const.DATA_SNAPSHOT_CACHE] = SnapshotCache()
+    return domain_data[const.DATA_SNAPSHOT_CACHE]
+
+
+def cameras_enabled(common_options: Dict) -> bool:
+    return common_options.get(const.OPT_COMMON_ENABLE_CAMERAS, const.DEFAULTS_COMMON_ENABLE_CAMERAS)
+
+
+async def get_inputs_cached(hass: HomeAssistant, config_entry: ConfigEntry) -> List[InputChannel]:
+    """Returns input channels of NVR from cache if available and refreshes the cache in background.
+
+    Device is queried directly only if there is nothing in cache yet. If channels returned by device differ from
+    the cached ones config entry is reloaded to reconcile entities. Cache is refreshed once per entry load even if
+    several platforms ask for inputs.
+    """
+    entry_data = hass.data[const.DOMAIN][config_entry.entry_id]
+    cache: DeviceCache = hass.data[const.DOMAIN][const.DATA_DEVICE_CACHE]
+    await cache.async_load()
+    inputs = cache.get_inputs(config_entry.entry_id)
+    if inputs is None:
+        try:
+            inputs = await entry_data[const.DATA_API_CLIENT].get_available_inputs()
+        except Exception as e:
+            raise PlatformNotReady("Unable to get list of inputs from {}".format(config_entry.title)) from e
+        cache.update(config_entry.entry_id, inputs)
+        return inputs
+    _LOGGER.debug("Using cached list of inputs for {}".format(config_entry.title))
+    if not entry_data.get(const.DATA_DEVICE_CACHE_REFRESH):
+        entry_data[const.DATA_DEVICE_CACHE_REFRESH] = True
+        entry_data[const.DATA_BG_TASKS].append(hass.async_create_task(refresh_device_cache(hass, config_entry, inputs)))
+    return inputs
+
+
+async def refresh_device_cache(hass: HomeAssistant, config_entry: ConfigEntry, cached_inputs: List[InputChannel]):
+    cache: DeviceCache = hass.data[const.DOMAIN][const.DATA_DEVICE_CACHE]
+    api_client: ISAPIClient = hass.data[const.DOMAIN][config_entry.entry_id][const.DATA_API_CLIENT]
+    try:
+        inputs = await api_client.get_available_inputs(use_cache=False)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        _LOGGER.warning("Unable to refresh data of {}, cached data will be used: {}".format(config_entry.title, e))
+        return
+    cache.update(config_entry.entry_id, inputs)
+    if inputs_changed(cached_inputs, inputs):
+        _LOGGER.info("Inputs of {} changed, reloading entities".format(config_entry.title))
+        hass.async_create_task(hass.config_entries.async_reload(config_entry.entry_id))
+
+
+def snapshot_cache_key(config_entry_id: str, channel_id: str) -> Tuple[str, str]:
+    return config_entry_id, channel_id
+
+
+async def async_stop_entry_services(hass: HomeAssistant, config_entry: ConfigEntry):
+    """Stops alert listeners, background tasks and storages of the entry.
+
+    Used on unload and when the platform setup fails and is going to be retried, so the retry starts from scratch.
+    """
+    entry_data = hass.data[const.DOMAIN][config_entry.entry_id]
+    supervisor = hass.data[const.DOMAIN].get(const.DATA_STREAM_SUPERVISOR)
+    if supervisor is not None:
+        await supervisor.detach(config_entry.entry_id)
+    if const.DATA_CHANNEL_STATUS_POLLER in entry_data:
+        entry_data.pop(const.DATA_CHANNEL_STATUS_POLLER).stop()
+    if const.DATA_JOURNAL in entry_data:
+        entry_data.pop(const.DATA_JOURNAL).close()
+    if const.DATA_ATTACHMENT_STORE in entry_data:
+        entry_data[const.DATA_API_CLIENT].attachment_sink = None
+        entry_data.pop(const.DATA_ATTACHMENT_STORE).close()
+    if const.DATA_STATE_WRITER in entry_data:
+        entry_data.pop(const.DATA_STATE_WRITER).stop()
+    for task in entry_data[const.DATA_BG_TASKS]:
+        task.cancel()
+    entry_data[const.DATA_BG_TASKS] = []
+    await async_release_push_target(hass, config_entry, entry_data)
+
+
+async def async_release_push_target(hass: HomeAssistant, config_entry: ConfigEntry, entry_data: Dict):
+    """Device stops posting alerts once the entry is unloaded, e.g. when ingestion mode is changed"""
+    push_token = entry_data.pop(const.DATA_PUSH_TOKEN, None)
+    if push_token is None:
+        return
+    hass.data[const.DOMAIN][const.DATA_PUSH_TOKENS].pop(push_token, None)
+    try:
+        await async_remove_push_target(hass, config_entry.entry_id, entry_data[const.DATA_API_CLIENT])
+    except Exception as e:
+        _LOGGER.warning("Unable to remove notification host from {}: {}".format(config_entry.title, e))
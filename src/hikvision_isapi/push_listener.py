@@ -0,0 +1,118 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import logging
+import secrets
+from typing import Optional
+
+from aiohttp import hdrs, web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.network import get_url
+
+from . import const
+from .device_cache import DeviceCache
+from .isapi.client import ISAPIClient
+from .isapi.push import HttpHost, find_http_host_slot, read_pushed_alerts
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HikvisionPushView(HomeAssistantView):
+    """Single endpoint receiving alerts posted by all the devices configured for push ingestion"""
+
+    url = const.PUSH_VIEW_URL
+    name = "api:{}:notify".format(const.DOMAIN)
+    # Devices can't authenticate against Home Assistant, random token in the URL identifies the entry instead
+    requires_auth = False
+
+    async def post(self, request: web.Request, token: str) -> web.Response:
+        hass: HomeAssistant = request.app["hass"]
+        domain_data = hass.data[const.DOMAIN]
+        entry_id = domain_data.get(const.DATA_PUSH_TOKENS, {}).get(token)
+        supervisor = domain_data.get(const.DATA_STREAM_SUPERVISOR)
+        if entry_id is None or supervisor is None or not supervisor.is_attached(entry_id):
+            return web.Response(status=404)
+        try:
+            alerts = await read_pushed_alerts(
+                request.headers.get(hdrs.CONTENT_TYPE),
+                request.content.iter_any(),
+                attachment_sink=domain_data.get(entry_id, {}).get(const.DATA_ATTACHMENT_STORE),
+            )
+        except Exception as e:
+            _LOGGER.warning("Unable to parse alert posted by {}: {}".format(request.remote, e))
+            return web.Response(status=400)
+        for alert in alerts:
+            supervisor.push(entry_id, alert)
+        return web.Response(status=200)
+
+
+async def async_register_push_target(
+    hass: HomeAssistant, entry_id: str, api_client: ISAPIClient, base_url: Optional[str] = None
+) -> str:
+    """Configures the device of the given entry to post alerts to the push endpoint, returns id of the host slot.
+
+    If base URL is not given the internal URL of Home Assistant is used, it must be reachable by the device.
+    Token is persisted, so the slot configured before restart is reused. Hosts configured by others are never
+    replaced, the free slot is taken instead.
+    """
+    domain_data = hass.data[const.DOMAIN]
+    if not domain_data.get(const.DATA_PUSH_VIEW_REGISTERED):
+        hass.http.register_view(HikvisionPushView())
+        domain_data[const.DATA_PUSH_VIEW_REGISTERED] = True
+    cache: DeviceCache = domain_data[const.DATA_DEVICE_CACHE]
+    await cache.async_load()
+    token = cache.get_push_token(entry_id)
+    if token is None:
+        token = secrets.token_urlsafe(16)
+        await cache.async_set_push_token(entry_id, token)
+    # Token is registered first so alerts posted right after configuration are not rejected
+    unregister_push_target(hass, entry_id)
+    domain_data.setdefault(const.DATA_PUSH_TOKENS, {})[token] = entry_id
+    domain_data[entry_id][const.DATA_PUSH_TOKEN] = token
+    url = (base_url or get_url(hass, allow_external=False)).rstrip("/") + const.PUSH_VIEW_URL.format(token=token)
+    host_id = find_http_host_slot(await api_client.get_http_hosts(), url)
+    if host_id is None:
+        raise RuntimeError("All notification hosts of the device are used by others")
+    await api_client.set_http_host(HttpHost(url, host_id))
+    return host_id
+
+
+async def async_remove_push_target(hass: HomeAssistant, entry_id: str, api_client: ISAPIClient):
+    """Removes the hosts posting to the push endpoint of the entry from the device, hosts of others are kept"""
+    cache: DeviceCache = hass.data[const.DOMAIN][const.DATA_DEVICE_CACHE]
+    await cache.async_load()
+    token = cache.get_push_token(entry_id)
+    if token is None:
+        return
+    path = const.PUSH_VIEW_URL.format(token=token)
+    for host in await api_client.get_http_hosts():
+        if host.is_configured() and (host.path or "").endswith(path):
+            await api_client.delete_http_host(host.host_id)
+
+
+def unregister_push_target(hass: HomeAssistant, entry_id: str):
+    domain_data = hass.data[const.DOMAIN]
+    token = domain_data.get(entry_id, {}).pop(const.DATA_PUSH_TOKEN, None)
+    if token is not None:
+        domain_data.get(const.DATA_PUSH_TOKENS, {}).pop(token, None)
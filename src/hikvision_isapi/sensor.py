@@ -0,0 +1,119 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import logging
+from typing import Any, Dict, Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import Entity
+
+from . import const
+from .platform_helpers import get_stream_supervisor, name_to_id
+from .stream_supervisor import AlertStreamSupervisor
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_INTERVAL = datetime.timedelta(seconds=30)
+
+
+async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities):
+    """Set up the platform from config_entry."""
+    common_options = config_entry.options.get(const.OPT_ROOT_COMMON) or {}
+    if not common_options.get(const.OPT_COMMON_ENABLE_DIAGNOSTICS):
+        return True
+    supervisor = get_stream_supervisor(hass)
+    entities = []
+    for metric, (metric_name, unit) in const.DIAGNOSTIC_METRICS.items():
+        sensor_id = "_".join((name_to_id(config_entry.title), "stream", metric))
+        sensor_name = "{} {}".format(config_entry.title, metric_name)
+        entities.append(
+            HikvisionStreamMetricSensor(supervisor, config_entry.entry_id, sensor_id, sensor_name, metric, unit)
+        )
+    async_add_entities(entities, True)
+    return True
+
+
+class HikvisionStreamMetricSensor(Entity):
+    """Reports one of the alert stream metrics of the device.
+
+    All the sensors of the device read the same snapshot which is cheap to build, so each of them just polls
+    the supervisor. Sensors are unavailable while the device has no alert stream attached.
+    """
+
+    def __init__(
+        self,
+        supervisor: AlertStreamSupervisor,
+        device_id: str,
+        sensor_id: str,
+        sensor_name: str,
+        metric: str,
+        unit: Optional[str],
+    ):
+        self._supervisor = supervisor
+        self._device_id = device_id
+        self._unique_id = sensor_id
+        self._name = sensor_name
+        self._metric = metric
+        self._unit = unit
+        self._snapshot: Optional[Dict[str, Any]] = None
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def unit_of_measurement(self):
+        return self._unit
+
+    @property
+    def entity_category(self):
+        return const.ENTITY_CATEGORY_DIAGNOSTIC
+
+    @property
+    def icon(self):
+        return "mdi:chart-line"
+
+    @property
+    def available(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def state(self):
+        if self._snapshot is None:
+            return None
+        return self._snapshot.get(self._metric)
+
+    @property
+    def device_state_attributes(self):
+        if self._snapshot is None:
+            return None
+        return {const.ATTR_STREAM_CONNECTED: self._snapshot.get("connected")}
+
+    async def async_update(self):
+        self._snapshot = self._supervisor.device_metrics_snapshot(self._device_id)
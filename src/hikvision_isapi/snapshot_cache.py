@@ -0,0 +1,72 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import logging
+from typing import Awaitable, Callable, Dict, Hashable
+
+from .isapi.response_cache import ResponseCache
+
+_LOGGER = logging.getLogger(__name__)
+
+SnapshotFetcher = Callable[[], Awaitable[bytes]]
+
+
+class SnapshotCache(ResponseCache):
+    """Keeps the latest snapshots of the channels, shared by all the entries.
+
+    Each entry reserves room for the images of all its channels, so the cache fits the snapshots of every camera
+    but at least min_size of them. Once there are more images the least recently used one is evicted. Concurrent
+    requests of the same image are served by a single fetch (e.g. many dashboards are open at once).
+    """
+
+    DEFAULT_MIN_SIZE = 32
+    # Alerts are repeated every second while the condition persists, there is no point in fetching more often
+    PREFETCH_MIN_INTERVAL = 1.0
+
+    def __init__(self, min_size: int = DEFAULT_MIN_SIZE) -> None:
+        super().__init__(min_size)
+        self.min_size = min_size
+        self._reserved: Dict[Hashable, int] = {}
+
+    def reserve(self, owner: Hashable, size: int):
+        """Sets the number of images the owner (e.g. config entry) needs to keep"""
+        self._reserved[owner] = size
+        self._update_max_size()
+
+    def release(self, owner: Hashable):
+        self._reserved.pop(owner, None)
+        self._update_max_size()
+
+    def _update_max_size(self):
+        self.max_size = max(self.min_size, sum(self._reserved.values()))
+
+    def prefetch(self, key: Hashable, fetch: SnapshotFetcher):
+        """Refreshes the image in background, e.g. once alert is received"""
+        if self.is_fetching(key) or self.get_cached(key, self.PREFETCH_MIN_INTERVAL) is not None:
+            return
+        self._fetch(key, fetch).add_done_callback(self._on_prefetch_done)
+
+    @staticmethod
+    def _on_prefetch_done(future):
+        if not future.cancelled() and future.exception() is not None:
+            _LOGGER.debug("Unable to prefetch snapshot: {}".format(future.exception()))
@@ -0,0 +1,87 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import logging
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from homeassistant.helpers.entity import Entity
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StateWriteBatcher(object):
+    """Coalesces state writes of the entities.
+
+    Instead of writing the state on every change entities mark themselves dirty, all the dirty entities are written
+    at once in the next event loop iteration (or after the interval). The entity marked several times is written
+    once and the write is skipped completely if neither availability, state nor attributes changed since the previous
+    one.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = 0) -> None:
+        self._loop = loop
+        self.interval = interval
+        self.writes = 0
+        self.skipped = 0
+        self._dirty: Dict[Hashable, Entity] = {}
+        self._written: Dict[Hashable, Tuple[bool, Any, Any]] = {}
+        self._handle: Optional[asyncio.Handle] = None
+
+    def mark_dirty(self, key: Hashable, entity: Entity):
+        self._dirty[key] = entity
+        if self._handle is None:
+            if self.interval > 0:
+                self._handle = self._loop.call_later(self.interval, self.flush)
+            else:
+                self._handle = self._loop.call_soon(self.flush)
+
+    def forget(self, key: Hashable):
+        self._dirty.pop(key, None)
+        self._written.pop(key, None)
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._dirty.clear()
+        self._written.clear()
+
+    def flush(self):
+        self._handle = None
+        dirty, self._dirty = self._dirty, {}
+        for key, entity in dirty.items():
+            if entity.hass is None:
+                # Entity was removed while waiting for the flush
+                continue
+            written = (entity.available, entity.state, entity.device_state_attributes)
+            if self._written.get(key) == written:
+                self.skipped += 1
+                continue
+            try:
+                entity.async_write_ha_state()
+            except Exception:
+                _LOGGER.exception("Unable to write state of {}".format(entity.entity_id))
+                continue
+            self._written[key] = written
+            self.writes += 1
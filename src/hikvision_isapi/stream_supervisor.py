@@ -0,0 +1,205 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .isapi.alert_queue import BoundedAlertQueue
+from .isapi.client import ISAPIClient
+from .isapi.metrics import MovingAverage
+from .isapi.model import EventNotificationAlert
+from .isapi.subscription import EventFilter
+
+_LOGGER = logging.getLogger(__name__)
+
+AlertHandler = Callable[[EventNotificationAlert], None]
+
+
+def _to_ms(average: MovingAverage) -> Optional[float]:
+    return round(average.value * 1000, 3) if average.value is not None else None
+
+
+class DeviceStream(object):
+    """Registry record of a single device attached to the supervisor"""
+
+    def __init__(self, device_id: str, api_client: ISAPIClient, handler: AlertHandler, queue: BoundedAlertQueue):
+        self.device_id = device_id
+        self.api_client = api_client
+        self.handler = handler
+        self.queue = queue
+        self.reader_task: Optional[asyncio.Task] = None
+        self.scheduled = False
+        self.detached = False
+        # Time from queueing the alert till it is passed to the handler and the time handler takes
+        self.dispatch_latency = MovingAverage()
+        self.handler_time = MovingAverage()
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        snapshot = self.api_client.metrics.snapshot()
+        snapshot.update(
+            {
+                "queue_depth": self.queue.qsize(),
+                "dropped_events": self.queue.dropped,
+                "coalesced_events": self.queue.coalesced,
+                "dispatch_latency_ms": _to_ms(self.dispatch_latency),
+                "handler_time_ms": _to_ms(self.handler_time),
+            }
+        )
+        return snapshot
+
+
+class AlertStreamSupervisor(object):
+    """Owns alert streams of all the devices configured in the integration.
+
+    Each device keeps a reader task as reading from the socket is the only thing which can't be multiplexed,
+    while all the received alerts are processed by a single task. Devices which have pending alerts are served
+    in round robin, one alert per device per round, so the busy NVR can't delay alerts coming from the others.
+    """
+
+    DEFAULT_QUEUE_SIZE = 1000
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._devices: Dict[str, DeviceStream] = {}
+        self._ready: Deque[DeviceStream] = deque()
+        self._wakeup = asyncio.Event()
+        self._processor_task: Optional[asyncio.Task] = None
+
+    @property
+    def devices(self) -> Dict[str, DeviceStream]:
+        return dict(self._devices)
+
+    def is_attached(self, device_id: str) -> bool:
+        return device_id in self._devices
+
+    def metrics_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Returns stream and processing metrics of all the attached devices"""
+        return {device_id: device.metrics_snapshot() for device_id, device in self._devices.items()}
+
+    def device_metrics_snapshot(self, device_id: str) -> Optional[Dict[str, Any]]:
+        device = self._devices.get(device_id)
+        return device.metrics_snapshot() if device is not None else None
+
+    def attach(
+        self,
+        device_id: str,
+        api_client: ISAPIClient,
+        handler: AlertHandler,
+        queue: Optional[BoundedAlertQueue] = None,
+        event_filters: Optional[List[EventFilter]] = None,
+        push: bool = False,
+    ) -> DeviceStream:
+        """Starts listening the alert stream of the device. Received alerts will be passed to the given handler.
+
+        Alerts waiting for processing are buffered in the given queue, by default the oldest ones are dropped
+        once there are more than DEFAULT_QUEUE_SIZE of them. Event filters limit alerts sent by the device if it
+        supports event subscription.
+        In push mode the stream is not opened, instead alerts posted by the device are passed via `push`.
+        """
+        if device_id in self._devices:
+            raise ValueError("Device {} is already attached".format(device_id))
+        device = DeviceStream(device_id, api_client, handler, queue or BoundedAlertQueue(self.DEFAULT_QUEUE_SIZE))
+        device.queue.on_put = functools.partial(self._schedule, device)
+        if not push:
+            device.reader_task = self._loop.create_task(
+                api_client.listen_hikvision_event_stream(device.queue, event_filters)
+            )
+        self._devices[device_id] = device
+        if self._processor_task is None or self._processor_task.done():
+            self._processor_task = self._loop.create_task(self._process_alerts())
+        _LOGGER.debug("Device {} attached to alert stream supervisor".format(device_id))
+        return device
+
+    def push(self, device_id: str, event: EventNotificationAlert) -> bool:
+        """Enqueues the alert received from device out of the stream. Returns False if device is not attached"""
+        device = self._devices.get(device_id)
+        if device is None:
+            return False
+        metrics = device.api_client.metrics
+        metrics.last_part_time = time.monotonic()
+        metrics.events.add()
+        try:
+            device.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Blocking queue can't pause the device, so the alert is lost
+            device.queue.dropped += 1
+        return True
+
+    async def detach(self, device_id: str):
+        """Closes alert stream of the device and drops alerts which are not processed yet"""
+        device = self._devices.pop(device_id, None)
+        if device is None:
+            return
+        device.detached = True
+        device.queue.clear()
+        if device.reader_task is not None:
+            device.reader_task.cancel()
+            await asyncio.gather(device.reader_task, return_exceptions=True)
+        _LOGGER.debug("Device {} detached from alert stream supervisor".format(device_id))
+
+    async def async_stop(self):
+        for device_id in list(self._devices.keys()):
+            await self.detach(device_id)
+        if self._processor_task is not None:
+            self._processor_task.cancel()
+            await asyncio.gather(self._processor_task, return_exceptions=True)
+            self._processor_task = None
+
+    def _schedule(self, device: DeviceStream):
+        if not device.scheduled:
+            device.scheduled = True
+            self._ready.append(device)
+            self._wakeup.set()
+
+    async def _process_alerts(self):
+        try:
+            while True:
+                if not self._ready:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                for _ in range(len(self._ready)):
+                    device = self._ready.popleft()
+                    if device.detached or device.queue.empty():
+                        device.scheduled = False
+                        continue
+                    event = device.queue.get_nowait()
+                    device.dispatch_latency.add(device.queue.last_wait)
+                    started_at = time.perf_counter()
+                    try:
+                        device.handler(event)
+                    except Exception:
+                        _LOGGER.exception("Unable to process alert received from device {}".format(device.device_id))
+                    device.handler_time.add(time.perf_counter() - started_at)
+                    if not device.queue.empty():
+                        self._ready.append(device)
+                    else:
+                        device.scheduled = False
+                # Let other tasks run between the rounds
+                await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            _LOGGER.info("Shutting down hikvision alerts processing")
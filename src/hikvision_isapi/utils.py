@@ -30,14 +30,18 @@ from homeassistant.helpers import config_validation as cv
 
 from . import const
 from .isapi.client import ISAPIClient
+from .isapi.pool import ISAPIConnectionPool
 
 
 def api_client_from_config(config: Dict) -> ISAPIClient:
+    # All the clients created by integration share the same pool of connections
     return ISAPIClient(
         config.get(const.CONF_BASE_URL),
         username=config.get(const.CONF_USER),
         password=config.get(const.CONF_PASSWORD),
         ignore_ssl_errors=config.get(const.CONF_IGNORE_SSL_ERRORS),
+        auth_type=config.get(const.CONF_AUTH_TYPE, const.AUTH_TYPE_BASIC),
+        connection_pool=ISAPIConnectionPool.shared(),
     )
 
 
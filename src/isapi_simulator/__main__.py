@@ -0,0 +1,115 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Runs simulated Hikvision devices until interrupted. Usage: python -m isapi_simulator --help"""
+
+import argparse
+import asyncio
+import logging
+
+from .device import DEFAULT_ALERT_TYPES, DeviceFleet, DeviceProfile
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m isapi_simulator", description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1, help="Number of devices to simulate")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--port", type=int, default=8080, help="Port of the first device, the next ones get consecutive ports"
+    )
+    parser.add_argument("--camera", action="store_true", help="Simulate IP cameras instead of NVRs")
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1.0, help="Average alerts per second per device")
+    parser.add_argument(
+        "--alert-types", type=lambda x: tuple(x.split(",")), default=DEFAULT_ALERT_TYPES, help="Comma separated list"
+    )
+    parser.add_argument("--burst-size", type=int, default=0, help="Number of alerts sent at once every burst interval")
+    parser.add_argument("--burst-interval", type=float, default=0)
+    parser.add_argument("--heartbeat-interval", type=float, default=10)
+    parser.add_argument("--response-delay", type=float, default=0, help="Delay before responding to any request")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Write alert stream in chunks of this size")
+    parser.add_argument("--chunk-delay", type=float, default=0, help="Delay between the chunks")
+    parser.add_argument("--disconnect-after", type=float, default=0, help="Drop alert stream after N seconds")
+    parser.add_argument("--stall-after", type=float, default=0, help="Stop sending anything after N seconds")
+    parser.add_argument(
+        "--no-event-subscription", action="store_true", help="Respond to subscribeEvent with 404 as old firmwares do"
+    )
+    parser.add_argument(
+        "--channel-flap-interval", type=float, default=0, help="Toggle random NVR channel online status every N seconds"
+    )
+    parser.add_argument(
+        "--picture-size", type=int, default=0, help="Send the picture of this size in bytes after every alert"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Makes generated alerts reproducible")
+    parser.add_argument("--stats-interval", type=float, default=10, help="How often to print stats, 0 to disable")
+    return parser.parse_args()
+
+
+def profile_from_args(args: argparse.Namespace) -> DeviceProfile:
+    return DeviceProfile(
+        nvr=not args.camera,
+        channels=args.channels,
+        rate=args.rate,
+        alert_types=args.alert_types,
+        burst_size=args.burst_size,
+        burst_interval=args.burst_interval,
+        heartbeat_interval=args.heartbeat_interval,
+        response_delay=args.response_delay,
+        chunk_size=args.chunk_size,
+        chunk_delay=args.chunk_delay,
+        disconnect_after=args.disconnect_after,
+        stall_after=args.stall_after,
+        event_subscription=not args.no_event_subscription,
+        channel_flap_interval=args.channel_flap_interval,
+        picture_size=args.picture_size,
+    )
+
+
+async def run(args: argparse.Namespace):
+    async with DeviceFleet(args.devices, profile_from_args(args), args.host, args.port, args.seed) as fleet:
+        for device, base_url in zip(fleet.devices, fleet.base_urls):
+            print("{}: {}".format(device.serial_number, base_url))
+        while True:
+            if args.stats_interval <= 0:
+                await asyncio.sleep(3600)
+                continue
+            await asyncio.sleep(args.stats_interval)
+            stats = [device.stats for device in fleet.devices]
+            print(
+                "Active streams: {}, opened: {}, alerts: {}, pushed: {}, heartbeats: {}, disconnects: {}".format(
+                    sum(s.streams_active for s in stats),
+                    sum(s.streams_opened for s in stats),
+                    sum(s.alerts_sent for s in stats),
+                    sum(s.alerts_pushed for s in stats),
+                    sum(s.heartbeats_sent for s in stats),
+                    sum(s.disconnects for s in stats),
+                )
+            )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.get_event_loop().run_until_complete(run(parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,415 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import logging
+import random
+import re
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from . import payloads
+
+_LOGGER = logging.getLogger(__name__)
+
+ENDPOINT_DEVICE_INFO = "/ISAPI/System/deviceInfo"
+ENDPOINT_INPUTS_LIST = "/ISAPI/ContentMgmt/InputProxy/channels"
+ENDPOINT_INPUTS_STATUS = "/ISAPI/ContentMgmt/InputProxy/channels/status"
+ENDPOINT_EVENT_ALERTS_STREAM = "/ISAPI/Event/notification/alertStream"
+ENDPOINT_EVENT_SUBSCRIBE = "/ISAPI/Event/notification/subscribeEvent"
+ENDPOINT_HTTP_HOSTS = "/ISAPI/Event/notification/httpHosts"
+ENDPOINT_HTTP_HOST = ENDPOINT_HTTP_HOSTS + "/{host_id}"
+ENDPOINT_SNAPSHOT = "/ISAPI/Streaming/channels/{stream_id}/picture"
+
+DEVICE_TYPE_NVR = "NVR"
+DEVICE_TYPE_CAMERA = "IPCamera"
+
+DEFAULT_ALERT_TYPES = ("vmd", "linedetection", "fielddetection")
+
+_SUBSCRIBE_EVENT_RE = re.compile(r"<Event>(.*?)</Event>", re.DOTALL)
+_SUBSCRIBE_TYPE_RE = re.compile(r"<type>(.*?)</type>")
+_SUBSCRIBE_CHANNELS_RE = re.compile(r"<channels>(.*?)</channels>")
+_HEARTBEAT_MARKER = b"<eventType>videoloss</eventType>"
+_HTTP_HOST_FIELD_RE = re.compile(r"<(url|protocolType|ipAddress|hostName|portNo)>(.*?)</\1>")
+
+# Event type (lower case): channels, None means any channel
+EventFilter = Dict[str, Optional[Set[int]]]
+
+
+class DeviceProfile(NamedTuple):
+    """Behaviour of the simulated device. All the intervals are in seconds, 0 disables the feature."""
+
+    nvr: bool = True
+    channels: int = 4
+    # Average number of alerts per second, alerts are spread randomly across channels and types
+    rate: float = 1.0
+    alert_types: Tuple[str, ...] = DEFAULT_ALERT_TYPES
+    # Every burst_interval the device sends burst_size alerts at once
+    burst_size: int = 0
+    burst_interval: float = 0
+    heartbeat_interval: float = 10
+    # Delay before responding to any request
+    response_delay: float = 0
+    # Alert stream is written in chunks of chunk_size bytes with chunk_delay between them
+    chunk_size: int = 0
+    chunk_delay: float = 0
+    # Alert stream connection is dropped once it is open for disconnect_after seconds
+    disconnect_after: float = 0
+    # Alert stream stops sending anything (including heartbeats) but keeps connection open
+    stall_after: float = 0
+    # Whether subscribeEvent is supported, otherwise it responds with 404 as old firmwares do
+    event_subscription: bool = True
+    # Whether subscribeEvent responds with the alert stream, otherwise with the plain status as some firmwares do
+    event_subscription_stream: bool = True
+    # Every channel_flap_interval random channel of NVR goes offline or back online
+    channel_flap_interval: float = 0
+    # Alerts in the stream (except heartbeats) are followed by the JPEG picture of this size in bytes
+    picture_size: int = 0
+    # Number of notification hosts the device could post alerts to
+    http_host_slots: int = 2
+
+
+class DeviceStats(object):
+    def __init__(self) -> None:
+        self.requests = 0
+        self.streams_opened = 0
+        self.streams_active = 0
+        self.alerts_sent = 0
+        # Alerts not sent as they didn't match the subscription
+        self.alerts_filtered = 0
+        # Alerts posted to the configured http host
+        self.alerts_pushed = 0
+        self.push_errors = 0
+        self.snapshots_sent = 0
+        self.channel_flaps = 0
+        self.heartbeats_sent = 0
+        self.pictures_sent = 0
+        self.disconnects = 0
+
+
+class SimulatedDevice(object):
+    """Fake Hikvision device (NVR or camera) serving the subset of ISAPI used by the integration.
+
+    Authentication is not checked so any credentials are accepted.
+    """
+
+    def __init__(self, serial_number: str, profile: DeviceProfile = DeviceProfile(), seed: Optional[int] = None):
+        self.serial_number = serial_number
+        self.profile = profile
+        self.stats = DeviceStats()
+        self._random = random.Random(seed)
+        self.push_url: Optional[str] = None
+        # Fields of the configured notification hosts by slot id
+        self.http_hosts: Dict[str, Dict[str, str]] = {}
+        self._push_task: Optional[asyncio.Task] = None
+        self.offline_channels: Set[int] = set()
+        self._last_flap: Optional[float] = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(ENDPOINT_DEVICE_INFO, self.handle_device_info)
+        if self.profile.nvr:
+            app.router.add_get(ENDPOINT_INPUTS_LIST, self.handle_inputs_list)
+            app.router.add_get(ENDPOINT_INPUTS_STATUS, self.handle_inputs_status)
+        app.router.add_get(ENDPOINT_EVENT_ALERTS_STREAM, self.handle_alert_stream)
+        if self.profile.event_subscription:
+            app.router.add_post(ENDPOINT_EVENT_SUBSCRIBE, self.handle_subscribe_event)
+        app.router.add_get(ENDPOINT_HTTP_HOSTS, self.handle_http_hosts_list)
+        app.router.add_put(ENDPOINT_HTTP_HOST, self.handle_http_host)
+        app.router.add_delete(ENDPOINT_HTTP_HOST, self.handle_http_host_delete)
+        app.router.add_get(ENDPOINT_SNAPSHOT, self.handle_snapshot)
+        return app
+
+    async def stop(self):
+        if self._push_task is not None:
+            self._push_task.cancel()
+            await asyncio.gather(self._push_task, return_exceptions=True)
+            self._push_task = None
+
+    async def _before_response(self):
+        self.stats.requests += 1
+        if self.profile.response_delay > 0:
+            await asyncio.sleep(self.profile.response_delay)
+
+    async def handle_device_info(self, request: web.Request) -> web.Response:
+        await self._before_response()
+        body = payloads.device_info_xml(
+            "Simulator {}".format(self.serial_number),
+            self.serial_number,
+            self.serial_number,
+            DEVICE_TYPE_NVR if self.profile.nvr else DEVICE_TYPE_CAMERA,
+        )
+        return web.Response(body=body, content_type="application/xml")
+
+    async def handle_inputs_list(self, request: web.Request) -> web.Response:
+        await self._before_response()
+        return web.Response(body=payloads.input_channels_xml(self.profile.channels), content_type="application/xml")
+
+    async def handle_inputs_status(self, request: web.Request) -> web.Response:
+        await self._before_response()
+        self._flap_channels()
+        return web.Response(
+            body=payloads.input_channels_status_xml(self.profile.channels, self.offline_channels),
+            content_type="application/xml",
+        )
+
+    def _flap_channels(self):
+        """Applies the channel status changes which should have happened since the previous status request"""
+        interval = self.profile.channel_flap_interval
+        if interval <= 0:
+            return
+        now = asyncio.get_event_loop().time()
+        if self._last_flap is None:
+            self._last_flap = now
+        while now - self._last_flap >= interval:
+            self._last_flap += interval
+            self.offline_channels ^= {self._random.randint(1, self.profile.channels)}
+            self.stats.channel_flaps += 1
+
+    async def handle_alert_stream(self, request: web.Request) -> web.StreamResponse:
+        await self._before_response()
+        return await self._stream_alerts(request)
+
+    async def handle_snapshot(self, request: web.Request) -> web.Response:
+        await self._before_response()
+        # Stream id is the channel number followed by the stream number
+        channel = int(request.match_info["stream_id"]) // 100
+        if not 1 <= channel <= self.profile.channels:
+            return web.Response(status=404)
+        self.stats.snapshots_sent += 1
+        return web.Response(body=payloads.snapshot_jpeg(channel), content_type="image/jpeg")
+
+    async def handle_subscribe_event(self, request: web.Request) -> web.StreamResponse:
+        await self._before_response()
+        if not self.profile.event_subscription_stream:
+            return web.Response(body=payloads.response_status_xml(request.path), content_type="application/xml")
+        event_filter: EventFilter = {}
+        for event in _SUBSCRIBE_EVENT_RE.findall(await request.text()):
+            event_type = _SUBSCRIBE_TYPE_RE.search(event)
+            if event_type is None:
+                return web.Response(status=400)
+            channels = _SUBSCRIBE_CHANNELS_RE.search(event)
+            event_filter[event_type.group(1).lower()] = (
+                set(int(x) for x in channels.group(1).split(",")) if channels is not None else None
+            )
+        return await self._stream_alerts(
+            request, event_filter, payloads.multipart_part(payloads.subscribe_event_response_xml())
+        )
+
+    async def handle_http_hosts_list(self, request: web.Request) -> web.Response:
+        await self._before_response()
+        return web.Response(
+            body=payloads.http_hosts_xml(self.profile.http_host_slots, self.http_hosts), content_type="application/xml"
+        )
+
+    async def handle_http_host(self, request: web.Request) -> web.Response:
+        """Starts posting alerts to the given host. Alert stream keeps working as on the real devices"""
+        await self._before_response()
+        host_id = request.match_info["host_id"]
+        fields = dict(_HTTP_HOST_FIELD_RE.findall(await request.text()))
+        host = fields.get("ipAddress") or fields.get("hostName")
+        if not self._is_http_host_slot(host_id) or host is None or "portNo" not in fields:
+            return web.Response(status=400)
+        self.http_hosts[host_id] = fields
+        self.push_url = _http_host_url(fields)
+        if self._push_task is None:
+            self._push_task = asyncio.get_event_loop().create_task(self._push_alerts())
+        return web.Response(body=payloads.response_status_xml(request.path), content_type="application/xml")
+
+    async def handle_http_host_delete(self, request: web.Request) -> web.Response:
+        """Clears the slot, alerts are not posted anymore once the host they are posted to is removed"""
+        await self._before_response()
+        host_id = request.match_info["host_id"]
+        if not self._is_http_host_slot(host_id):
+            return web.Response(status=400)
+        fields = self.http_hosts.pop(host_id, None)
+        if fields is not None and _http_host_url(fields) == self.push_url:
+            self.push_url = None
+            await self.stop()
+        return web.Response(body=payloads.response_status_xml(request.path), content_type="application/xml")
+
+    def _is_http_host_slot(self, host_id: str) -> bool:
+        return host_id.isdigit() and 1 <= int(host_id) <= self.profile.http_host_slots
+
+    async def _push_alerts(self):
+        async with aiohttp.ClientSession() as session:
+            async for alert in self._generate_alerts(lambda: True, None, heartbeats=False):
+                try:
+                    async with session.post(
+                        self.push_url, data=alert, headers={"Content-Type": "application/xml"}
+                    ) as response:
+                        response.raise_for_status()
+                    self.stats.alerts_pushed += 1
+                except aiohttp.ClientError as e:
+                    self.stats.push_errors += 1
+                    _LOGGER.debug("Unable to push alert to {}: {}".format(self.push_url, e))
+
+    async def _stream_alerts(
+        self, request: web.Request, event_filter: Optional[EventFilter] = None, preamble: Optional[bytes] = None
+    ) -> web.StreamResponse:
+        response = web.StreamResponse(
+            headers={"Content-Type": "multipart/mixed; boundary={}".format(payloads.MULTIPART_BOUNDARY)}
+        )
+        await response.prepare(request)
+        self.stats.streams_opened += 1
+        self.stats.streams_active += 1
+        loop = asyncio.get_event_loop()
+        opened_at = loop.time()
+        try:
+            if preamble is not None:
+                await self._write(response, preamble)
+            async for alert in self._generate_alerts(lambda: self._is_connected(request), event_filter):
+                part = payloads.multipart_part(alert)
+                if self.profile.picture_size > 0 and _HEARTBEAT_MARKER not in alert:
+                    self.stats.pictures_sent += 1
+                    part += payloads.picture_part(payloads.event_picture_jpeg(self.profile.picture_size))
+                if self.profile.stall_after > 0 and loop.time() - opened_at >= self.profile.stall_after:
+                    await self._wait_disconnected(request)
+                    break
+                if self.profile.disconnect_after > 0 and loop.time() - opened_at >= self.profile.disconnect_after:
+                    self.stats.disconnects += 1
+                    request.transport.close()
+                    break
+                await self._write(response, part)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            self.stats.streams_active -= 1
+        return response
+
+    async def _write(self, response: web.StreamResponse, data: bytes):
+        chunk_size = self.profile.chunk_size
+        if chunk_size <= 0:
+            await response.write(data)
+            return
+        for i in range(0, len(data), chunk_size):
+            await response.write(data[i : i + chunk_size])
+            if self.profile.chunk_delay > 0:
+                await asyncio.sleep(self.profile.chunk_delay)
+
+    @staticmethod
+    def _is_connected(request: web.Request) -> bool:
+        return request.transport is not None and not request.transport.is_closing()
+
+    async def _wait_disconnected(self, request: web.Request):
+        while self._is_connected(request):
+            await asyncio.sleep(1)
+
+    def _random_alert(self, event_filter: Optional[EventFilter]) -> Optional[bytes]:
+        channel = self._random.randint(1, self.profile.channels)
+        alert_type = self._random.choice(self.profile.alert_types)
+        if event_filter is not None:
+            channels = event_filter.get(alert_type.lower(), set())
+            if channels is not None and channel not in channels:
+                self.stats.alerts_filtered += 1
+                return None
+        self.stats.alerts_sent += 1
+        return payloads.alert_xml(channel, alert_type)
+
+    def _next_alert_delay(self) -> float:
+        return self._random.expovariate(self.profile.rate) if self.profile.rate > 0 else float("inf")
+
+    async def _generate_alerts(
+        self, is_alive: Callable[[], bool], event_filter: Optional[EventFilter], heartbeats: bool = True
+    ) -> AsyncIterator[bytes]:
+        profile = self.profile
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        infinity = float("inf")
+        next_alert = now + self._next_alert_delay()
+        next_heartbeat = now + profile.heartbeat_interval if heartbeats and profile.heartbeat_interval > 0 else infinity
+        next_burst = now + profile.burst_interval if profile.burst_size > 0 and profile.burst_interval > 0 else infinity
+        while is_alive():
+            # Sleep is limited so the disconnected client is noticed even if there is nothing to send
+            await asyncio.sleep(min(1.0, max(0.0, min(next_alert, next_heartbeat, next_burst) - now)))
+            now = loop.time()
+            if now >= next_heartbeat:
+                self.stats.heartbeats_sent += 1
+                yield payloads.heartbeat_xml()
+                next_heartbeat += profile.heartbeat_interval
+            alerts = []
+            if now >= next_burst:
+                alerts += [self._random_alert(event_filter) for _ in range(profile.burst_size)]
+                next_burst += profile.burst_interval
+            if now >= next_alert:
+                alerts.append(self._random_alert(event_filter))
+                next_alert = now + self._next_alert_delay()
+            for alert in alerts:
+                if alert is not None:
+                    yield alert
+
+
+def _http_host_url(fields: Dict[str, str]) -> str:
+    scheme = "https" if fields.get("protocolType", "HTTP").upper() == "HTTPS" else "http"
+    host = fields.get("ipAddress") or fields.get("hostName")
+    return "{}://{}:{}{}".format(scheme, host, fields["portNo"], fields.get("url", "/"))
+
+
+class DeviceFleet(object):
+    """Runs the number of simulated devices, each of them listens its own port"""
+
+    def __init__(
+        self,
+        count: int,
+        profile: DeviceProfile = DeviceProfile(),
+        host: str = "127.0.0.1",
+        first_port: int = 0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.host = host
+        self.first_port = first_port
+        self.devices: List[SimulatedDevice] = [
+            SimulatedDevice("SIM{:05d}".format(i), profile, seed=None if seed is None else seed + i)
+            for i in range(count)
+        ]
+        self.base_urls: List[str] = []
+        self._runners: List[web.AppRunner] = []
+
+    async def start(self):
+        for i, device in enumerate(self.devices):
+            runner = web.AppRunner(device.create_app(), access_log=None)
+            await runner.setup()
+            # With first_port 0 each device gets random free port
+            site = web.TCPSite(runner, self.host, self.first_port + i if self.first_port > 0 else 0)
+            await site.start()
+            self._runners.append(runner)
+            host, port = runner.addresses[0][:2]
+            self.base_urls.append("http://{}:{}".format(host, port))
+        _LOGGER.info("Started {} simulated devices".format(len(self.devices)))
+
+    async def stop(self):
+        for device in self.devices:
+            await device.stop()
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners.clear()
+        self.base_urls.clear()
+
+    async def __aenter__(self) -> "DeviceFleet":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
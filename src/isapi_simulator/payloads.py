@@ -0,0 +1,196 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+from typing import Collection, Dict, Optional
+
+MULTIPART_BOUNDARY = "boundary"
+
+XML_NAMESPACE = "http://www.hikvision.com/ver20/XMLSchema"
+
+
+def device_info_xml(device_name: str, device_id: str, serial_number: str, device_type: str) -> bytes:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<DeviceInfo version="2.0" xmlns="{}">\n'
+        "<deviceName>{}</deviceName>\n"
+        "<deviceID>{}</deviceID>\n"
+        "<model>ISAPI-SIMULATOR</model>\n"
+        "<serialNumber>{}</serialNumber>\n"
+        "<firmwareVersion>V4.0.0</firmwareVersion>\n"
+        "<firmwareReleaseDate>build 200101</firmwareReleaseDate>\n"
+        "<deviceType>{}</deviceType>\n"
+        "</DeviceInfo>\n".format(XML_NAMESPACE, device_name, device_id, serial_number, device_type)
+    ).encode()
+
+
+def input_channels_xml(channels: int) -> bytes:
+    entries = "".join(
+        "<InputProxyChannel><id>{}</id><name>{}</name></InputProxyChannel>\n".format(i, channel_name(i))
+        for i in range(1, channels + 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<InputProxyChannelList version="2.0" xmlns="{}" size="{}">\n{}</InputProxyChannelList>\n'.format(
+            XML_NAMESPACE, channels, entries
+        )
+    ).encode()
+
+
+def input_channels_status_xml(channels: int, offline_channels: Collection[int] = ()) -> bytes:
+    entries = "".join(
+        "<InputProxyChannelStatus><id>{}</id><online>{}</online><chanDetectResult>{}</chanDetectResult>"
+        "</InputProxyChannelStatus>\n".format(
+            i, "false" if i in offline_channels else "true", "offline" if i in offline_channels else "connect"
+        )
+        for i in range(1, channels + 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<InputProxyChannelStatusList version="2.0" xmlns="{}" size="{}">\n{}</InputProxyChannelStatusList>\n'.format(
+            XML_NAMESPACE, channels, entries
+        )
+    ).encode()
+
+
+def channel_name(channel_id: int) -> str:
+    return "Camera {:02d}".format(channel_id)
+
+
+def alert_xml(
+    channel_id: int,
+    event_type: str,
+    state: str = "active",
+    timestamp: Optional[datetime.datetime] = None,
+) -> bytes:
+    """Alert with the same set of elements as sent by the NVR"""
+    timestamp = timestamp or datetime.datetime.now().astimezone().replace(microsecond=0)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<EventNotificationAlert version="2.0" xmlns="{}">\n'
+        "<ipAddress>127.0.0.1</ipAddress>\n"
+        "<portNo>80</portNo>\n"
+        "<protocol>HTTP</protocol>\n"
+        "<macAddress>00:00:00:00:00:00</macAddress>\n"
+        "<channelID>{}</channelID>\n"
+        "<dateTime>{}</dateTime>\n"
+        "<activePostCount>1</activePostCount>\n"
+        "<eventType>{}</eventType>\n"
+        "<eventState>{}</eventState>\n"
+        "<eventDescription>{} alarm</eventDescription>\n"
+        "<channelName>{}</channelName>\n"
+        "</EventNotificationAlert>\n".format(
+            XML_NAMESPACE,
+            channel_id,
+            timestamp.isoformat(),
+            event_type,
+            state,
+            event_type,
+            channel_name(channel_id),
+        )
+    ).encode()
+
+
+def heartbeat_xml(timestamp: Optional[datetime.datetime] = None) -> bytes:
+    """Devices report inactive videoloss as the heartbeat when there are no other alerts"""
+    return alert_xml(1, "videoloss", "inactive", timestamp)
+
+
+def subscribe_event_response_xml(subscription_id: int = 1) -> bytes:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<SubscribeEventResponse version="2.0" xmlns="{}">\n'
+        "<id>{}</id>\n"
+        "</SubscribeEventResponse>\n".format(XML_NAMESPACE, subscription_id)
+    ).encode()
+
+
+def snapshot_jpeg(channel_id: int) -> bytes:
+    """Not a real picture, only JPEG markers around the channel number"""
+    return b"\xff\xd8" + "channel {}".format(channel_id).encode() + b"\xff\xd9"
+
+
+def event_picture_jpeg(size: int) -> bytes:
+    """Not a real picture either, JPEG markers around the filler of the given total size"""
+    return b"\xff\xd8" + b"\0" * max(0, size - 4) + b"\xff\xd9"
+
+
+def response_status_xml(request_url: str) -> bytes:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<ResponseStatus version="2.0" xmlns="{}">\n'
+        "<requestURL>{}</requestURL>\n"
+        "<statusCode>1</statusCode>\n"
+        "<statusString>OK</statusString>\n"
+        "<subStatusCode>ok</subStatusCode>\n"
+        "</ResponseStatus>\n".format(XML_NAMESPACE, request_url)
+    ).encode()
+
+
+def http_hosts_xml(slots: int, hosts: Dict[str, Dict[str, str]]) -> bytes:
+    """Hosts are the fields of the configured slots by slot id, unused slots have no address as on real devices"""
+    entries = ""
+    for host_id in (str(i) for i in range(1, slots + 1)):
+        fields = hosts.get(host_id, {})
+        host_tag = "hostName" if "hostName" in fields else "ipAddress"
+        entries += (
+            "<HttpHostNotification><id>{id}</id><url>{url}</url><protocolType>{protocol}</protocolType>"
+            "<parameterFormatType>XML</parameterFormatType>"
+            "<addressingFormatType>{addressing}</addressingFormatType><{tag}>{host}</{tag}><portNo>{port}</portNo>"
+            "<httpAuthenticationMethod>none</httpAuthenticationMethod></HttpHostNotification>\n".format(
+                id=host_id,
+                url=fields.get("url", "/"),
+                protocol=fields.get("protocolType", "HTTP"),
+                addressing="hostname" if host_tag == "hostName" else "ipaddress",
+                tag=host_tag,
+                host=fields.get(host_tag, "0.0.0.0"),
+                port=fields.get("portNo", "80"),
+            )
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<HttpHostNotificationList version="2.0" xmlns="{}">\n{}</HttpHostNotificationList>\n'.format(
+            XML_NAMESPACE, entries
+        )
+    ).encode()
+
+
+def multipart_part(payload: bytes, boundary: str = MULTIPART_BOUNDARY) -> bytes:
+    """Wraps the payload the same way devices do it in alertStream"""
+    return (
+        '--{}\r\nContent-Type: application/xml; charset="UTF-8"\r\nContent-Length: {}\r\n\r\n'.format(
+            boundary, len(payload)
+        ).encode()
+        + payload
+        + b"\r\n"
+    )
+
+
+def picture_part(payload: bytes, name: str = "detectionPicture", boundary: str = MULTIPART_BOUNDARY) -> bytes:
+    """Pictures follow the alert they belong to in the same stream"""
+    return (
+        '--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}.jpg"\r\n'
+        "Content-Type: image/jpeg\r\nContent-Length: {}\r\n\r\n".format(boundary, name, name, len(payload)).encode()
+        + payload
+        + b"\r\n"
+    )
@@ -0,0 +1,116 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import time
+
+import pytest
+
+from hikvision_isapi.isapi.alert_queue import BoundedAlertQueue, OverflowPolicy
+
+
+def drain(queue: BoundedAlertQueue) -> list:
+    result = []
+    while not queue.empty():
+        result.append(queue.get_nowait())
+    return result
+
+
+def test_drop_oldest():
+    queue = BoundedAlertQueue(2, OverflowPolicy.DropOldest)
+    for i in range(4):
+        queue.put_nowait(i)
+    assert drain(queue) == [2, 3]
+    assert queue.dropped == 2
+
+
+def test_drop_newest():
+    queue = BoundedAlertQueue(2, OverflowPolicy.DropNewest)
+    for i in range(4):
+        queue.put_nowait(i)
+    assert drain(queue) == [0, 1]
+    assert queue.dropped == 2
+
+
+def test_coalesce_keeps_position():
+    queue = BoundedAlertQueue(3, OverflowPolicy.CoalesceByKey, key_func=lambda x: x[0])
+    for item in [("a", 1), ("b", 1), ("a", 2), ("c", 1), ("d", 1)]:
+        queue.put_nowait(item)
+    assert drain(queue) == [("b", 1), ("c", 1), ("d", 1)]
+    assert queue.coalesced == 1
+    assert queue.dropped == 1
+
+
+def test_coalesce_requires_key_func():
+    with pytest.raises(ValueError):
+        BoundedAlertQueue(1, OverflowPolicy.CoalesceByKey)
+
+
+def test_block_raises_on_put_nowait():
+    queue = BoundedAlertQueue(1, OverflowPolicy.Block)
+    queue.put_nowait(1)
+    with pytest.raises(asyncio.QueueFull):
+        queue.put_nowait(2)
+
+
+def test_block_waits_for_free_slot():
+    async def scenario():
+        queue = BoundedAlertQueue(1, OverflowPolicy.Block)
+        await queue.put(1)
+        putter = asyncio.ensure_future(queue.put(2))
+        await asyncio.sleep(0)
+        assert not putter.done()
+        assert await queue.get() == 1
+        await asyncio.wait_for(putter, 1)
+        assert await queue.get() == 2
+
+    asyncio.get_event_loop().run_until_complete(scenario())
+
+
+def test_get_waits_for_item():
+    async def scenario():
+        queue = BoundedAlertQueue(1)
+        getter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        queue.put_nowait("x")
+        assert await asyncio.wait_for(getter, 1) == "x"
+
+    asyncio.get_event_loop().run_until_complete(scenario())
+
+
+def test_on_put_callback():
+    calls = []
+    queue = BoundedAlertQueue(1, OverflowPolicy.DropNewest)
+    queue.on_put = lambda: calls.append(1)
+    queue.put_nowait(1)
+    queue.put_nowait(2)
+    assert calls == [1]
+
+
+def test_last_wait_includes_time_in_queue():
+    queue = BoundedAlertQueue(2, OverflowPolicy.CoalesceByKey, key_func=lambda x: x[0])
+    queue.put_nowait(("a", 1))
+    time.sleep(0.02)
+    queue.put_nowait(("a", 2))
+    assert queue.get_nowait() == ("a", 2)
+    assert queue.last_wait >= 0.02
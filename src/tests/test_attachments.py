@@ -0,0 +1,115 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import os
+import threading
+
+from hikvision_isapi.isapi.attachments import PARTIAL_SUFFIX, AttachmentReceiver, DiskAttachmentStore
+from hikvision_isapi.isapi.model import EventNotificationAlert
+from hikvision_isapi.isapi.multipart import MultipartPartChunk
+
+HEADERS = {"content-type": "image/jpeg", "content-disposition": 'form-data; filename="picture.jpg"'}
+EVENT = EventNotificationAlert.from_xml_dict(
+    {
+        "eventType": "linedetection",
+        "channelID": "2",
+        "eventState": "active",
+        "dateTime": datetime.datetime(2021, 3, 1, 12, 0).isoformat(),
+    }
+)
+
+
+def feed(receiver: AttachmentReceiver, payload: bytes, chunk_size: int = 1000):
+    buf = bytearray(payload)
+    result = None
+    for offset in range(0, len(payload), chunk_size):
+        data = memoryview(buf)[offset : offset + chunk_size]
+        last = offset + chunk_size >= len(payload)
+        result = receiver.feed(MultipartPartChunk(HEADERS, data, offset, last), EVENT)
+        # Chunk is only valid during the call
+        buf[offset : offset + chunk_size] = b"\0" * len(data)
+    return result
+
+
+def stop(store: DiskAttachmentStore):
+    writer = store._writer
+    store.close()
+    assert writer.join(5)
+
+
+def test_attachment_is_stored(tmp_path):
+    store = DiskAttachmentStore.open(str(tmp_path))
+    payload = os.urandom(10000)
+    attachment = feed(AttachmentReceiver(store), payload)
+    stop(store)
+    assert attachment.size == len(payload)
+    assert os.path.basename(attachment.location) == "00000001_20210301T120000_2_linedetection.jpg"
+    with open(attachment.location, "rb") as f:
+        assert f.read() == payload
+    assert store.stored == 1 and store.size == len(payload)
+
+
+def test_oldest_attachments_are_removed(tmp_path):
+    store = DiskAttachmentStore.open(str(tmp_path), max_size=25000)
+    receiver = AttachmentReceiver(store)
+    for _ in range(5):
+        feed(receiver, os.urandom(10000))
+    stop(store)
+    assert sorted(os.listdir(str(tmp_path))) == [
+        "00000004_20210301T120000_2_linedetection.jpg",
+        "00000005_20210301T120000_2_linedetection.jpg",
+    ]
+    reopened = DiskAttachmentStore.open(str(tmp_path), max_size=25000)
+    assert reopened.size == 20000
+    stop(reopened)
+
+
+def test_oversized_and_aborted_attachments_are_discarded(tmp_path):
+    store = DiskAttachmentStore.open(str(tmp_path), max_attachment_size=5000)
+    receiver = AttachmentReceiver(store)
+    assert feed(receiver, os.urandom(10000)).location is None
+    buf = os.urandom(1000)
+    receiver.feed(MultipartPartChunk(HEADERS, memoryview(buf), 0, False), EVENT)
+    receiver.abort()
+    stop(store)
+    assert os.listdir(str(tmp_path)) == []
+    assert store.stored == 0
+
+
+def test_attachment_is_skipped_when_writer_is_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(DiskAttachmentStore, "WRITE_QUEUE_SIZE", 2)
+    store = DiskAttachmentStore.open(str(tmp_path))
+    receiver = AttachmentReceiver(store)
+    released = threading.Event()
+    store._writer.submit(released.wait, 5)
+    assert feed(receiver, os.urandom(10000)).location is None
+    assert store.dropped > 0
+    released.set()
+    drained = threading.Event()
+    store._writer.submit(drained.set, force=True)
+    assert drained.wait(5)
+    feed(receiver, os.urandom(100))
+    stop(store)
+    assert [x for x in os.listdir(str(tmp_path)) if x.endswith(PARTIAL_SUFFIX)] == []
+    assert store.stored == 1
@@ -0,0 +1,102 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import hashlib
+import re
+
+import pytest
+
+from hikvision_isapi.isapi.auth import DigestAuth
+
+CHALLENGE = 'Digest qop="auth", realm="IP Camera(12345)", nonce="abc123", stale="FALSE"'
+
+
+def parse_header(header: str) -> dict:
+    assert header.startswith("Digest ")
+    return {m.group(1): m.group(2) or m.group(3) for m in re.finditer(r'(\w+)=(?:"([^"]*)"|([^\s,]+))', header[7:])}
+
+
+def md5(value: str) -> str:
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def test_no_header_before_challenge():
+    auth = DigestAuth("admin", "secret")
+    assert not auth.has_challenge
+    assert auth.authorization_header("GET", "/ISAPI/System/deviceInfo") is None
+
+
+def test_authorization_header_matches_rfc():
+    auth = DigestAuth("admin", "secret")
+    assert auth.update_challenge(CHALLENGE)
+    params = parse_header(auth.authorization_header("GET", "/ISAPI/System/deviceInfo"))
+    ha1 = md5("admin:IP Camera(12345):secret")
+    ha2 = md5("GET:/ISAPI/System/deviceInfo")
+    expected = md5("{}:abc123:{}:{}:auth:{}".format(ha1, params["nc"], params["cnonce"], ha2))
+    assert params["response"] == expected
+    assert params["uri"] == "/ISAPI/System/deviceInfo"
+    assert params["nc"] == "00000001"
+
+
+def test_nonce_count_increments():
+    auth = DigestAuth("admin", "secret")
+    auth.update_challenge(CHALLENGE)
+    auth.authorization_header("GET", "/a")
+    assert parse_header(auth.authorization_header("GET", "/a"))["nc"] == "00000002"
+
+
+def test_without_qop_uses_legacy_response():
+    auth = DigestAuth("admin", "secret")
+    auth.update_challenge('Digest realm="r", nonce="n1"')
+    params = parse_header(auth.authorization_header("PUT", "/x"))
+    assert "qop" not in params
+    assert params["response"] == md5("{}:n1:{}".format(md5("admin:r:secret"), md5("PUT:/x")))
+
+
+def test_sha256_challenge():
+    auth = DigestAuth("admin", "secret")
+    assert auth.update_challenge('Digest realm="r", nonce="n1", algorithm=SHA-256, qop="auth"')
+    params = parse_header(auth.authorization_header("GET", "/x"))
+    assert params["algorithm"] == "SHA-256"
+    assert len(params["response"]) == 64
+
+
+@pytest.mark.parametrize(
+    "header", [None, "", 'Basic realm="r"', 'Digest realm="r"', 'Digest nonce="n", algorithm=SHA-512-256']
+)
+def test_unusable_challenge_rejected(header):
+    assert not DigestAuth("admin", "secret").update_challenge(header)
+
+
+def test_same_nonce_means_wrong_credentials():
+    auth = DigestAuth("admin", "secret")
+    assert auth.update_challenge(CHALLENGE)
+    assert not auth.update_challenge(CHALLENGE)
+
+
+def test_stale_nonce_is_replaced():
+    auth = DigestAuth("admin", "secret")
+    auth.update_challenge(CHALLENGE)
+    auth.authorization_header("GET", "/a")
+    assert auth.update_challenge('Digest qop="auth", realm="r", nonce="abc123", stale="TRUE"')
+    assert parse_header(auth.authorization_header("GET", "/a"))["nc"] == "00000001"
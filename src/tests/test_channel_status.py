@@ -0,0 +1,126 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import datetime
+import types
+
+import aiohttp
+
+from hikvision_isapi.channel_status import ChannelStatusPoller
+
+
+class FakeClient(object):
+    """Replies with the scripted statuses (dict of channel id to online) or exceptions, hangs once they are over"""
+
+    def __init__(self, replies: list):
+        self.replies = list(replies)
+        self.poller = None
+        self.intervals = []
+
+    async def get_inputs_status(self) -> list:
+        self.intervals.append(self.poller.interval)
+        if not self.replies:
+            await asyncio.Event().wait()
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return [types.SimpleNamespace(input_id=k, online=v) for k, v in reply.items()]
+
+
+def make_poller(replies: list, min_ms: int = 10, max_ms: int = 40):
+    client = FakeClient(replies)
+    client.poller = ChannelStatusPoller(
+        asyncio.get_event_loop(),
+        client,
+        datetime.timedelta(milliseconds=min_ms),
+        datetime.timedelta(milliseconds=max_ms),
+    )
+    return client.poller
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_only_changed_channels_are_notified():
+    async def scenario():
+        poller = make_poller([{"1": True, "2": True}, {"1": True, "2": False}, {"1": True, "2": False}])
+        notified = []
+        poller.add_listener("1", lambda: notified.append("1"))
+        remove = poller.add_listener("2", lambda: notified.append("2"))
+        changes = [await poller.async_poll()]
+        changes.append(await poller.async_poll())
+        remove()
+        changes.append(await poller.async_poll())
+        return changes, notified, poller.is_online("2")
+
+    changes, notified, online = run(scenario())
+    assert changes == [{"1", "2"}, {"2"}, set()]
+    assert sorted(notified) == ["1", "2", "2"]
+    assert online is False
+
+
+def test_interval_backs_off_while_nothing_changes_and_after_failures():
+    async def scenario():
+        poller = make_poller(
+            [
+                {"1": True},
+                {"1": True},
+                {"1": True},
+                {"1": True},
+                {"1": False},
+                aiohttp.ClientConnectionError(),
+                {"1": False},
+            ]
+        )
+        notified = []
+        poller.add_listener("1", lambda: notified.append(poller.available))
+        poller.start()
+        while poller.api_client.replies:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        poller.stop()
+        return poller.api_client.intervals, notified
+
+    intervals, notified = run(scenario())
+    # Interval the poll was made after, the first one is made right away
+    assert intervals[1:] == [0.01, 0.02, 0.04, 0.04, 0.01, 0.02, 0.01]
+    # Initial status, change, device unavailable, device available again
+    assert notified == [True, True, False, True]
+
+
+def test_polling_stops_if_not_supported():
+    async def scenario():
+        error = aiohttp.ClientResponseError(None, (), status=404)
+        poller = make_poller([{"1": True}, error, {"1": True}])
+        poller.start()
+        await asyncio.sleep(0.1)
+        poller.stop()
+        return poller
+
+    poller = run(scenario())
+    assert not poller.supported
+    assert not poller.available
+    assert poller.polls == 1
+    assert poller.api_client.replies == [{"1": True}]
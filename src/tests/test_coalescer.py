@@ -0,0 +1,89 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import types
+
+from hikvision_isapi import coalescer
+from hikvision_isapi.coalescer import AlertCoalescer
+from hikvision_isapi.isapi.model import EventNotificationAlert
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def alert(channel: str = "1", alert_type: str = "VMD", state: str = "active") -> EventNotificationAlert:
+    return EventNotificationAlert.from_xml_dict(
+        {"eventType": alert_type, "channelID": channel, "eventState": state, "dateTime": "2021-03-01T12:00:00"}
+    )
+
+
+def make_coalescer(monkeypatch, seconds: int = 5):
+    clock = FakeClock()
+    monkeypatch.setattr(coalescer, "time", types.SimpleNamespace(monotonic=clock))
+    return AlertCoalescer(datetime.timedelta(seconds=seconds)), clock
+
+
+def test_repeats_within_window_are_suppressed(monkeypatch):
+    instance, clock = make_coalescer(monkeypatch)
+    forwarded = []
+    for _ in range(4):
+        forwarded.append(instance.should_forward(alert()))
+        clock.now += 1
+    assert forwarded == [True, False, False, False]
+    assert instance.suppressed == 3
+
+
+def test_first_repeat_after_window_is_forwarded(monkeypatch):
+    instance, clock = make_coalescer(monkeypatch)
+    assert instance.should_forward(alert())
+    clock.now += 4.9
+    assert not instance.should_forward(alert())
+    # The window starts from the last forwarded alert, not from the last repeat
+    clock.now += 0.1
+    assert instance.should_forward(alert())
+    clock.now += 1
+    assert not instance.should_forward(alert())
+
+
+def test_state_transition_is_forwarded_immediately(monkeypatch):
+    instance, clock = make_coalescer(monkeypatch)
+    assert instance.should_forward(alert(state="active"))
+    clock.now += 1
+    assert instance.should_forward(alert(state="inactive"))
+    clock.now += 1
+    assert instance.should_forward(alert(state="active"))
+    assert instance.suppressed == 0
+
+
+def test_channels_and_types_are_coalesced_separately(monkeypatch):
+    instance, _ = make_coalescer(monkeypatch)
+    assert instance.should_forward(alert(channel="1"))
+    assert instance.should_forward(alert(channel="2"))
+    assert instance.should_forward(alert(channel="1", alert_type="linedetection"))
+    assert not instance.should_forward(alert(channel="2"))
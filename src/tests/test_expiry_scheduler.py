@@ -0,0 +1,97 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+
+from hikvision_isapi.expiry_scheduler import ExpiryScheduler
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_fires_in_deadline_order():
+    async def scenario():
+        scheduler = ExpiryScheduler(asyncio.get_event_loop())
+        fired = []
+        scheduler.schedule("b", 0.04, lambda: fired.append("b"))
+        scheduler.schedule("a", 0.02, lambda: fired.append("a"))
+        await asyncio.sleep(0.1)
+        return fired
+
+    assert run(scenario()) == ["a", "b"]
+
+
+def test_postponed_deadline():
+    async def scenario():
+        scheduler = ExpiryScheduler(asyncio.get_event_loop())
+        fired = []
+        scheduler.schedule("a", 0.02, lambda: fired.append(1))
+        scheduler.schedule("a", 0.08, lambda: fired.append(2))
+        await asyncio.sleep(0.05)
+        assert fired == []
+        await asyncio.sleep(0.08)
+        return fired
+
+    assert run(scenario()) == [2]
+
+
+def test_earlier_deadline_rearms_timer():
+    async def scenario():
+        scheduler = ExpiryScheduler(asyncio.get_event_loop())
+        fired = []
+        scheduler.schedule("a", 1, lambda: fired.append(1))
+        scheduler.schedule("a", 0.02, lambda: fired.append(2))
+        await asyncio.sleep(0.06)
+        scheduler.stop()
+        return fired
+
+    assert run(scenario()) == [2]
+
+
+def test_cancel_and_stop():
+    async def scenario():
+        scheduler = ExpiryScheduler(asyncio.get_event_loop())
+        fired = []
+        scheduler.schedule("a", 0.02, lambda: fired.append("a"))
+        scheduler.schedule("b", 0.02, lambda: fired.append("b"))
+        scheduler.cancel("a")
+        await asyncio.sleep(0.05)
+        scheduler.schedule("c", 0.02, lambda: fired.append("c"))
+        scheduler.stop()
+        await asyncio.sleep(0.05)
+        return fired
+
+    assert run(scenario()) == ["b"]
+
+
+def test_callback_error_does_not_stop_others():
+    async def scenario():
+        scheduler = ExpiryScheduler(asyncio.get_event_loop())
+        fired = []
+        scheduler.schedule("a", 0.01, lambda: 1 / 0)
+        scheduler.schedule("b", 0.01, lambda: fired.append("b"))
+        await asyncio.sleep(0.05)
+        return fired
+
+    assert run(scenario()) == ["b"]
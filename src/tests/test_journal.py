@@ -0,0 +1,149 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import os
+
+import pytest
+
+from hikvision_isapi.isapi.model import EventNotificationAlert
+from hikvision_isapi.journal import SEGMENT_SUFFIX, EventJournal
+
+START = datetime.datetime(2021, 3, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+def alert(seconds: int, channel: str = "1", alert_type: str = "VMD") -> EventNotificationAlert:
+    return EventNotificationAlert.from_xml_dict(
+        {
+            "eventType": alert_type,
+            "channelID": channel,
+            "channelName": "Camera " + channel,
+            "eventState": "active",
+            "dateTime": (START + datetime.timedelta(seconds=seconds)).isoformat(),
+        }
+    )
+
+
+def query_all(journal: EventJournal, **kwargs) -> list:
+    return journal.query(START, START + datetime.timedelta(days=1), **kwargs)
+
+
+def test_round_trip(tmp_path):
+    journal = EventJournal.open(str(tmp_path))
+    for i in range(300):
+        journal.append(alert(i, channel=str(i % 3 + 1), alert_type="VMD" if i % 2 else "linedetection"))
+    assert journal.flush(5)
+    records = query_all(journal)
+    assert [x.timestamp for x in records] == [START + datetime.timedelta(seconds=i) for i in range(300)]
+    assert records[1].as_dict() == {
+        "timestamp": (START + datetime.timedelta(seconds=1)).isoformat(),
+        "type": "VMD",
+        "state": "active",
+        "channel_id": "2",
+        "channel_name": "Camera 2",
+    }
+    filtered = query_all(journal, channel_id="3", alert_type="VMD")
+    assert len(filtered) == 50 and all(x.channel_id == "3" and x.type == "VMD" for x in filtered)
+    window = journal.query(START + datetime.timedelta(seconds=100), START + datetime.timedelta(seconds=109))
+    assert len(window) == 10
+    journal.close()
+    assert journal._writer is None
+
+
+def test_reopen_keeps_records_and_retention(tmp_path):
+    journal = EventJournal.open(str(tmp_path), segment_size=1024, max_size=4096)
+    for i in range(500):
+        journal.append(alert(i))
+    journal.flush(5)
+    journal.close()
+    segments = [x for x in os.listdir(str(tmp_path)) if x.endswith(SEGMENT_SUFFIX)]
+    assert 1 < len(segments) <= 5
+    reopened = EventJournal.open(str(tmp_path), segment_size=1024, max_size=4096)
+    records = query_all(reopened)
+    assert records and records[-1].timestamp == START + datetime.timedelta(seconds=499)
+    assert reopened.size <= 4096 + 1024
+    reopened.close()
+
+
+def test_partial_record_is_discarded_on_open(tmp_path):
+    journal = EventJournal.open(str(tmp_path))
+    for i in range(10):
+        journal.append(alert(i))
+    journal.flush(5)
+    path = journal._segments[-1].path
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(b"\x40\x00\x01")
+    reopened = EventJournal.open(str(tmp_path))
+    assert len(query_all(reopened)) == 10
+    reopened.append(alert(10))
+    reopened.flush(5)
+    assert len(query_all(reopened)) == 11
+    reopened.close()
+
+
+def test_failed_rotation_doesnt_raise(tmp_path, monkeypatch):
+    journal = EventJournal.open(str(tmp_path), segment_size=256)
+    for i in range(5):
+        journal.append(alert(i))
+    journal.flush(5)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk is full")
+
+    monkeypatch.setattr(journal, "_open_new_segment", fail)
+    for i in range(5, 10):
+        journal.append(alert(i))
+    journal.flush(5)
+    assert journal.write_errors > 0
+    monkeypatch.undo()
+    journal.append(alert(10))
+    journal.flush(5)
+    assert journal.write_errors == 0
+    assert query_all(journal)[-1].timestamp == START + datetime.timedelta(seconds=10)
+    journal.close()
+
+
+def test_append_never_blocks_when_writer_is_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(EventJournal, "WRITE_QUEUE_SIZE", 2)
+    journal = EventJournal.open(str(tmp_path))
+    with journal._lock:
+        # Writer thread waits for the lock, so the queue fills up
+        for i in range(10):
+            journal.append(alert(i))
+    assert journal.dropped > 0
+    journal.flush(5)
+    assert len(query_all(journal)) == 10 - journal.dropped
+    journal.close()
+
+
+def test_query_limit_is_validated_and_capped():
+    pytest.importorskip("homeassistant")
+    from hikvision_isapi.journal_view import parse_query_limit
+
+    assert parse_query_limit(None) == EventJournal.DEFAULT_QUERY_LIMIT
+    assert parse_query_limit("5") == 5
+    assert parse_query_limit(str(EventJournal.DEFAULT_QUERY_LIMIT * 100)) == EventJournal.DEFAULT_QUERY_LIMIT
+    for value in ("0", "-1", "many"):
+        with pytest.raises(ValueError):
+            parse_query_limit(value)
@@ -0,0 +1,153 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import pytest
+
+from hikvision_isapi.isapi.multipart import (
+    MultipartParseError,
+    MultipartPartChunk,
+    MultipartStreamParser,
+    PartTooLargeError,
+    boundary_from_content_type,
+    is_xml_content_type,
+)
+
+BOUNDARY = "boundary"
+
+
+def part(payload: bytes, content_type: str = "application/xml", with_length: bool = True, crlf: bool = True) -> bytes:
+    headers = "--{}\r\nContent-Type: {}\r\n".format(BOUNDARY, content_type)
+    if with_length:
+        headers += "Content-Length: {}\r\n".format(len(payload))
+    return (headers + "\r\n").encode() + payload + (b"\r\n" if crlf else b"")
+
+
+def feed_all(parser: MultipartStreamParser, chunks) -> list:
+    """Returns (content type, payload) of all the parts, streamed parts are reassembled"""
+    result = []
+    streamed = None
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            if isinstance(item, MultipartPartChunk):
+                if item.offset == 0:
+                    streamed = bytearray()
+                assert item.offset == len(streamed)
+                streamed += item.data
+                if item.last:
+                    result.append((item.content_type, bytes(streamed)))
+            else:
+                result.append((item.content_type, bytes(item.payload)))
+    return result
+
+
+def split_every(data: bytes, size: int) -> list:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def test_boundary_from_content_type():
+    assert boundary_from_content_type('multipart/mixed; boundary="abc"') == "abc"
+    assert boundary_from_content_type("multipart/mixed;Boundary=abc") == "abc"
+    with pytest.raises(MultipartParseError):
+        boundary_from_content_type("multipart/mixed")
+
+
+@pytest.mark.parametrize("with_length", [True, False])
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 10000])
+def test_parts_split_across_chunks(with_length, chunk_size):
+    payloads = [b"<a>1</a>", b"", b"<b>" + b"x" * 500 + b"</b>"]
+    stream = b"preamble\r\n" + b"".join(part(p, with_length=with_length) for p in payloads) + b"--boundary--\r\n"
+    parser = MultipartStreamParser(BOUNDARY)
+    assert [p for _, p in feed_all(parser, split_every(stream, chunk_size))] == payloads
+    assert parser.at_eof
+
+
+def test_content_length_part_without_trailing_crlf():
+    stream = part(b"<a>--boundary</a>", crlf=False) + part(b"<b/>", crlf=False) + b"--boundary--"
+    parser = MultipartStreamParser(BOUNDARY)
+    assert [p for _, p in feed_all(parser, split_every(stream, 3))] == [b"<a>--boundary</a>", b"<b/>"]
+    assert parser.at_eof
+
+
+def test_part_without_headers():
+    parser = MultipartStreamParser(BOUNDARY)
+    assert feed_all(parser, [b"--boundary\r\n\r\n<a/>\r\n--boundary\r\n"]) == [(None, b"<a/>")]
+
+
+def test_oversize_part_with_content_length():
+    parser = MultipartStreamParser(BOUNDARY, max_part_size=10)
+    with pytest.raises(PartTooLargeError):
+        feed_all(parser, [part(b"x" * 11)])
+
+
+def test_oversize_part_without_content_length():
+    parser = MultipartStreamParser(BOUNDARY, max_part_size=10)
+    with pytest.raises(PartTooLargeError):
+        feed_all(parser, split_every(part(b"x" * 100, with_length=False), 5))
+
+
+def test_invalid_content_length():
+    with pytest.raises(MultipartParseError):
+        feed_all(MultipartStreamParser(BOUNDARY), [b"--boundary\r\nContent-Length: abc\r\n\r\n"])
+
+
+def test_buffer_does_not_grow_with_consumed_parts():
+    parser = MultipartStreamParser(BOUNDARY)
+    for _ in range(1000):
+        feed_all(parser, [part(b"<a>" + b"x" * 100 + b"</a>")])
+    assert len(parser._buffer) < 200
+
+
+def test_search_resumes_where_it_stopped():
+    parser = MultipartStreamParser(BOUNDARY)
+    assert feed_all(parser, [b"--boundary\r\n\r\n"] + [b"x" * 100] * 50) == []
+    assert parser._body_scanned == 5000
+    assert feed_all(parser, [b"y\r\n--bou", b"ndary\r\n"]) == [(None, b"x" * 5000 + b"y")]
+
+
+@pytest.mark.parametrize("with_length", [True, False])
+@pytest.mark.parametrize("chunk_size", [1, 13, 4096])
+def test_binary_parts_are_streamed(with_length, chunk_size):
+    picture = bytes(range(256)) * 40
+    stream = part(b"<a/>") + part(picture, "image/jpeg", with_length) + part(b"<b/>") + b"--boundary--\r\n"
+    parser = MultipartStreamParser(BOUNDARY, max_part_size=100, stream_part=lambda h: not is_xml_content_type(h))
+    assert feed_all(parser, split_every(stream, chunk_size)) == [
+        ("application/xml", b"<a/>"),
+        ("image/jpeg", picture),
+        ("application/xml", b"<b/>"),
+    ]
+    # Streamed payload is not accumulated
+    assert len(parser._buffer) < chunk_size + 200
+
+
+def test_empty_streamed_part():
+    parser = MultipartStreamParser(BOUNDARY, stream_part=lambda h: True)
+    assert feed_all(parser, [part(b"", "image/jpeg") + b"--boundary--\r\n"]) == [("image/jpeg", b"")]
+
+
+@pytest.mark.parametrize(
+    "content_type, expected",
+    [(None, True), ("application/xml", True), ('text/xml; charset="UTF-8"', True), ("image/jpeg", False)],
+)
+def test_is_xml_content_type(content_type, expected):
+    headers = {"content-type": content_type} if content_type is not None else {}
+    assert is_xml_content_type(headers) == expected
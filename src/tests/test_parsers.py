@@ -0,0 +1,79 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+
+import pytest
+
+from benchmarks.payloads import ALL_ALERTS, synthetic_alert
+from hikvision_isapi.isapi.model import EventNotificationAlert, InputChannelStatus
+from hikvision_isapi.isapi.parsers import FlatFieldsParser, XmlToDictParser
+from isapi_simulator.payloads import input_channels_status_xml
+
+FIELDS = EventNotificationAlert.XML_PARSER.fields
+
+
+def xmltodict_fields(payload: bytes) -> dict:
+    parsed = XmlToDictParser().parse(EventNotificationAlert, payload)
+    return {k: v for k, v in parsed.items() if k in FIELDS}
+
+
+@pytest.mark.parametrize("name", sorted(ALL_ALERTS))
+def test_fast_path_matches_xmltodict(name):
+    payload = ALL_ALERTS[name]
+    assert FlatFieldsParser(FIELDS).parse(EventNotificationAlert, payload) == xmltodict_fields(payload)
+
+
+def test_fast_path_accepts_memoryview():
+    payload = synthetic_alert(3, "vmd")
+    assert FlatFieldsParser(FIELDS).parse(EventNotificationAlert, memoryview(payload)) == xmltodict_fields(payload)
+
+
+def test_empty_and_whitespace_elements_become_none():
+    payload = b"<EventNotificationAlert><channelID> </channelID><eventType>vmd</eventType></EventNotificationAlert>"
+    result = FlatFieldsParser(FIELDS).parse(EventNotificationAlert, payload)
+    assert result == {"channelID": None, "eventType": "vmd"} == xmltodict_fields(payload)
+
+
+def test_unexpected_shape_falls_back():
+    payload = b"<EventNotificationAlert><eventType><nested>x</nested></eventType></EventNotificationAlert>"
+    assert FlatFieldsParser(FIELDS).parse(EventNotificationAlert, payload) == xmltodict_fields(payload)
+
+
+def test_other_document_is_not_alert():
+    event = EventNotificationAlert.from_xml_str(b"<SubscribeEventResponse><id>1</id></SubscribeEventResponse>")
+    assert event.type is None
+
+
+def test_alert_fields_decoded():
+    event = EventNotificationAlert.from_xml_str(ALL_ALERTS["line_crossing"])
+    assert (event.type, event.state, event.channel_id, event.channel_name) == ("linedetection", "active", "12", "Gate")
+    assert event.timestamp == datetime.datetime(
+        2021, 3, 14, 12, 24, 51, tzinfo=datetime.timezone(datetime.timedelta(hours=2))
+    )
+
+
+@pytest.mark.parametrize("channels", [0, 1, 3])
+def test_root_list_of_any_size(channels):
+    statuses = InputChannelStatus.from_xml_str(input_channels_status_xml(channels, offline_channels={2}))
+    assert [(x.input_id, x.online) for x in statuses] == [(str(i), i != 2) for i in range(1, channels + 1)]
@@ -0,0 +1,77 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+
+from hikvision_isapi.isapi.client import ISAPIClient
+from hikvision_isapi.isapi.model import HttpHostNotification
+from hikvision_isapi.isapi.push import HttpHost, find_http_host_slot
+from isapi_simulator import DeviceFleet, DeviceProfile
+from isapi_simulator.payloads import http_hosts_xml
+
+OWN_URL = "http://192.168.1.10:8123/api/hikvision_isapi/notify/token"
+OTHER_HOST = {"url": "/alarm", "protocolType": "HTTP", "ipAddress": "192.168.1.20", "portNo": "8080"}
+OWN_HOST = {"url": "/api/hikvision_isapi/notify/token", "protocolType": "HTTP", "ipAddress": "192.168.1.10"}
+
+
+def hosts(slots: int, configured: dict) -> list:
+    return HttpHostNotification.from_xml_str(http_hosts_xml(slots, configured))
+
+
+def test_hosts_are_parsed():
+    parsed = hosts(2, {"1": OTHER_HOST})
+    assert [x.host_id for x in parsed] == ["1", "2"]
+    assert parsed[0].is_configured() and parsed[0].url == "http://192.168.1.20:8080/alarm"
+    assert not parsed[1].is_configured() and parsed[1].url is None
+
+
+def test_hosts_of_others_are_not_replaced():
+    assert find_http_host_slot(hosts(2, {"1": OTHER_HOST}), OWN_URL) == "2"
+    assert find_http_host_slot(hosts(1, {"1": OTHER_HOST}), OWN_URL) is None
+
+
+def test_own_slot_is_reused():
+    assert find_http_host_slot(hosts(3, {"1": OTHER_HOST, "3": dict(OWN_HOST, portNo="8123")}), OWN_URL) == "3"
+
+
+def test_first_slot_is_used_if_none_listed():
+    assert find_http_host_slot([], OWN_URL) == "1"
+
+
+def test_http_host_round_trip():
+    async def run():
+        async with DeviceFleet(1, DeviceProfile(rate=0, heartbeat_interval=0)) as fleet:
+            device = fleet.devices[0]
+            device.http_hosts["1"] = dict(OTHER_HOST)
+            async with ISAPIClient(fleet.base_urls[0], "admin", "password") as client:
+                host_id = find_http_host_slot(await client.get_http_hosts(), OWN_URL)
+                await client.set_http_host(HttpHost(OWN_URL, host_id))
+                configured = [x.url for x in await client.get_http_hosts() if x.is_configured()]
+                await client.delete_http_host(host_id)
+                remaining = [x.url for x in await client.get_http_hosts() if x.is_configured()]
+            return host_id, configured, remaining
+
+    host_id, configured, remaining = asyncio.get_event_loop().run_until_complete(run())
+    assert host_id == "2"
+    assert configured == ["http://192.168.1.20:8080/alarm", OWN_URL]
+    assert remaining == ["http://192.168.1.20:8080/alarm"]
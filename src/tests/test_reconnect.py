@@ -0,0 +1,89 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import datetime
+import random
+
+from hikvision_isapi.isapi.reconnect import ExponentialBackoffPolicy, StreamWatchdog
+
+SECOND = datetime.timedelta(seconds=1)
+
+
+def delays(policy: ExponentialBackoffPolicy, count: int) -> list:
+    return [policy.next_delay().total_seconds() for _ in range(count)]
+
+
+def test_backoff_grows_up_to_max_interval():
+    policy = ExponentialBackoffPolicy(SECOND, 10 * SECOND, jitter=0)
+    assert delays(policy, 6) == [1, 2, 4, 8, 10, 10]
+    policy.reset()
+    assert delays(policy, 2) == [1, 2]
+
+
+def test_jitter_stays_within_bounds():
+    random.seed(1)
+    policy = ExponentialBackoffPolicy(SECOND, 10 * SECOND, jitter=0.2)
+    for _ in range(50):
+        policy.reset()
+        for expected, actual in zip([1, 2, 4, 8, 10, 10], delays(policy, 6)):
+            assert expected * 0.8 <= actual <= min(expected * 1.2, 10)
+
+
+def test_jitter_spreads_delays():
+    random.seed(1)
+    policies = [ExponentialBackoffPolicy(SECOND, 10 * SECOND, jitter=0.2) for _ in range(10)]
+    assert len({policy.next_delay() for policy in policies}) > 1
+
+
+def test_watchdog_detects_stall_only_once_not_fed():
+    async def scenario():
+        stalls = []
+        watchdog = StreamWatchdog(datetime.timedelta(milliseconds=20), 3, lambda: stalls.append(loop.time()))
+        watchdog.start()
+        # Fed more often than the timeout of 60ms
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            watchdog.feed()
+        fed_stalls = len(stalls)
+        await asyncio.sleep(0.2)
+        watchdog.stop()
+        return fed_stalls, stalls, watchdog.stalled
+
+    loop = asyncio.get_event_loop()
+    fed_stalls, stalls, stalled = loop.run_until_complete(scenario())
+    assert fed_stalls == 0
+    assert len(stalls) == 1
+    assert stalled
+
+
+def test_stopped_watchdog_doesnt_fire():
+    async def scenario():
+        stalls = []
+        watchdog = StreamWatchdog(datetime.timedelta(milliseconds=10), 1, lambda: stalls.append(True))
+        watchdog.start()
+        watchdog.stop()
+        await asyncio.sleep(0.05)
+        return stalls, watchdog.stalled
+
+    assert asyncio.get_event_loop().run_until_complete(scenario()) == ([], False)
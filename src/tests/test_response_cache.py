@@ -0,0 +1,148 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import types
+
+from hikvision_isapi.isapi import response_cache
+from hikvision_isapi.isapi.response_cache import ResponseCache
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Fetcher(object):
+    """Returns the number of the call, optionally waiting for the release before returning"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        call = self.calls
+        await self.release.wait()
+        return call
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def make_cache(monkeypatch, max_size=None):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache, "time", types.SimpleNamespace(monotonic=clock))
+    return ResponseCache(max_size), clock
+
+
+def test_values_expire_after_max_age(monkeypatch):
+    async def scenario():
+        cache, clock = make_cache(monkeypatch)
+        fetch = Fetcher()
+        results = [await cache.get("key", fetch, 10)]
+        clock.now += 10
+        results.append(await cache.get("key", fetch, 10))
+        clock.now += 0.5
+        results.append(await cache.get("key", fetch, 10))
+        return results, cache.hits, cache.fetches
+
+    assert run(scenario()) == ([1, 1, 2], 1, 2)
+
+
+def test_concurrent_requests_share_single_fetch(monkeypatch):
+    async def scenario():
+        cache, _ = make_cache(monkeypatch)
+        fetch = Fetcher()
+        fetch.release.clear()
+        waiters = [asyncio.ensure_future(cache.get("key", fetch, 10)) for _ in range(5)]
+        await asyncio.sleep(0)
+        fetching = cache.is_fetching("key")
+        # Cancelled waiter doesn't cancel the fetch others are waiting for
+        waiters[0].cancel()
+        fetch.release.set()
+        results = await asyncio.gather(*waiters[1:])
+        return fetching, results, fetch.calls, cache.is_fetching("key")
+
+    assert run(scenario()) == (True, [1, 1, 1, 1], 1, False)
+
+
+def test_zero_max_age_joins_fetch_in_progress(monkeypatch):
+    async def scenario():
+        cache, clock = make_cache(monkeypatch)
+        fetch = Fetcher()
+        await cache.get("key", fetch, 10)
+        clock.now += 0.1
+        fetch.release.clear()
+        waiters = [asyncio.ensure_future(cache.get("key", fetch, 0)) for _ in range(2)]
+        await asyncio.sleep(0)
+        fetch.release.set()
+        return await asyncio.gather(*waiters), fetch.calls
+
+    assert run(scenario()) == ([2, 2], 2)
+
+
+def test_invalidated_values_are_fetched_again(monkeypatch):
+    async def scenario():
+        cache, _ = make_cache(monkeypatch)
+        fetch = Fetcher()
+        for key in ("snapshot/1", "snapshot/2", "status"):
+            await cache.get(key, fetch, 10)
+        cache.invalidate(lambda key: key.startswith("snapshot/"))
+        cached = [cache.get_cached(key, 10) for key in ("snapshot/1", "snapshot/2", "status")]
+        cache.invalidate()
+        return cached, cache.get_cached("status", 10)
+
+    assert run(scenario()) == ([None, None, 3], None)
+
+
+def test_fetch_invalidated_while_in_progress_is_not_stored(monkeypatch):
+    async def scenario():
+        cache, _ = make_cache(monkeypatch)
+        fetch = Fetcher()
+        fetch.release.clear()
+        waiter = asyncio.ensure_future(cache.get("key", fetch, 10))
+        await asyncio.sleep(0)
+        cache.invalidate()
+        fetch.release.set()
+        return await waiter, cache.get_cached("key", 10), await cache.get("key", fetch, 10)
+
+    assert run(scenario()) == (1, None, 2)
+
+
+def test_least_recently_used_values_are_evicted(monkeypatch):
+    async def scenario():
+        cache, _ = make_cache(monkeypatch, max_size=2)
+        fetch = Fetcher()
+        await cache.get("a", fetch, 10)
+        await cache.get("b", fetch, 10)
+        cache.get_cached("a", 10)
+        await cache.get("c", fetch, 10)
+        return [cache.get_cached(key, 10) for key in ("a", "b", "c")]
+
+    assert run(scenario()) == [1, None, 3]
@@ -0,0 +1,53 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+
+from hikvision_isapi.snapshot_cache import SnapshotCache
+
+
+def test_size_follows_reserved_channels():
+    cache = SnapshotCache(min_size=4)
+    assert cache.max_size == 4
+    cache.reserve("nvr1", 16)
+    cache.reserve("nvr2", 32)
+    assert cache.max_size == 48
+    cache.reserve("nvr1", 8)
+    assert cache.max_size == 40
+    cache.release("nvr2")
+    cache.release("unknown")
+    assert cache.max_size == 8
+    cache.release("nvr1")
+    assert cache.max_size == 4
+
+
+def test_images_of_all_channels_are_kept():
+    cache = SnapshotCache(min_size=2)
+    cache.reserve("nvr", 5)
+
+    async def fill():
+        for channel in range(5):
+            await cache.get(("nvr", channel), lambda: asyncio.sleep(0, b"image"), 60)
+
+    asyncio.get_event_loop().run_until_complete(fill())
+    assert all(cache.get_cached(("nvr", channel), 60) == b"image" for channel in range(5))
@@ -0,0 +1,70 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from hikvision_isapi.state_writer import StateWriteBatcher  # noqa: E402
+
+
+class FakeEntity(object):
+    def __init__(self) -> None:
+        self.hass = object()
+        self.entity_id = "binary_sensor.fake"
+        self.available = True
+        self.state = "off"
+        self.device_state_attributes = {}
+        self.written = []
+
+    def async_write_ha_state(self):
+        self.written.append((self.available, self.state))
+
+
+def test_unchanged_state_is_skipped():
+    batcher = StateWriteBatcher(asyncio.get_event_loop())
+    entity = FakeEntity()
+    batcher.mark_dirty(1, entity)
+    batcher.mark_dirty(1, entity)
+    batcher.flush()
+    batcher.mark_dirty(1, entity)
+    batcher.flush()
+    assert entity.written == [(True, "off")]
+    assert batcher.skipped == 1
+
+
+def test_availability_change_is_written():
+    batcher = StateWriteBatcher(asyncio.get_event_loop())
+    entity = FakeEntity()
+    batcher.mark_dirty(1, entity)
+    batcher.flush()
+    entity.available = False
+    batcher.mark_dirty(1, entity)
+    batcher.flush()
+    entity.available = True
+    batcher.mark_dirty(1, entity)
+    batcher.flush()
+    assert entity.written == [(True, "off"), (False, "off"), (True, "off")]
+    batcher.stop()
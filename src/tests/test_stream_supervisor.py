@@ -0,0 +1,126 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+
+from hikvision_isapi.isapi.client import ISAPIClient
+from hikvision_isapi.stream_supervisor import AlertStreamSupervisor
+
+# Devices attached in push mode don't connect to the device
+BASE_URL = "http://127.0.0.1:1"
+
+
+class FakeClient(object):
+    """Puts the given alerts into the device queue once started, then keeps the stream open"""
+
+    def __init__(self, events: list, started: asyncio.Event):
+        self.events = events
+        self.started = started
+
+    async def listen_hikvision_event_stream(self, queue, *args):
+        await self.started.wait()
+        for event in self.events:
+            queue.put_nowait(event)
+        await asyncio.Event().wait()
+
+
+async def start(started: asyncio.Event):
+    # Let the readers and the processor reach the point where they wait
+    await asyncio.sleep(0)
+    started.set()
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_devices_are_served_in_round_robin():
+    async def scenario():
+        handled = []
+        started = asyncio.Event()
+        supervisor = AlertStreamSupervisor(asyncio.get_event_loop())
+        supervisor.attach("busy", FakeClient(["busy-0", "busy-1", "busy-2"], started), handled.append)
+        supervisor.attach("quiet", FakeClient(["quiet-0"], started), handled.append)
+        await start(started)
+        await asyncio.sleep(0.05)
+        await supervisor.async_stop()
+        return handled
+
+    assert run(scenario()) == ["busy-0", "quiet-0", "busy-1", "busy-2"]
+
+
+def test_detached_device_alerts_are_dropped():
+    async def scenario():
+        handled = []
+        started = asyncio.Event()
+        supervisor = AlertStreamSupervisor(asyncio.get_event_loop())
+        supervisor.attach("first", FakeClient(["first-0", "first-1"], started), handled.append)
+        supervisor.attach("second", FakeClient(["second-0"], started), handled.append)
+        await start(started)
+        # Readers have queued the alerts, but they are not processed yet
+        await asyncio.sleep(0)
+        await supervisor.detach("first")
+        await asyncio.sleep(0.05)
+        attached = supervisor.is_attached("first"), supervisor.is_attached("second")
+        await supervisor.async_stop()
+        return handled, attached
+
+    handled, attached = run(scenario())
+    assert handled == ["second-0"]
+    assert attached == (False, True)
+
+
+def test_handler_errors_dont_stop_processing():
+    async def scenario():
+        handled = []
+
+        def handler(event):
+            if event == "bad":
+                raise RuntimeError("handler failed")
+            handled.append(event)
+
+        started = asyncio.Event()
+        supervisor = AlertStreamSupervisor(asyncio.get_event_loop())
+        supervisor.attach("device", FakeClient(["bad", "good"], started), handler)
+        await start(started)
+        await asyncio.sleep(0.05)
+        await supervisor.async_stop()
+        return handled
+
+    assert run(scenario()) == ["good"]
+
+
+def test_pushed_alerts_are_processed_until_detached():
+    async def scenario():
+        handled = []
+        supervisor = AlertStreamSupervisor(asyncio.get_event_loop())
+        async with ISAPIClient(BASE_URL, "admin", "password") as client:
+            supervisor.attach("device", client, handled.append, push=True)
+            accepted = [supervisor.push("device", "pushed-0")]
+            await asyncio.sleep(0.05)
+            await supervisor.detach("device")
+            accepted.append(supervisor.push("device", "pushed-1"))
+            await supervisor.async_stop()
+        return handled, accepted
+
+    assert run(scenario()) == (["pushed-0"], [True, False])
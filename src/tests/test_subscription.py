@@ -0,0 +1,70 @@
+#    hass-hikvision-connector
+#    Copyright (C) 2020 Dmitry Berezovsky
+#    The MIT License (MIT)
+#
+#    Permission is hereby granted, free of charge, to any person obtaining
+#    a copy of this software and associated documentation files
+#    (the "Software"), to deal in the Software without restriction,
+#    including without limitation the rights to use, copy, modify, merge,
+#    publish, distribute, sublicense, and/or sell copies of the Software,
+#    and to permit persons to whom the Software is furnished to do so,
+#    subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be
+#    included in all copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#    IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#    CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#    SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+
+import pytest
+
+from hikvision_isapi.isapi.client import ISAPIClient
+from hikvision_isapi.isapi.subscription import EventFilter
+from isapi_simulator import DeviceFleet, DeviceProfile
+
+FILTERS = [EventFilter("vmd", ["1"])]
+
+
+def receive_alerts(profile: DeviceProfile, count: int = 5):
+    async def run():
+        async with DeviceFleet(1, profile, seed=1) as fleet:
+            async with ISAPIClient(fleet.base_urls[0], "admin", "password") as client:
+                queue = asyncio.Queue()
+                task = asyncio.get_event_loop().create_task(client.listen_hikvision_event_stream(queue, FILTERS))
+                try:
+                    alerts = [await asyncio.wait_for(queue.get(), 5) for _ in range(count)]
+                finally:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                return client.event_subscription_supported, alerts, fleet.devices[0].stats
+
+    return asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_subscription_filters_alerts():
+    supported, alerts, _ = receive_alerts(DeviceProfile(rate=200, channels=2, heartbeat_interval=0))
+    assert supported is True
+    assert all(x.type.lower() == "vmd" and x.channel_id == "1" for x in alerts)
+
+
+@pytest.mark.parametrize(
+    "profile",
+    [
+        DeviceProfile(rate=50, heartbeat_interval=0, event_subscription=False),
+        DeviceProfile(rate=50, heartbeat_interval=0, event_subscription_stream=False),
+    ],
+    ids=["not_found", "plain_status"],
+)
+def test_falls_back_to_alert_stream(profile):
+    supported, alerts, stats = receive_alerts(profile)
+    assert supported is False
+    assert len(alerts) == 5
+    # Device is not asked to subscribe again on reconnect
+    assert stats.streams_opened == 1